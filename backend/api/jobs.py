@@ -0,0 +1,360 @@
+"""
+Persistent background job queue for report generation.
+
+POST /report/jobs only inserts a row; a small, fixed pool of worker
+threads drains the queue in FIFO order and writes the result back, so a
+slow generation never holds an HTTP connection open. The queue lives in
+SQLite, so queued jobs survive a restart.
+
+Several API processes may share the database (uvicorn --workers,
+replicas on one volume):
+
+    - a job is claimed with a guarded UPDATE (status must still be
+      queued), so exactly one process runs it
+    - a running job carries a lease: its owner (host, pid, queue) and a
+      heartbeat the owning queue renews every lease_s / 3
+    - a running job whose heartbeat is older than lease_s belonged to a
+      process that died; it is put back in the queue on start() and by
+      any live queue's heartbeat, never while its owner is still alive
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from api.micro_batcher import QueueFullError
+from metrics import metrics
+
+
+logger = logging.getLogger("ergocare-jobs")
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Input:
+        run_job:     fn(payload, timings) -> JSON-serialisable result.
+                     Stage durations written into timings are stored
+                     with the job.
+        workers:     number of jobs processed concurrently
+        max_queued:  submit() fails fast with QueueFullError beyond this
+        retention_s: finished jobs older than this are deleted (0 = keep)
+        retry_on:    exception types that put the job back in the queue
+                     (after sleeping e.retry_after seconds) instead of
+                     failing it, e.g. a saturated LLM
+        lease_s:     a running job whose owner has not renewed its lease
+                     for this long is re-queued
+        poll_s:      how often idle workers look for jobs submitted by
+                     other processes
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        run_job: Callable[[Dict, Dict], Dict],
+        workers: int = 1,
+        max_queued: int = 100,
+        retention_s: float = 24 * 3600,
+        retry_on: Tuple[Type[Exception], ...] = (),
+        lease_s: float = 30.0,
+        poll_s: float = 1.0,
+        name: str = "report_jobs"
+    ):
+        self.run_job = run_job
+        self.retry_on = retry_on
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention_s
+        self.lease = lease_s
+        self.poll = poll_s
+        self.name = name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                timings TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+            """
+        )
+        # Databases created before leases existed
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)"
+        )
+        self._db.commit()
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._stopped = False
+        self._threads = []
+
+        self._queue_depth = metrics.gauge(f"{name}.queue_depth")
+        self._queue_wait = metrics.histogram(f"{name}.queue_wait_ms")
+        self._run_time = metrics.histogram(f"{name}.run_ms")
+        self._completed = metrics.counter(f"{name}.completed")
+        self._failed = metrics.counter(f"{name}.failed")
+        self._rejected = metrics.counter(f"{name}.rejected")
+        self._retried = metrics.counter(f"{name}.retried")
+        self._reclaimed = metrics.counter(f"{name}.reclaimed")
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+
+    def start(self) -> "JobQueue":
+        with self._lock:
+            if self._threads:
+                return self
+
+            # Jobs interrupted by a crash / restart go back in the queue;
+            # jobs other live processes are running keep their lease
+            self._reclaim_stale(time.time())
+            self._update_depth()
+
+            self._stopped = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        """
+        Waits for running jobs to finish; queued jobs stay in the database.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    # -------------------------
+    # Client side
+    # -------------------------
+
+    def submit(self, payload: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        with self._cond:
+            (queued,) = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+            if queued >= self.max_queued:
+                self._rejected.inc()
+                raise QueueFullError(f"{self.name} queue is full ({self.max_queued})")
+
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), now)
+            )
+            self._prune(now)
+            self._db.commit()
+            self._queue_depth.set(queued + 1)
+            self._cond.notify()
+
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, result, error, timings, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = {
+                "job_id": row[0],
+                "status": row[1],
+                "result": json.loads(row[2]) if row[2] else None,
+                "error": row[3],
+                "timings": json.loads(row[4]) if row[4] else {},
+                "created_at": row[5],
+                "started_at": row[6],
+                "finished_at": row[7]
+            }
+            if row[1] == QUEUED:
+                (ahead,) = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?",
+                    (QUEUED, row[5])
+                ).fetchone()
+                job["queue_position"] = ahead + 1
+            return job
+
+    def depth(self) -> int:
+        with self._lock:
+            (queued,) = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+            return queued
+
+    # -------------------------
+    # Worker side
+    # -------------------------
+
+    def _update_depth(self) -> None:
+        # caller holds self._lock
+        (queued,) = self._db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+        ).fetchone()
+        self._queue_depth.set(queued)
+
+    def _prune(self, now: float) -> None:
+        # caller holds self._lock
+        if self.retention > 0:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, now - self.retention)
+            )
+
+    def _reclaim_stale(self, now: float) -> int:
+        # caller holds self._lock
+        cur = self._db.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL "
+            "WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (QUEUED, RUNNING, now - self.lease)
+        )
+        self._db.commit()
+        if cur.rowcount:
+            self._reclaimed.inc(cur.rowcount)
+            logger.info(f"Re-queued {cur.rowcount} interrupted job(s)")
+        return cur.rowcount
+
+    def _heartbeat(self) -> None:
+        """
+        Renews this queue's leases and re-queues jobs whose owner died.
+        """
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                    (now, RUNNING, self.owner)
+                )
+                self._db.commit()
+                if self._reclaim_stale(now):
+                    self._update_depth()
+                    self._cond.notify_all()
+                self._cond.wait(self.lease / 3)
+
+    def _claim(self):
+        with self._cond:
+            while not self._stopped:
+                row = self._db.execute(
+                    "SELECT id, payload, created_at FROM jobs WHERE status = ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    # Another process may have claimed the row since the SELECT
+                    cur = self._db.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, owner = ?, heartbeat_at = ? "
+                        "WHERE id = ? AND status = ?",
+                        (RUNNING, now, self.owner, now, row[0], QUEUED)
+                    )
+                    self._db.commit()
+                    if cur.rowcount != 1:
+                        continue
+                    self._update_depth()
+                    return row[0], json.loads(row[1]), now - row[2]
+                # Jobs submitted by other processes do not notify this one
+                self._cond.wait(self.poll)
+            return None
+
+    def _finish(self, job_id: str, status: str, result, error, timings: Dict) -> None:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, timings = ?, finished_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    json.dumps(timings),
+                    time.time(),
+                    job_id,
+                    self.owner
+                )
+            )
+            self._db.commit()
+        if cur.rowcount != 1:
+            logger.warning(f"Job {job_id} lost its lease; result discarded")
+
+    def _requeue(self, job_id: str) -> None:
+        with self._cond:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND owner = ?",
+                (QUEUED, job_id, self.owner)
+            )
+            self._db.commit()
+            self._update_depth()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                return
+
+            job_id, payload, waited = claimed
+            self._queue_wait.observe(waited * 1000)
+            timings = {"queue_wait": waited}
+
+            start = time.perf_counter()
+            try:
+                result = self.run_job(payload, timings)
+            except self.retry_on as e:
+                # Back to the front of the queue (created_at is unchanged)
+                logger.warning(f"Job {job_id} deferred: {e}")
+                self._requeue(job_id)
+                self._retried.inc()
+                time.sleep(getattr(e, "retry_after", 1))
+                continue
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed")
+                timings["total"] = time.perf_counter() - start
+                self._finish(job_id, FAILED, None, f"{type(e).__name__}: {e}", timings)
+                self._failed.inc()
+            else:
+                timings["total"] = time.perf_counter() - start
+                self._finish(job_id, DONE, result, None, timings)
+                self._completed.inc()
+            finally:
+                self._run_time.observe((time.perf_counter() - start) * 1000)
@@ -0,0 +1,178 @@
+"""
+In-process request coalescer.
+
+Concurrent callers submit single items; a background worker groups
+everything that arrives within a short window (or until the batch is
+full) and scores the group with one vectorized call. Each caller then
+gets its own result back through a Future.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List
+
+from metrics import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when the batcher's wait queue is at capacity."""
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Input:
+        process_batch: fn(list of items) -> list of results, same length/order.
+                       A result that is an Exception instance is raised to
+                       that caller only; if process_batch itself raises,
+                       every caller in the batch gets the exception.
+        max_batch_size: dispatch as soon as this many items are waiting
+        max_wait_ms:    or when the oldest waiting item is this old
+        max_queue_size: submit() fails fast with QueueFullError beyond this
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_size: int = 1024,
+        name: str = "batcher"
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._worker = None
+
+        self._batch_size = metrics.histogram(
+            f"{name}.batch_size", [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+        )
+        self._queue_delay = metrics.histogram(f"{name}.queue_delay_ms")
+        self._process_time = metrics.histogram(f"{name}.process_ms")
+        self._queue_depth = metrics.gauge(f"{name}.queue_depth")
+        self._rejected = metrics.counter(f"{name}.rejected")
+        self._timeouts = metrics.counter(f"{name}.timeouts")
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+
+    def start(self) -> "MicroBatcher":
+        with self._cond:
+            if self._worker is None:
+                self._stopped = False
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._worker.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    # -------------------------
+    # Client side
+    # -------------------------
+
+    def submit(self, item: Any, timeout: float = None) -> Any:
+        """
+        Blocks until the item's result is ready (or timeout seconds pass).
+        """
+        if self._worker is None:
+            self.start()
+
+        pending = _Pending(item)
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue_size:
+                self._rejected.inc()
+                raise QueueFullError(f"{self.name} queue is full ({self.max_queue_size})")
+            self._queue.append(pending)
+            self._queue_depth.set(len(self._queue))
+            self._cond.notify()
+
+        try:
+            return pending.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Worker skips cancelled items that have not been dispatched yet
+            pending.future.cancel()
+            self._timeouts.inc()
+            raise TimeoutError(f"{self.name} request timed out after {timeout}s")
+
+    # -------------------------
+    # Worker side
+    # -------------------------
+
+    def _take_batch(self) -> List[_Pending]:
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+
+            if not self._queue:
+                return []
+
+            # Window opens with the oldest waiting item
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                pending = self._queue.popleft()
+                # Claim the future; fails if the caller already timed out
+                if pending.future.set_running_or_notify_cancel():
+                    batch.append(pending)
+            self._queue_depth.set(len(self._queue))
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stopped:
+                    return
+                continue
+
+            dispatched_at = time.perf_counter()
+            for pending in batch:
+                self._queue_delay.observe((dispatched_at - pending.enqueued_at) * 1000)
+            self._batch_size.observe(len(batch))
+
+            try:
+                results = self.process_batch([p.item for p in batch])
+            except Exception as e:
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+            finally:
+                self._process_time.observe((time.perf_counter() - dispatched_at) * 1000)
+
+            for pending, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result(result)
@@ -1,12 +1,25 @@
+import asyncio
+import json
 import logging
+import threading
 import time
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List
 
-from ml_pipeline.pipeline.ml_pipeline import run_ml_pipeline
-from rag_pipeline.rag.rag_pipeline import run_rag_pipeline
+import config
+from api.jobs import JobQueue
+from api.micro_batcher import MicroBatcher, QueueFullError
+from full_pipeline import run_full_pipeline
+from metrics import metrics
+from ml_pipeline.pipeline.ml_pipeline import run_ml_pipeline, run_ml_pipeline_batch
+from rag_pipeline.rag.rag_pipeline import run_rag_pipeline, stream_rag_pipeline
+from rag_pipeline.rag.admission import Cancelled, Overloaded, llm_gate
 from ml_to_rag_bridge import build_rag_user_data
+from resources import registry
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -31,8 +44,59 @@ logging.basicConfig(
 logger = logging.getLogger("ergocare-api")
 
 
+def score_predict_batch(raw_inputs: List[Dict]) -> List:
+    """
+    MicroBatcher callback: one vectorized ML pass for all coalesced
+    /predict calls. Malformed rows come back as ValueError for that
+    caller only.
+    """
+    return [
+        r["result"] if r["status"] == "ok" else ValueError(r["error"])
+        for r in run_ml_pipeline_batch(raw_inputs)
+    ]
+
+
+predict_batcher = MicroBatcher(
+    score_predict_batch,
+    max_batch_size=config.PREDICT_BATCH_MAX_SIZE,
+    max_wait_ms=config.PREDICT_BATCH_WINDOW_MS,
+    max_queue_size=config.PREDICT_QUEUE_SIZE,
+    name="predict_batcher"
+)
+
+
+# Opened in lifespan (creates the SQLite file)
+report_jobs: JobQueue = None
+
+
+# Startup: load model / embeddings / vector store / LLM client once
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global report_jobs
+
+    logger.info(f"Warming up resources: {config.WARMUP_RESOURCES}")
+    registry.warm_up(config.WARMUP_RESOURCES)
+    if config.PREDICT_BATCHING:
+        predict_batcher.start()
+
+    report_jobs = JobQueue(
+        config.REPORT_JOBS_PATH,
+        run_full_pipeline,
+        retry_on=(Overloaded,),
+        workers=config.REPORT_JOB_WORKERS,
+        max_queued=config.REPORT_JOB_QUEUE_SIZE,
+        retention_s=config.REPORT_JOB_RETENTION_S,
+        lease_s=config.REPORT_JOB_LEASE_S
+    ).start()
+
+    yield
+
+    predict_batcher.stop()
+    report_jobs.stop()
+
+
 # FastAPI Setup
-app = FastAPI(title="ErgoCare AI API", version="1.0")
+app = FastAPI(title="ErgoCare AI API", version="1.0", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -47,17 +111,52 @@ class SurveyInput(BaseModel):
     data: Dict[str, Any]
 
 
+class BatchSurveyInput(BaseModel):
+    data: List[Dict[str, Any]]
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "ErgoCare AI API"}
 
 
+@app.get("/ready")
+def ready():
+    resources = registry.readiness()
+    is_ready = all(
+        resources[name]["loaded"] for name in config.WARMUP_RESOURCES
+        if name in resources
+    )
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "resources": resources}
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
 @app.post("/predict")
 def predict(payload: SurveyInput):
     start = time.time()
     logger.info("/predict request received")
     logger.info(f"payload : {payload}")
-    ml_output = run_ml_pipeline(payload.data)
+
+    if config.PREDICT_BATCHING:
+        try:
+            ml_output = predict_batcher.submit(
+                payload.data, timeout=config.PREDICT_TIMEOUT_S
+            )
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except TimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        ml_output = run_ml_pipeline(payload.data)
 
     elapsed = time.time() - start
     logger.info(f"/predict completed in {elapsed:.2f}s")
@@ -65,6 +164,31 @@ def predict(payload: SurveyInput):
     return clean_nan(ml_output)
 
 
+@app.post("/predict/batch")
+def predict_batch(payload: BatchSurveyInput):
+    start = time.time()
+    n = len(payload.data)
+    logger.info(f"/predict/batch request received ({n} rows)")
+
+    if n > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {n} rows (max {config.MAX_BATCH_SIZE})"
+        )
+
+    results = run_ml_pipeline_batch(payload.data)
+    failed = sum(1 for r in results if r["status"] == "error")
+
+    elapsed = time.time() - start
+    logger.info(f"/predict/batch completed in {elapsed:.2f}s ({n} rows, {failed} failed)")
+
+    return clean_nan({
+        "count": n,
+        "failed": failed,
+        "results": results
+    })
+
+
 @app.post("/report")
 def report(payload: SurveyInput):
     start = time.time()
@@ -80,13 +204,158 @@ def report(payload: SurveyInput):
 
     # RAG pipeline
     logger.info("Running RAG pipeline...")
-    rag_report = run_rag_pipeline(rag_user_data)
+    timings = {}
+    try:
+        rag_report = run_rag_pipeline(rag_user_data, timings)
+    except Overloaded as e:
+        logger.warning(f"/report rejected: {e}")
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    except TimeoutError as e:
+        # Waited too long on an identical in-flight generation
+        raise HTTPException(status_code=504, detail=str(e))
 
     elapsed = time.time() - start
-    logger.info(f"/report completed in {elapsed:.2f}s")
+    if timings:
+        logger.info(
+            f"/report completed in {elapsed:.2f}s "
+            f"(retrieval {timings.get('retrieval', 0):.2f}s, "
+            f"generation {timings.get('generation', 0):.2f}s)"
+        )
+    else:
+        logger.info(f"/report completed in {elapsed:.2f}s")
 
     return {
         "ml_output": ml_output,
         "rag_user_data": rag_user_data,
         "rag_report": rag_report
     }
+
+
+@app.post("/report/jobs", status_code=202)
+def submit_report_job(payload: SurveyInput):
+    try:
+        job_id = report_jobs.submit(payload.data)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    logger.info(f"/report/jobs queued job {job_id}")
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/report/jobs/{job_id}")
+def get_report_job(job_id: str):
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return clean_nan(job)
+
+
+# How often an idle /report/stream checks whether the client is still there
+STREAM_DISCONNECT_POLL_S = 1.0
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/report/stream")
+async def report_stream(payload: SurveyInput, request: Request):
+    """
+    Server-Sent Events variant of /report:
+
+        event: ml_output  -> {"ml_output", "rag_user_data"} (sent immediately)
+        event: token      -> {"text"} per generated chunk
+        event: done       -> {"elapsed_seconds", "chunks"}
+        event: error      -> {"detail"}
+    """
+    start = time.time()
+    logger.info("/report/stream request received")
+
+    # Reject before the 200 + event stream is committed
+    if llm_gate.saturated():
+        raise HTTPException(
+            status_code=503,
+            detail="LLM is saturated",
+            headers={"Retry-After": str(llm_gate.retry_after())}
+        )
+
+    ml_output = await run_in_threadpool(run_ml_pipeline, payload.data)
+    rag_user_data = build_rag_user_data(ml_output)
+
+    async def events():
+        yield sse_event("ml_output", clean_nan({
+            "ml_output": ml_output,
+            "rag_user_data": rag_user_data
+        }))
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def emit(kind, value=None):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:
+                pass  # event loop already gone
+
+        # The LLM stream is blocking, so one thread owns it end to end;
+        # only that thread may close it, which aborts the Ollama request.
+        # `stop` also reaches the llm_gate wait: a client that leaves while
+        # queued gives up its place instead of starting a generation.
+        def produce():
+            if stop.is_set():
+                emit("end")
+                return
+            stream = stream_rag_pipeline(rag_user_data, cancel=stop)
+            try:
+                for chunk in stream:
+                    if stop.is_set():
+                        break
+                    emit("token", chunk)
+            except Cancelled:
+                logger.info("/report/stream client left while waiting for an LLM slot")
+            except Exception as e:
+                logger.exception("/report/stream generation failed")
+                emit("error", str(e))
+            finally:
+                stream.close()
+                emit("end")
+
+        threading.Thread(target=produce, name="report-stream", daemon=True).start()
+
+        chunks = 0
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(
+                        queue.get(), timeout=STREAM_DISCONNECT_POLL_S
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        logger.info("/report/stream client disconnected")
+                        return
+                    continue
+
+                if kind == "token":
+                    chunks += 1
+                    yield sse_event("token", {"text": value})
+                elif kind == "error":
+                    yield sse_event("error", {"detail": value})
+                    return
+                else:
+                    break
+
+            elapsed = time.time() - start
+            logger.info(f"/report/stream completed in {elapsed:.2f}s ({chunks} chunks)")
+            yield sse_event("done", {"elapsed_seconds": round(elapsed, 2), "chunks": chunks})
+        finally:
+            # Client gone or stream finished: stop the producer at its next chunk
+            stop.set()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
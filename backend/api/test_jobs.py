@@ -0,0 +1,263 @@
+import sqlite3
+import time
+import uuid
+
+import pytest
+
+from api.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from api.micro_batcher import QueueFullError
+from rag_pipeline.rag.admission import Overloaded
+
+
+def make_queue(db_path, run_job, **kwargs) -> JobQueue:
+    return JobQueue(db_path, run_job, name=f"test_jobs_{uuid.uuid4().hex}", **kwargs)
+
+
+def wait_for(queue: JobQueue, job_id: str, statuses=(DONE, FAILED), timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        assert time.monotonic() < deadline, f"job still {job['status']}"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "jobs.sqlite"
+
+
+def test_job_result_and_timings_are_stored(db_path):
+    def run_job(payload, timings):
+        timings["generation"] = 0.5
+        return {"echo": payload["n"]}
+
+    queue = make_queue(db_path, run_job).start()
+    try:
+        job = wait_for(queue, queue.submit({"n": 1}))
+    finally:
+        queue.stop()
+
+    assert job["status"] == DONE
+    assert job["result"] == {"echo": 1}
+    assert job["timings"]["generation"] == 0.5
+    assert "queue_wait" in job["timings"]
+
+
+def test_jobs_are_claimed_in_fifo_order(db_path):
+    seen = []
+
+    def run_job(payload, timings):
+        seen.append(payload["n"])
+        return {}
+
+    queue = make_queue(db_path, run_job, workers=1)
+    job_ids = [queue.submit({"n": n}) for n in range(5)]
+    assert queue.get(job_ids[3])["queue_position"] == 4
+
+    queue.start()
+    try:
+        for job_id in job_ids:
+            wait_for(queue, job_id)
+    finally:
+        queue.stop()
+
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def mark_running(db_path, job_id: str, owner: str, heartbeat_at: float) -> None:
+    with sqlite3.connect(str(db_path)) as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, started_at = ?, owner = ?, heartbeat_at = ? WHERE id = ?",
+            (RUNNING, heartbeat_at, owner, heartbeat_at, job_id)
+        )
+
+
+def test_running_jobs_are_requeued_after_a_restart(db_path):
+    # A process that died mid-job leaves the row in RUNNING with a lease
+    # nobody renews
+    crashed = make_queue(db_path, lambda payload, timings: {})
+    job_id = crashed.submit({"n": 1})
+    mark_running(db_path, job_id, crashed.owner, time.time() - 60)
+
+    restarted = make_queue(db_path, lambda payload, timings: {"done": payload["n"]})
+    assert restarted.get(job_id)["status"] == RUNNING
+
+    restarted.start()
+    try:
+        job = wait_for(restarted, job_id)
+    finally:
+        restarted.stop()
+
+    assert job["status"] == DONE
+    assert job["result"] == {"done": 1}
+
+
+def test_jobs_leased_by_a_live_process_are_not_requeued(db_path):
+    sibling = make_queue(db_path, lambda payload, timings: {})
+    job_id = sibling.submit({"n": 1})
+    mark_running(db_path, job_id, sibling.owner, time.time())
+
+    restarted = make_queue(db_path, lambda payload, timings: {"stolen": True}).start()
+    try:
+        time.sleep(0.1)
+        job = restarted.get(job_id)
+    finally:
+        restarted.stop()
+
+    assert job["status"] == RUNNING
+    assert job["result"] is None
+
+
+def test_expired_lease_is_reclaimed_by_a_running_queue(db_path):
+    queue = make_queue(db_path, lambda payload, timings: {"done": True}, lease_s=0.3, poll_s=0.05).start()
+    try:
+        sibling = make_queue(db_path, lambda payload, timings: {})
+        job_id = sibling.submit({"n": 1})
+        # The sibling claims the job, then dies without renewing
+        mark_running(db_path, job_id, sibling.owner, time.time())
+
+        job = wait_for(queue, job_id)
+    finally:
+        queue.stop()
+
+    assert job["result"] == {"done": True}
+    assert queue._reclaimed.value == 1
+
+
+def test_long_job_keeps_its_lease(db_path):
+    runs = []
+
+    def run_job(payload, timings):
+        runs.append(payload["n"])
+        time.sleep(0.5)
+        return {}
+
+    queue = make_queue(db_path, run_job, lease_s=0.15, poll_s=0.05).start()
+    other = make_queue(db_path, run_job, lease_s=0.15, poll_s=0.05).start()
+    try:
+        job = wait_for(queue, queue.submit({"n": 1}))
+    finally:
+        queue.stop()
+        other.stop()
+
+    assert job["status"] == DONE
+    assert runs == [1]
+
+
+def test_processes_sharing_a_database_run_each_job_once(db_path):
+    runs = []
+
+    def run_job(payload, timings):
+        runs.append(payload["n"])
+        time.sleep(0.005)
+        return {}
+
+    queues = [make_queue(db_path, run_job, workers=2, poll_s=0.01) for _ in range(3)]
+    job_ids = [queues[0].submit({"n": n}) for n in range(30)]
+    for queue in queues:
+        queue.start()
+    try:
+        for job_id in job_ids:
+            assert wait_for(queues[0], job_id)["status"] == DONE
+    finally:
+        for queue in queues:
+            queue.stop()
+
+    assert sorted(runs) == list(range(30))
+
+
+def test_queued_jobs_survive_a_restart(db_path):
+    first = make_queue(db_path, lambda payload, timings: {})
+    job_id = first.submit({"n": 1})
+
+    second = make_queue(db_path, lambda payload, timings: {"ok": True}).start()
+    try:
+        assert wait_for(second, job_id)["result"] == {"ok": True}
+    finally:
+        second.stop()
+
+
+def test_overloaded_job_is_retried_instead_of_failed(db_path):
+    attempts = []
+
+    def run_job(payload, timings):
+        attempts.append(payload["n"])
+        if len(attempts) == 1:
+            raise Overloaded("saturated", retry_after=0)
+        return {"attempts": len(attempts)}
+
+    queue = make_queue(db_path, run_job, retry_on=(Overloaded,)).start()
+    try:
+        job = wait_for(queue, queue.submit({"n": 1}))
+    finally:
+        queue.stop()
+
+    assert job["status"] == DONE
+    assert job["result"] == {"attempts": 2}
+    assert queue._retried.value == 1
+
+
+def test_retried_job_keeps_its_place_at_the_front(db_path):
+    seen = []
+
+    def run_job(payload, timings):
+        seen.append(payload["n"])
+        if payload["n"] == 0 and seen.count(0) == 1:
+            raise Overloaded("saturated", retry_after=0)
+        return {}
+
+    queue = make_queue(db_path, run_job, workers=1, retry_on=(Overloaded,))
+    job_ids = [queue.submit({"n": n}) for n in range(3)]
+    queue.start()
+    try:
+        for job_id in job_ids:
+            wait_for(queue, job_id)
+    finally:
+        queue.stop()
+
+    assert seen == [0, 0, 1, 2]
+
+
+def test_other_errors_fail_the_job(db_path):
+    def run_job(payload, timings):
+        raise ValueError("bad payload")
+
+    queue = make_queue(db_path, run_job, retry_on=(Overloaded,)).start()
+    try:
+        job = wait_for(queue, queue.submit({"n": 1}))
+    finally:
+        queue.stop()
+
+    assert job["status"] == FAILED
+    assert job["error"] == "ValueError: bad payload"
+
+
+def test_submit_rejects_beyond_max_queued(db_path):
+    queue = make_queue(db_path, lambda payload, timings: {}, max_queued=2)
+    first = queue.submit({"n": 1})
+    queue.submit({"n": 2})
+
+    with pytest.raises(QueueFullError):
+        queue.submit({"n": 3})
+    assert queue.depth() == 2
+    assert queue.get(first)["status"] == QUEUED
+
+
+def test_database_from_before_leases_is_migrated(db_path):
+    with sqlite3.connect(str(db_path)) as db:
+        db.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, timings TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        db.execute(
+            "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+            ("old", RUNNING, '{"n": 1}', time.time())
+        )
+
+    queue = make_queue(db_path, lambda payload, timings: {"n": payload["n"]}).start()
+    try:
+        assert wait_for(queue, "old")["result"] == {"n": 1}
+    finally:
+        queue.stop()
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from api.micro_batcher import MicroBatcher, QueueFullError
+
+
+def submit_all(batcher, items):
+    results = [None] * len(items)
+
+    def call(i, item):
+        try:
+            results[i] = batcher.submit(item, timeout=5)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, item)) for i, item in enumerate(items)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_items_share_one_batch():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [x * 10 for x in items]
+
+    # The window is far longer than the test: only a full batch dispatches
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=60_000).start()
+    try:
+        results = submit_all(batcher, [1, 2, 3, 4])
+    finally:
+        batcher.stop()
+
+    assert results == [10, 20, 30, 40]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [1, 2, 3, 4]
+
+
+def test_window_dispatches_partial_batch():
+    batcher = MicroBatcher(lambda items: [x + 1 for x in items], max_batch_size=64, max_wait_ms=1).start()
+    try:
+        assert batcher.submit(1, timeout=5) == 2
+    finally:
+        batcher.stop()
+
+
+def test_row_errors_are_isolated():
+    def process(items):
+        return [ValueError(f"bad {x}") if x % 2 else x for x in items]
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=60_000).start()
+    try:
+        results = submit_all(batcher, [1, 2, 3, 4])
+    finally:
+        batcher.stop()
+
+    assert results[1] == 2 and results[3] == 4
+    assert isinstance(results[0], ValueError) and str(results[0]) == "bad 1"
+    assert isinstance(results[2], ValueError) and str(results[2]) == "bad 3"
+
+
+def test_batch_failure_reaches_every_caller():
+    def process(items):
+        raise RuntimeError("model down")
+
+    batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=60_000).start()
+    try:
+        results = submit_all(batcher, [1, 2])
+    finally:
+        batcher.stop()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_full_queue_rejects():
+    batcher = MicroBatcher(lambda items: items, max_queue_size=0).start()
+    try:
+        with pytest.raises(QueueFullError):
+            batcher.submit(1, timeout=1)
+    finally:
+        batcher.stop()
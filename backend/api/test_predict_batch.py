@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import config  # noqa: E402
+from api import server  # noqa: E402
+from ml_pipeline.data.synthetic.generate_synthetic import generate_row  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def run_ml_pipeline_batch(raw_inputs):
+        return [
+            {"index": i, "status": "ok", "result": {"risk_indices": {"posture_risk_index": float("nan")}}}
+            if "neck_pain" in raw else {"index": i, "status": "error", "error": "KeyError: 'neck_pain'"}
+            for i, raw in enumerate(raw_inputs)
+        ]
+
+    monkeypatch.setattr(server, "run_ml_pipeline_batch", run_ml_pipeline_batch)
+    # No lifespan: nothing is warmed up or started
+    return TestClient(server.app)
+
+
+def test_oversized_batch_is_rejected_with_413(client, monkeypatch):
+    monkeypatch.setattr(config, "MAX_BATCH_SIZE", 2)
+    random.seed(1)
+
+    response = client.post("/predict/batch", json={"data": [generate_row() for _ in range(3)]})
+
+    assert response.status_code == 413
+    assert "max 2" in response.json()["detail"]
+
+
+def test_batch_counts_failures_and_serialises_nan(client, monkeypatch):
+    monkeypatch.setattr(config, "MAX_BATCH_SIZE", 2)
+    random.seed(1)
+
+    response = client.post("/predict/batch", json={"data": [generate_row(), {}]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["count"], body["failed"]) == (2, 1)
+    assert body["results"][0]["result"]["risk_indices"]["posture_risk_index"] is None
+    assert body["results"][1]["status"] == "error"
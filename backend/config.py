@@ -0,0 +1,277 @@
+"""
+Central runtime configuration for the ErgoCare AI backend.
+Every value can be overridden with an ERGOCARE_* environment variable.
+"""
+
+import os
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# -------------------------
+# Models / stores
+# -------------------------
+
+MODEL_PATH = Path(_env_str(
+    "ERGOCARE_MODEL_PATH",
+    str(BASE_DIR / "ml_pipeline" / "models" / "xgboost_risk_model.json")
+))
+
+# "numpy" (compiled TreeEnsemble, no xgboost import) or "xgboost"
+MODEL_BACKEND = _env_str("ERGOCARE_MODEL_BACKEND", "numpy")
+
+# Root of the versioned vector index (see rag_pipeline/rag/index_store.py);
+# the only store location ingestion, the API and the CLI tools use
+CHROMA_DIR = Path(_env_str(
+    "ERGOCARE_CHROMA_DIR",
+    str(BASE_DIR / "rag_pipeline" / "chroma_db")
+))
+
+# Published builds kept on disk (current + previous for rollback and for
+# processes that have not switched yet); older ones are deleted by ingest
+INDEX_KEEP_VERSIONS = _env_int("ERGOCARE_INDEX_KEEP_VERSIONS", 2)
+
+EMBEDDING_MODEL_NAME = _env_str(
+    "ERGOCARE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+
+# "chroma": query Chroma directly; "numpy": copy every chunk into an
+# in-memory NumpyIndex at startup and search it with brute-force GEMM
+RETRIEVAL_BACKEND = _env_str("ERGOCARE_RETRIEVAL_BACKEND", "chroma")
+
+# ingest.main() also writes a memory-mapped NumpyIndex snapshot into each
+# build; the numpy backend opens it instead of copying vectors out of Chroma
+
+# "float32" or "float16" (half the size on disk and in the page cache)
+SNAPSHOT_DTYPE = _env_str("ERGOCARE_SNAPSHOT_DTYPE", "float32")
+
+# Compact copies stored alongside the full-precision vectors
+SNAPSHOT_QUANTIZATIONS = [
+    q.strip()
+    for q in _env_str("ERGOCARE_SNAPSHOT_QUANTIZATIONS", "float16,int8").split(",")
+    if q.strip()
+]
+
+# numpy backend: "none", "float16" or "int8" first-stage scoring; the best
+# k * RESCORE_FACTOR candidates are rescored at full precision
+RETRIEVAL_QUANTIZATION = _env_str("ERGOCARE_RETRIEVAL_QUANTIZATION", "none")
+RETRIEVAL_RESCORE_FACTOR = _env_int("ERGOCARE_RETRIEVAL_RESCORE_FACTOR", 4)
+
+LLM_MODEL_NAME = _env_str("ERGOCARE_LLM_MODEL", "llama3.1:8b")
+
+LLM_BASE_URL = _env_str("ERGOCARE_LLM_BASE_URL", "http://localhost:11434")
+
+# How long Ollama keeps the model loaded after a request: a duration
+# ("30m", "2h") or seconds (-1 = until the server stops). Ollama's own
+# default (5m) unloads it between bursts of reports, and the cached
+# prompt prefix goes with it
+_keep_alive = _env_str("ERGOCARE_LLM_KEEP_ALIVE", "30m")
+LLM_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+
+# Context window (num_ctx) in tokens; 0 leaves the model default. It must
+# hold the prompt (CONTEXT_TOKEN_BUDGET plus ~1.5k) and the report, and
+# Ollama reloads the model whenever it changes, so every request sends
+# the same value
+LLM_NUM_CTX = _env_int("ERGOCARE_LLM_NUM_CTX", 8192)
+
+
+# -------------------------
+# Ingestion
+# -------------------------
+
+# Processes parsing / chunking PDFs; 1 parses in-process
+INGEST_WORKERS = _env_int("ERGOCARE_INGEST_WORKERS", max(1, (os.cpu_count() or 2) - 1))
+
+
+# -------------------------
+# Batch scoring
+# -------------------------
+
+MAX_BATCH_SIZE = _env_int("ERGOCARE_MAX_BATCH_SIZE", 10000)
+
+# Below this many rows the per-row fast path beats one pandas pass (the
+# two break even around 10k rows); keep it <= MAX_BATCH_SIZE or
+# /predict/batch never takes the pandas path
+PANDAS_BATCH_MIN_ROWS = _env_int("ERGOCARE_PANDAS_BATCH_MIN_ROWS", 10000)
+
+
+# -------------------------
+# /predict micro-batching
+# -------------------------
+
+# Coalesce concurrent /predict calls into one vectorized pass
+PREDICT_BATCHING = _env_bool("ERGOCARE_PREDICT_BATCHING", True)
+
+# Dispatch when this many requests are waiting ...
+PREDICT_BATCH_MAX_SIZE = _env_int("ERGOCARE_PREDICT_BATCH_MAX_SIZE", 64)
+
+# ... or when the oldest one has waited this long
+PREDICT_BATCH_WINDOW_MS = _env_float("ERGOCARE_PREDICT_BATCH_WINDOW_MS", 2.0)
+
+# Waiting requests beyond this are rejected with 503
+PREDICT_QUEUE_SIZE = _env_int("ERGOCARE_PREDICT_QUEUE_SIZE", 1024)
+
+PREDICT_TIMEOUT_S = _env_float("ERGOCARE_PREDICT_TIMEOUT_S", 5.0)
+
+
+# -------------------------
+# /report cache
+# -------------------------
+
+REPORT_CACHE_ENABLED = _env_bool("ERGOCARE_REPORT_CACHE", True)
+
+REPORT_CACHE_PATH = Path(_env_str(
+    "ERGOCARE_REPORT_CACHE_PATH",
+    str(BASE_DIR / "rag_pipeline" / "cache" / "reports.sqlite3")
+))
+
+REPORT_CACHE_MEMORY_ENTRIES = _env_int("ERGOCARE_REPORT_CACHE_MEMORY_ENTRIES", 512)
+REPORT_CACHE_DISK_ENTRIES = _env_int("ERGOCARE_REPORT_CACHE_DISK_ENTRIES", 10000)
+
+# 0 disables expiry
+REPORT_CACHE_TTL_S = _env_float("ERGOCARE_REPORT_CACHE_TTL_S", 7 * 24 * 3600)
+
+
+# -------------------------
+# Pre-generated reports
+# -------------------------
+
+# /report first looks the profile up in the store written by
+# python -m rag_pipeline.rag.pregenerate
+PREGEN_ENABLED = _env_bool("ERGOCARE_PREGEN", True)
+
+PREGEN_PATH = Path(_env_str(
+    "ERGOCARE_PREGEN_PATH",
+    str(BASE_DIR / "rag_pipeline" / "cache" / "pregenerated.sqlite3")
+))
+
+# LLM generations the job runs at once
+PREGEN_CONCURRENCY = _env_int("ERGOCARE_PREGEN_CONCURRENCY", 1)
+
+
+# -------------------------
+# Report rendering
+# -------------------------
+
+# "hybrid": header, Low sections, schedule, checklist, sources and
+# disclaimer from templates, only Moderate / High sections from the LLM
+# (no LLM call when every domain is Low); "llm": one prompt for the
+# whole report
+REPORT_RENDERER = _env_str("ERGOCARE_REPORT_RENDERER", "hybrid")
+
+# Hybrid renderer only. "single": one prompt for every Moderate / High
+# section; "parallel": one prompt per section, generated concurrently
+REPORT_SECTION_MODE = _env_str("ERGOCARE_REPORT_SECTION_MODE", "single")
+
+# Sections of one report generated at once in parallel mode. A report
+# takes a single LLM admission slot however many sections it runs, so
+# this only pays off when Ollama serves several requests at once
+# (OLLAMA_NUM_PARALLEL / replicas)
+REPORT_SECTION_CONCURRENCY = _env_int("ERGOCARE_REPORT_SECTION_CONCURRENCY", 2)
+
+
+# -------------------------
+# Report context assembly
+# -------------------------
+
+# Estimated tokens for the whole CONTEXT DOCUMENTS block (pinned policy
+# chunks included); 0 keeps every retrieved chunk after de-duplication
+CONTEXT_TOKEN_BUDGET = _env_int("ERGOCARE_CONTEXT_TOKEN_BUDGET", 3000)
+
+# Share of the budget per domain, by that domain's risk level
+CONTEXT_RISK_WEIGHTS = {
+    "High": _env_float("ERGOCARE_CONTEXT_WEIGHT_HIGH", 3.0),
+    "Moderate": _env_float("ERGOCARE_CONTEXT_WEIGHT_MODERATE", 2.0),
+    "Low": _env_float("ERGOCARE_CONTEXT_WEIGHT_LOW", 1.0),
+}
+
+# A chunk whose word shingles are at least this much contained in the
+# chunks already selected is dropped as a near-duplicate
+CONTEXT_NEAR_DUPLICATE = _env_float("ERGOCARE_CONTEXT_NEAR_DUPLICATE", 0.8)
+
+
+# -------------------------
+# LLM admission control
+# -------------------------
+# Waiting requests hold a server worker thread, so MAX_IN_FLIGHT + MAX_QUEUE
+# must stay well below the threadpool size (40) to keep /predict available.
+
+# Concurrent generations sent to Ollama
+LLM_MAX_IN_FLIGHT = _env_int("ERGOCARE_LLM_MAX_IN_FLIGHT", 1)
+
+# Requests allowed to wait for a slot; beyond this /report returns 503
+LLM_MAX_QUEUE = _env_int("ERGOCARE_LLM_MAX_QUEUE", 8)
+
+# Longest a request waits for a slot before giving up with 503
+LLM_QUEUE_TIMEOUT_S = _env_float("ERGOCARE_LLM_QUEUE_TIMEOUT_S", 120.0)
+
+
+# -------------------------
+# /report single-flight
+# -------------------------
+
+# Identical concurrent /report profiles share one LLM generation
+SINGLE_FLIGHT_ENABLED = _env_bool("ERGOCARE_SINGLE_FLIGHT", True)
+
+# How long a duplicate request waits for the in-flight generation
+SINGLE_FLIGHT_TIMEOUT_S = _env_float("ERGOCARE_SINGLE_FLIGHT_TIMEOUT_S", 180.0)
+
+# Duplicate requests allowed to wait per profile before /report returns
+# 503; each one holds a threadpool thread (shared with /predict, /ready)
+SINGLE_FLIGHT_MAX_FOLLOWERS = _env_int("ERGOCARE_SINGLE_FLIGHT_MAX_FOLLOWERS", 4)
+
+
+# -------------------------
+# /report/jobs
+# -------------------------
+
+REPORT_JOBS_PATH = Path(_env_str(
+    "ERGOCARE_REPORT_JOBS_PATH",
+    str(BASE_DIR / "api" / "data" / "report_jobs.sqlite3")
+))
+
+# Concurrent generations; keep at 1 for a single local Ollama instance
+REPORT_JOB_WORKERS = _env_int("ERGOCARE_REPORT_JOB_WORKERS", 1)
+
+# Queued (not yet running) jobs before POST /report/jobs returns 503
+REPORT_JOB_QUEUE_SIZE = _env_int("ERGOCARE_REPORT_JOB_QUEUE_SIZE", 100)
+
+# Finished jobs are deleted after this long; 0 keeps them forever
+REPORT_JOB_RETENTION_S = _env_float("ERGOCARE_REPORT_JOB_RETENTION_S", 24 * 3600)
+
+# A running job whose process stopped renewing its lease for this long
+# (crashed, killed) is re-queued; must exceed a heartbeat hiccup
+REPORT_JOB_LEASE_S = _env_float("ERGOCARE_REPORT_JOB_LEASE_S", 30.0)
+
+
+# -------------------------
+# Startup
+# -------------------------
+
+# Resources loaded eagerly by the API startup hook
+WARMUP_RESOURCES = [
+    r.strip()
+    for r in _env_str("ERGOCARE_WARMUP", "xgb_model,embeddings,vectordb,pinned_context,llm,report_cache,pregenerated").split(",")
+    if r.strip()
+]
@@ -1,15 +1,31 @@
+import time
+
 from ml_pipeline.pipeline.ml_pipeline import run_ml_pipeline
 from rag_pipeline.rag.rag_pipeline import run_rag_pipeline
 from ml_to_rag_bridge import build_rag_user_data
 
 
-def run_full_pipeline(user_input: dict) -> dict:
+def run_full_pipeline(user_input: dict, timings: dict = None) -> dict:
+    """
+    ML -> bridge -> RAG for one survey.
+    If timings is given, per-stage durations (seconds) are written into it.
+    """
+    if timings is None:
+        timings = {}
+
+    start = time.perf_counter()
     ml_output = run_ml_pipeline (user_input)
+    timings["ml"] = time.perf_counter() - start
 
     # Convert ML output to format expected by RAG
+    start = time.perf_counter()
     rag_user_data = build_rag_user_data(ml_output)
+    timings["bridge"] = time.perf_counter() - start
 
-    rag_report = run_rag_pipeline(rag_user_data)
+    # Also fills timings["retrieval"] / timings["generation"] on a cache miss
+    start = time.perf_counter()
+    rag_report = run_rag_pipeline(rag_user_data, timings)
+    timings["rag"] = time.perf_counter() - start
 
     return {
         "ml_output": ml_output,
@@ -17,7 +33,6 @@ def run_full_pipeline(user_input: dict) -> dict:
         "rag_report": rag_report
     }
 
-
 if __name__ == "__main__":
     sample_input = {
         "consent": "Yes",
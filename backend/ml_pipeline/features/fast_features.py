@@ -0,0 +1,226 @@
+"""
+Pandas-free single-row path: raw form dict -> risk index vector.
+
+Produces exactly the same numbers as
+    build_features(encode(pd.DataFrame([raw_input])))
+(enforced by test_fast_features.py) by performing the same float64
+operations in the same order, with the per-answer normalizations
+precomputed from the encoder's *_MAP dicts.
+"""
+
+import numbers
+from typing import Dict, Optional
+
+import numpy as np
+
+from ml_pipeline.preprocessing import encoder as enc
+from ml_pipeline.features.feature_builder import INDEX_WEIGHTS, MAX_WORKLOAD
+
+
+# Output layout (same column order as build_features)
+INDEX_COLUMNS = [
+    "posture_risk_index",
+    "visual_strain_index",
+    "cognitive_load_index",
+    "msk_risk_index",
+    "lifestyle_risk_index",
+    "overall_risk_index"
+]
+
+N_INDICES = len(INDEX_COLUMNS)
+
+NAN = float("nan")
+
+PAIN_COLS = [
+    "neck_pain",
+    "lower_back_pain",
+    "wrist_pain",
+    "shoulder_pain",
+    "leg_pain",
+    "eye_strain"
+]
+
+WHO5_COLS = ["who5_q1", "who5_q2", "who5_q3", "who5_q4", "who5_q5"]
+
+
+# -------------------------
+# Precomputed lookup tables
+# -------------------------
+# answer -> normalized value, i.e. MAP[answer] / divisor as build_features
+# computes it. Unknown answers map to NaN, except where encode() fills a
+# default (sleep_hours -> 1, physical_activity -> 0).
+
+def _normalized(mapping: Dict, divisor: float) -> Dict:
+    return {k: v / divisor for k, v in mapping.items()}
+
+
+WEEKEND_NORM = _normalized(enc.WEEKEND_WORK_MAP, 4.0)
+PUBLISH_NORM = _normalized(enc.PUBLISH_PRESSURE_MAP, 2.0)
+SITTING_NORM = _normalized(enc.SITTING_DURATION_MAP, 3.0)
+WORKSPACE_NORM = _normalized(enc.WORKSPACE_SETUP_MAP, 4.0)
+SCREEN_NORM = _normalized(enc.SCREEN_POSITION_MAP, 2.0)
+FEET_NORM = _normalized(enc.FEET_SUPPORT_MAP, 3.0)
+ACTIVITY_NORM = _normalized(enc.DISCOMFORT_ACTIVITY_MAP, 2.0)
+SLEEP_NORM = _normalized(enc.SLEEP_MAP, 3.0)
+HYDRATION_NORM = _normalized(enc.HYDRATION_MAP, 2.0)
+PHYSICAL_ACTIVITY_NORM = _normalized(enc.PHYSICAL_ACTIVITY_MAP, 3.0)
+COMMUTE_NORM = _normalized(enc.COMMUTE_MAP, 3.0)
+
+SLEEP_NORM_DEFAULT = 1 / 3.0
+PHYSICAL_ACTIVITY_NORM_DEFAULT = 0 / 3.0
+
+W_POSTURE = INDEX_WEIGHTS["posture_risk_index"]
+W_VISUAL = INDEX_WEIGHTS["visual_strain_index"]
+W_COGNITIVE = INDEX_WEIGHTS["cognitive_load_index"]
+W_MSK = INDEX_WEIGHTS["msk_risk_index"]
+W_LIFESTYLE = INDEX_WEIGHTS["lifestyle_risk_index"]
+W_OVERALL = INDEX_WEIGHTS["overall_risk_index"]
+
+
+# -------------------------
+# Scalar helpers
+# -------------------------
+
+def _lookup(table: Dict, value, default: float = NAN) -> float:
+    try:
+        return table.get(value, default)
+    except TypeError:  # unhashable answer
+        return default
+
+
+def _as_int(value) -> int:
+    # Mirrors Series.astype(int): truncates floats, parses int strings,
+    # raises on NaN / garbage.
+    return int(value)
+
+
+def _as_number(value) -> float:
+    # encode() leaves hour fields untouched; pandas arithmetic on anything
+    # non-numeric fails, so reject it here too.
+    if isinstance(value, bool) or not isinstance(value, numbers.Number):
+        raise TypeError(f"Expected a number, got {type(value).__name__}: {value!r}")
+    return float(value)
+
+
+def _clamp(x: float) -> float:
+    # Series.clip(0, 1) semantics (NaN passes through)
+    if x < 0.0:
+        return 0.0
+    if x > 1.0:
+        return 1.0
+    return x
+
+
+def _scale_0_100(x: float) -> float:
+    return _clamp(x) * 100
+
+
+# -------------------------
+# Fast path
+# -------------------------
+
+def build_feature_vector(raw_input: Dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Raw form dict -> float64 vector of INDEX_COLUMNS.
+
+    Input:
+        raw_input: ONE faculty form response (same keys as the form)
+        out:       optional preallocated array of shape (6,) to fill
+
+    Output:
+        out (or a new array), ordered like INDEX_COLUMNS
+    """
+    if out is None:
+        out = np.empty(N_INDICES, dtype=np.float64)
+
+    r = raw_input
+
+    # WHO-5 (NaN answers are skipped by DataFrame.sum)
+    who5_total = 0
+    for q in WHO5_COLS:
+        v = _lookup(enc.WHO5_MAP, r[q])
+        if v == v:
+            who5_total += v
+    who5_stress_inverse = 1.0 - who5_total / 25.0
+
+    # Pain
+    neck, back, wrist, shoulder, leg, eye = (_as_int(r[c]) for c in PAIN_COLS)
+
+    # Workload
+    workload_hours_total = _as_number(r["teaching_hours"]) + _as_number(r["admin_hours"])
+    workload_hours_normalized = _clamp(workload_hours_total / MAX_WORKLOAD)
+
+    weekend_norm = _lookup(WEEKEND_NORM, r["weekend_work"])
+    overload_norm = (_as_int(r["role_overload"]) - 1) / 4.0
+    publish_norm = _lookup(PUBLISH_NORM, r["publish_pressure"])
+
+    # Posture
+    sitting_norm = _lookup(SITTING_NORM, r["sitting_duration"])
+    workspace_norm = _lookup(WORKSPACE_NORM, r["workspace_setup"])
+    screen_norm = _lookup(SCREEN_NORM, r["screen_position"])
+    feet_norm = _lookup(FEET_NORM, r["feet_support"])
+    neck_back_norm = (neck + back) / 10.0
+
+    posture = _scale_0_100(
+        W_POSTURE["sitting"] * sitting_norm +
+        W_POSTURE["workspace"] * workspace_norm +
+        W_POSTURE["screen"] * screen_norm +
+        W_POSTURE["feet"] * feet_norm +
+        W_POSTURE["neck_back"] * neck_back_norm
+    )
+
+    # Visual
+    eye_norm = eye / 5.0
+    visual = _scale_0_100(
+        W_VISUAL["eye"] * eye_norm +
+        W_VISUAL["screen"] * screen_norm +
+        W_VISUAL["sitting"] * sitting_norm
+    )
+
+    # Cognitive
+    cognitive = _scale_0_100(
+        W_COGNITIVE["workload"] * workload_hours_normalized +
+        W_COGNITIVE["weekend"] * weekend_norm +
+        W_COGNITIVE["overload"] * overload_norm +
+        W_COGNITIVE["publish"] * publish_norm +
+        W_COGNITIVE["who5_inverse"] * who5_stress_inverse
+    )
+
+    # MSK
+    activity_norm = _lookup(ACTIVITY_NORM, r["most_discomfort_activity"])
+    msk_avg = ((neck + back + wrist + shoulder + leg) / 5) / 5.0
+    msk = _scale_0_100(
+        W_MSK["msk_pain"] * msk_avg +
+        W_MSK["activity"] * activity_norm
+    )
+
+    # Lifestyle
+    sleep_norm = _lookup(SLEEP_NORM, r["sleep_hours"], SLEEP_NORM_DEFAULT)
+    hydration_norm = _lookup(HYDRATION_NORM, r["hydration"])
+    activity_life_norm = _lookup(
+        PHYSICAL_ACTIVITY_NORM, r["physical_activity"], PHYSICAL_ACTIVITY_NORM_DEFAULT
+    )
+    commute_norm = _lookup(COMMUTE_NORM, r["commute_time"])
+    lifestyle = _scale_0_100(
+        W_LIFESTYLE["sleep_deficit"] * (1.0 - sleep_norm) +
+        W_LIFESTYLE["hydration_deficit"] * (1.0 - hydration_norm) +
+        W_LIFESTYLE["inactivity"] * (1.0 - activity_life_norm) +
+        W_LIFESTYLE["commute"] * commute_norm
+    )
+
+    # Overall
+    overall = _scale_0_100(
+        W_OVERALL["posture_risk_index"] * (posture / 100.0) +
+        W_OVERALL["cognitive_load_index"] * (cognitive / 100.0) +
+        W_OVERALL["visual_strain_index"] * (visual / 100.0) +
+        W_OVERALL["msk_risk_index"] * (msk / 100.0) +
+        W_OVERALL["lifestyle_risk_index"] * (lifestyle / 100.0)
+    )
+
+    out[0] = posture
+    out[1] = visual
+    out[2] = cognitive
+    out[3] = msk
+    out[4] = lifestyle
+    out[5] = overall
+    return out
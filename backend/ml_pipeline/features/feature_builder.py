@@ -29,6 +29,55 @@ FEATURE_DOCS = {
 }
 
 
+# -------------------------
+# Index weights
+# -------------------------
+# Shared with ml_pipeline.features.fast_features, which must reproduce
+# build_features bit-for-bit. Terms are summed in the order listed.
+
+MAX_WORKLOAD = 50.0  # heuristic upper bound on weekly teaching + admin hours
+
+INDEX_WEIGHTS = {
+    "posture_risk_index": {
+        "sitting": 0.25,
+        "workspace": 0.25,
+        "screen": 0.15,
+        "feet": 0.10,
+        "neck_back": 0.25
+    },
+    "visual_strain_index": {
+        "eye": 0.40,
+        "screen": 0.30,
+        "sitting": 0.30
+    },
+    "cognitive_load_index": {
+        "workload": 0.30,
+        "weekend": 0.20,
+        "overload": 0.20,
+        "publish": 0.15,
+        "who5_inverse": 0.15
+    },
+    "msk_risk_index": {
+        "msk_pain": 0.80,
+        "activity": 0.20
+    },
+    "lifestyle_risk_index": {
+        "sleep_deficit": 0.30,
+        "hydration_deficit": 0.20,
+        "inactivity": 0.30,
+        "commute": 0.20
+    },
+    # v1 heuristic weights (domain-driven, explainable)
+    "overall_risk_index": {
+        "posture_risk_index": 0.30,
+        "cognitive_load_index": 0.25,
+        "visual_strain_index": 0.20,
+        "msk_risk_index": 0.20,
+        "lifestyle_risk_index": 0.05
+    }
+}
+
+
 # -------------------------
 # Feature Builder
 # -------------------------
@@ -49,7 +98,6 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
         - lifestyle_risk_index
         - overall_risk_index
     """
-    print(df.isna().sum())
     df = df.copy()
     features = pd.DataFrame(index=df.index)
 
@@ -85,7 +133,6 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
 
     workload_hours_total = df["teaching_hours"] + df["admin_hours"]
 
-    MAX_WORKLOAD = 50.0  # heuristic upper bound
     workload_hours_normalized = clamp(workload_hours_total / MAX_WORKLOAD)
 
     weekend_norm = df["weekend_work"] / 4.0
@@ -104,12 +151,13 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
 
     neck_back_norm = (df["neck_pain"] + df["lower_back_pain"]) / 10.0
 
+    w = INDEX_WEIGHTS["posture_risk_index"]
     posture_risk = (
-        0.25 * sitting_norm +
-        0.25 * workspace_norm +
-        0.15 * screen_norm +
-        0.10 * feet_norm +
-        0.25 * neck_back_norm
+        w["sitting"] * sitting_norm +
+        w["workspace"] * workspace_norm +
+        w["screen"] * screen_norm +
+        w["feet"] * feet_norm +
+        w["neck_back"] * neck_back_norm
     )
 
     features["posture_risk_index"] = scale_0_100(posture_risk)
@@ -121,10 +169,11 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
 
     eye_norm = df["eye_strain"] / 5.0
 
+    w = INDEX_WEIGHTS["visual_strain_index"]
     visual_risk = (
-        0.40 * eye_norm +
-        0.30 * screen_norm +
-        0.30 * sitting_norm
+        w["eye"] * eye_norm +
+        w["screen"] * screen_norm +
+        w["sitting"] * sitting_norm
     )
 
     features["visual_strain_index"] = scale_0_100(visual_risk)
@@ -134,12 +183,13 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
     # Cognitive Load Index
     # --------------------------------------------------
 
+    w = INDEX_WEIGHTS["cognitive_load_index"]
     cognitive_risk = (
-        0.30 * workload_hours_normalized +
-        0.20 * weekend_norm +
-        0.20 * overload_norm +
-        0.15 * publish_norm +
-        0.15 * who5_stress_inverse
+        w["workload"] * workload_hours_normalized +
+        w["weekend"] * weekend_norm +
+        w["overload"] * overload_norm +
+        w["publish"] * publish_norm +
+        w["who5_inverse"] * who5_stress_inverse
     )
 
     features["cognitive_load_index"] = scale_0_100(cognitive_risk)
@@ -154,9 +204,10 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
         ["neck_pain", "lower_back_pain", "wrist_pain", "shoulder_pain", "leg_pain"]
     ].mean(axis=1) / 5.0
 
+    w = INDEX_WEIGHTS["msk_risk_index"]
     msk_risk = (
-        0.80 * msk_avg +
-        0.20 * activity_norm
+        w["msk_pain"] * msk_avg +
+        w["activity"] * activity_norm
     )
 
     features["msk_risk_index"] = scale_0_100(msk_risk)
@@ -171,11 +222,12 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
     activity_life_norm = df["physical_activity"] / 3.0
     commute_norm = df["commute_time"] / 3.0
 
+    w = INDEX_WEIGHTS["lifestyle_risk_index"]
     lifestyle_risk = (
-        0.30 * (1.0 - sleep_norm) +
-        0.20 * (1.0 - hydration_norm) +
-        0.30 * (1.0 - activity_life_norm) +
-        0.20 * commute_norm
+        w["sleep_deficit"] * (1.0 - sleep_norm) +
+        w["hydration_deficit"] * (1.0 - hydration_norm) +
+        w["inactivity"] * (1.0 - activity_life_norm) +
+        w["commute"] * commute_norm
     )
 
     features["lifestyle_risk_index"] = scale_0_100(lifestyle_risk)
@@ -191,12 +243,13 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
     # MSK:       20%
     # lifestyle: 5%
 
+    w = INDEX_WEIGHTS["overall_risk_index"]
     overall_risk = (
-        0.30 * (features["posture_risk_index"] / 100.0) +
-        0.25 * (features["cognitive_load_index"] / 100.0) +
-        0.20 * (features["visual_strain_index"] / 100.0) +
-        0.20 * (features["msk_risk_index"] / 100.0) +
-        0.05 * (features["lifestyle_risk_index"] / 100.0)
+        w["posture_risk_index"] * (features["posture_risk_index"] / 100.0) +
+        w["cognitive_load_index"] * (features["cognitive_load_index"] / 100.0) +
+        w["visual_strain_index"] * (features["visual_strain_index"] / 100.0) +
+        w["msk_risk_index"] * (features["msk_risk_index"] / 100.0) +
+        w["lifestyle_risk_index"] * (features["lifestyle_risk_index"] / 100.0)
     )
 
     features["overall_risk_index"] = scale_0_100(overall_risk)
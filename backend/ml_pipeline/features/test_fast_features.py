@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_pipeline.data.synthetic.generate_synthetic import generate_row
+from ml_pipeline.preprocessing.encoder import encode
+from ml_pipeline.features.feature_builder import build_features
+from ml_pipeline.features.fast_features import INDEX_COLUMNS, build_feature_vector
+
+
+def pandas_path(raw: dict) -> np.ndarray:
+    features = build_features(encode(pd.DataFrame([raw])))
+    return features[INDEX_COLUMNS].to_numpy()[0]
+
+
+def assert_parity(raw: dict):
+    expected = pandas_path(raw)
+    actual = build_feature_vector(raw)
+    # Exact match, NaN == NaN
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_parity_on_synthetic_rows():
+    random.seed(7)
+    for _ in range(500):
+        assert_parity(generate_row())
+
+
+def test_parity_on_unmapped_answers():
+    random.seed(11)
+    row = generate_row()
+
+    # Unknown answers -> NaN (or encoder fill values)
+    for field in ["weekend_work", "sleep_hours", "physical_activity",
+                  "workspace_setup", "screen_position", "who5_q3"]:
+        raw = dict(row)
+        raw[field] = "Not a listed option"
+        assert_parity(raw)
+
+    # Answers only present in the encoder maps
+    assert_parity({**row, "sleep_hours": "6 - 7 hours"})
+    assert_parity({**row, "most_discomfort_activity": "Sitting"})
+    assert_parity({**row, "physical_activity": "Sedentary"})
+
+
+def test_parity_on_numeric_edge_cases():
+    random.seed(13)
+    row = generate_row()
+
+    assert_parity({**row, "teaching_hours": 40, "admin_hours": 35})  # workload clamp
+    assert_parity({**row, "teaching_hours": 12.5, "admin_hours": 3.25})
+    assert_parity({**row, "neck_pain": 4.9, "eye_strain": "3"})      # astype(int)
+    assert_parity({**row, "teaching_hours": float("nan")})
+
+
+def test_preallocated_output_is_filled_in_place():
+    random.seed(17)
+    row = generate_row()
+    out = np.zeros(len(INDEX_COLUMNS))
+
+    result = build_feature_vector(row, out=out)
+
+    assert result is out
+    np.testing.assert_array_equal(out, pandas_path(row))
+
+
+def test_rejects_what_pandas_rejects():
+    random.seed(19)
+    row = generate_row()
+
+    for raw in [{**row, "neck_pain": "abc"}, {**row, "teaching_hours": "18"}]:
+        with pytest.raises(Exception):
+            pandas_path(raw)
+        with pytest.raises(Exception):
+            build_feature_vector(raw)
@@ -0,0 +1,58 @@
+"""
+Benchmark: native XGBoost booster vs flattened NumPy TreeEnsemble.
+
+Run from backend/ after training the model:
+    python -m ml_pipeline.models.bench_tree_ensemble
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+
+import config
+from ml_pipeline.models.tree_ensemble import compile_model
+
+
+BATCH_SIZES = [1, 64, 100_000]
+
+
+def time_call(fn, X, repeats: int) -> float:
+    fn(X)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(X)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    model = XGBClassifier()
+    model.load_model(str(config.MODEL_PATH))
+    ensemble = compile_model(config.MODEL_PATH)
+
+    print(
+        f"Model: {ensemble.num_trees} trees, max depth {ensemble.max_depth}, "
+        f"{ensemble.nodes_per_tree} nodes/tree"
+    )
+
+    rng = np.random.default_rng(0)
+    columns = ensemble.feature_names
+
+    print(f"\n{'batch':>8s} {'xgboost':>12s} {'numpy':>12s} {'speedup':>8s} {'max |dp|':>10s}")
+    for n in BATCH_SIZES:
+        X = pd.DataFrame(rng.uniform(0, 100, (n, len(columns))), columns=columns)
+        repeats = max(3, min(1000, 100_000 // n))
+
+        t_xgb = time_call(model.predict_proba, X, repeats)
+        t_np = time_call(ensemble.predict_proba, X, repeats)
+        diff = np.abs(model.predict_proba(X) - ensemble.predict_proba(X)).max()
+
+        print(
+            f"{n:>8d} {t_xgb * 1e6:>10.1f}us {t_np * 1e6:>10.1f}us "
+            f"{t_xgb / t_np:>7.1f}x {diff:>10.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
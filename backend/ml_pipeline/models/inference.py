@@ -1,44 +1,61 @@
+from typing import Dict, List
+
+import numpy as np
 import pandas as pd
-from xgboost import XGBClassifier
 
+import config
 from ml_pipeline.preprocessing.encoder import encode
 from ml_pipeline.features.feature_builder import build_features
+from ml_pipeline.features.fast_features import INDEX_COLUMNS, build_feature_vector
+from ml_pipeline.models.tree_ensemble import load_compiled
+from resources import get_model
+
 
+MODEL_PATH = str(config.MODEL_PATH)
 
-MODEL_PATH = "ml_pipeline/models/xgboost_risk_model.json"
+# Model inputs (overall_risk_index is not a training feature)
+FEATURE_COLUMNS = INDEX_COLUMNS[:-1]
+N_MODEL_FEATURES = len(FEATURE_COLUMNS)
 
 
 def load_model():
-    model = XGBClassifier()
-    model.load_model(MODEL_PATH)
-    return model
+    """
+    Returns an object exposing predict_proba().
+
+    The default "numpy" backend compiles the XGBoost JSON into a
+    TreeEnsemble, so serving does not import xgboost at all.
+    """
+    if config.MODEL_BACKEND == "xgboost":
+        from xgboost import XGBClassifier
+
+        model = XGBClassifier()
+        model.load_model(MODEL_PATH)
+        return model
+
+    return load_compiled(MODEL_PATH)
 
 
 def predict_single(raw_input: dict) -> dict:
     """
     Takes one faculty response (raw form dict),
     returns prediction + probabilities + risk indices.
-    """
-
-    # Convert dict to DataFrame
-    df = pd.DataFrame([raw_input])
 
-    # Encode
-    encoded = encode(df)
+    Uses the pandas-free fast path (features.fast_features), which is
+    bit-identical to encode() -> build_features().
+    """
 
-    # Feature engineering
-    features = build_features(encoded)
+    # Feature engineering straight into a NumPy vector
+    features = build_feature_vector(raw_input)
 
-    # Load model
-    model = load_model()
+    # Shared, already-loaded model (see resources.py)
+    model = get_model()
 
     # Drop overall_risk_index (we did not train on it)
-    X = features.drop(columns=["overall_risk_index"])
-
-    # Predict
-    pred_label = int(model.predict(X)[0])
+    X = features[:N_MODEL_FEATURES].reshape(1, -1)
 
+    # Predict (argmax of the probabilities == model.predict for softprob)
     probs = model.predict_proba(X)[0]
+    pred_label = int(np.argmax(probs))
 
     result = {
         "predicted_label": pred_label,
@@ -48,21 +65,112 @@ def predict_single(raw_input: dict) -> dict:
             "high": float(probs[2])
         },
         "risk_indices": {
-            "posture_risk_index": float(features["posture_risk_index"].iloc[0]),
-            "visual_strain_index": float(features["visual_strain_index"].iloc[0]),
-            "cognitive_load_index": float(features["cognitive_load_index"].iloc[0]),
-            "msk_risk_index": float(features["msk_risk_index"].iloc[0]),
-            "lifestyle_risk_index": float(features["lifestyle_risk_index"].iloc[0]),
-            "overall_risk_index": float(features["overall_risk_index"].iloc[0])
+            col: float(v) for col, v in zip(INDEX_COLUMNS, features)
         }
     }
-    print("FEATURES ROW:")
-    print(features.iloc[0])
-    print("ANY NAN?")
-    print(features.iloc[0].isna())
 
     return result
 
+
+def _featurize_rows(raw_inputs: List[Dict], offset: int = 0):
+    """
+    Encodes + feature-engineers a list of raw responses in one pandas pass.
+
+    One malformed row makes the whole vectorized pass fail, so on failure
+    the batch is bisected until the offending rows are isolated; healthy
+    halves are still featurized in bulk.
+
+    Output:
+        (list of feature DataFrames indexed by input position,
+         {position: error message})
+    """
+    try:
+        features = build_features(encode(pd.DataFrame(raw_inputs)))
+        features.index = range(offset, offset + len(raw_inputs))
+        return [features], {}
+    except Exception as e:
+        if len(raw_inputs) == 1:
+            return [], {offset: f"{type(e).__name__}: {e}"}
+
+    mid = len(raw_inputs) // 2
+    left_frames, left_errors = _featurize_rows(raw_inputs[:mid], offset)
+    right_frames, right_errors = _featurize_rows(raw_inputs[mid:], offset + mid)
+    return left_frames + right_frames, {**left_errors, **right_errors}
+
+
+def _featurize_rows_fast(raw_inputs: List[Dict]):
+    """
+    Fast-path featurization of each row into one preallocated matrix.
+    Failures are naturally isolated per row.
+
+    Output:
+        (positions of valid rows, (n_valid, 6) feature matrix,
+         {position: error message})
+    """
+    features = np.empty((len(raw_inputs), len(INDEX_COLUMNS)), dtype=np.float64)
+    errors = {}
+
+    for i, raw in enumerate(raw_inputs):
+        try:
+            build_feature_vector(raw, out=features[i])
+        except Exception as e:
+            errors[i] = f"{type(e).__name__}: {e}"
+
+    if not errors:
+        return np.arange(len(raw_inputs)), features, errors
+
+    rows = np.array([i for i in range(len(raw_inputs)) if i not in errors], dtype=np.int64)
+    return rows, features[rows], errors
+
+
+def predict_batch(raw_inputs: List[Dict]) -> Dict:
+    """
+    Scores many faculty responses with one featurization pass and one
+    predict_proba call.
+
+    Featurization uses the per-row fast path, which beats pandas' fixed
+    overhead until batches reach config.PANDAS_BATCH_MIN_ROWS rows; above
+    that, encode() + build_features() run once over the whole frame.
+    Both produce identical features.
+
+    Output:
+        {
+            "row_index": positions (into raw_inputs) of successfully scored rows,
+            "predicted_labels": int array aligned with row_index,
+            "probabilities": (n, 3) array aligned with row_index,
+            "risk_indices": (n, 6) array aligned with row_index,
+            "index_columns": column names of risk_indices,
+            "errors": {position: error message} for rows that failed
+        }
+    """
+    if len(raw_inputs) >= config.PANDAS_BATCH_MIN_ROWS:
+        frames, errors = _featurize_rows(raw_inputs)
+        if frames:
+            features = frames[0] if len(frames) == 1 else pd.concat(frames)
+            rows = features.index.to_numpy()
+            indices = features[INDEX_COLUMNS].to_numpy(dtype=np.float64)
+        else:
+            rows = np.empty(0, dtype=np.int64)
+            indices = np.empty((0, len(INDEX_COLUMNS)))
+    else:
+        rows, indices, errors = _featurize_rows_fast(raw_inputs)
+
+    if len(rows) == 0:
+        probs = np.empty((0, 3))
+    else:
+        model = get_model()
+        probs = model.predict_proba(indices[:, :N_MODEL_FEATURES])
+
+    return {
+        "row_index": rows,
+        "predicted_labels": np.argmax(probs, axis=1),
+        "probabilities": probs,
+        "risk_indices": indices,
+        "index_columns": INDEX_COLUMNS,
+        "errors": errors
+    }
+
+
 if __name__ == "__main__":
     sample = pd.read_csv("ml_pipeline/data/synthetic/synthetic.csv").iloc[0].to_dict()
     print("Sample input:", sample)
@@ -1,5 +1,7 @@
 from typing import Dict, List
 
+import numpy as np
+
 
 # -----------------------------
 # Thresholds (domain-tuned v1)
@@ -73,6 +75,89 @@ def interpret_risk(inference_output: Dict) -> Dict:
 
     return interpretation
 
+
+def interpret_risk_batch(
+    predicted_labels: np.ndarray,
+    probabilities: np.ndarray,
+    indices: np.ndarray,
+    index_columns: List[str]
+) -> List[Dict]:
+    """
+    Vectorized interpret_risk over a batch.
+
+    Input:
+        predicted_labels: (n,) int array
+        probabilities:    (n, 3) array (low, moderate, high)
+        indices:          (n, k) array of risk indices
+        index_columns:    the k index names, in column order
+
+    Output:
+        List of n interpretations, identical to calling interpret_risk
+        on each row.
+    """
+    n = len(indices)
+    if n == 0:
+        return []
+
+    indices = np.asarray(indices, dtype=float)
+    col_pos = {c: j for j, c in enumerate(index_columns)}
+
+    # Domain flags
+    domain_cols = list(DOMAIN_THRESHOLDS.keys())
+    domain_names = [d.replace("_risk_index", "") for d in domain_cols]
+    thresholds = np.array([DOMAIN_THRESHOLDS[d] for d in domain_cols], dtype=float)
+
+    values = indices[:, [col_pos[d] for d in domain_cols]]
+    is_high = values >= thresholds
+    is_moderate = ~is_high & (values >= thresholds - 15)
+
+    # Primary driver: same candidate set / tie-breaking as interpret_risk
+    driver_scores = indices.copy()
+    for j, col in enumerate(index_columns):
+        if "risk_index" not in col:
+            driver_scores[:, j] = -1
+    primary_idx = np.argmax(driver_scores, axis=1)
+    driver_names = [c.replace("_risk_index", "") for c in index_columns]
+
+    # Confidence
+    confidence = probabilities.max(axis=1)
+    confidence_level = np.select(
+        [confidence >= 0.85, confidence >= 0.65, confidence >= 0.45],
+        ["Very High", "High", "Moderate"],
+        default="Low"
+    )
+
+    # NaN indices make Python's max() order-dependent; defer those rows
+    # to the scalar implementation so results stay identical.
+    has_nan = np.isnan(driver_scores).any(axis=1)
+
+    results = []
+    for i in range(n):
+        if has_nan[i]:
+            results.append(interpret_risk({
+                "predicted_label": int(predicted_labels[i]),
+                "probabilities": {
+                    "low": float(probabilities[i, 0]),
+                    "moderate": float(probabilities[i, 1]),
+                    "high": float(probabilities[i, 2])
+                },
+                "risk_indices": {
+                    c: float(v) for c, v in zip(index_columns, indices[i])
+                }
+            }))
+            continue
+
+        results.append({
+            "overall_risk_level": LABEL_MAP[int(predicted_labels[i])],
+            "confidence_score": float(confidence[i]),
+            "confidence_level": str(confidence_level[i]),
+            "primary_risk_driver": driver_names[primary_idx[i]],
+            "high_risk_domains": [d for d, f in zip(domain_names, is_high[i]) if f],
+            "moderate_risk_domains": [d for d, f in zip(domain_names, is_moderate[i]) if f]
+        })
+
+    return results
+
 if __name__ == "__main__":
     from ml_pipeline.models.inference import predict_single
     import pandas as pd
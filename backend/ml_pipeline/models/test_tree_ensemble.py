@@ -0,0 +1,114 @@
+import os
+import random
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgboost = pytest.importorskip("xgboost")
+
+from ml_pipeline.data.synthetic.generate_synthetic import generate_dataset
+from ml_pipeline.preprocessing.encoder import encode
+from ml_pipeline.features.feature_builder import build_features
+from ml_pipeline.labels.risk_labeler import label_risk
+from ml_pipeline.models.tree_ensemble import (
+    TreeEnsemble,
+    compile_model,
+    compiled_path,
+    file_sha256,
+    load_compiled
+)
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    random.seed(3)
+    features = build_features(encode(generate_dataset(400)))
+    y = label_risk(features)
+    X = features.drop(columns=["overall_risk_index"])
+
+    model = xgboost.XGBClassifier(
+        objective="multi:softprob",
+        num_class=3,
+        n_estimators=60,
+        max_depth=4,
+        learning_rate=0.1,
+        random_state=42
+    )
+    model.fit(X, y)
+
+    path = tmp_path_factory.mktemp("model") / "model.json"
+    model.save_model(path)
+    return model, path, X
+
+
+def test_predict_proba_matches_xgboost(trained):
+    model, path, X = trained
+    ensemble = compile_model(path)
+
+    np.testing.assert_allclose(
+        ensemble.predict_proba(X), model.predict_proba(X), atol=1e-6
+    )
+
+
+def test_missing_values_follow_default_direction(trained):
+    model, path, X = trained
+    ensemble = compile_model(path)
+
+    rng = np.random.default_rng(0)
+    X_missing = X.to_numpy(dtype=np.float32).copy()
+    X_missing[rng.random(X_missing.shape) < 0.2] = np.nan
+    X_missing = pd.DataFrame(X_missing, columns=X.columns)
+
+    np.testing.assert_allclose(
+        ensemble.predict_proba(X_missing), model.predict_proba(X_missing), atol=1e-6
+    )
+
+
+def test_single_row_and_npz_round_trip(trained, tmp_path):
+    model, path, X = trained
+    ensemble = compile_model(path)
+    ensemble.save(tmp_path / "model.npz")
+    loaded = TreeEnsemble.load(tmp_path / "model.npz")
+
+    row = X.to_numpy()[0]
+    np.testing.assert_allclose(
+        loaded.predict_proba(row), model.predict_proba(X.iloc[[0]]), atol=1e-6
+    )
+    assert loaded.feature_names == list(X.columns)
+    assert loaded.source_sha256 == file_sha256(path)
+
+
+def test_compiled_model_is_reused_while_the_json_is_unchanged(trained, tmp_path, monkeypatch):
+    _, path, _ = trained
+    json_path = tmp_path / "model.json"
+    shutil.copy(path, json_path)
+    load_compiled(json_path)
+
+    # A checkout gives the JSON a newer mtime than the .npz
+    npz_mtime = compiled_path(json_path).stat().st_mtime
+    os.utime(json_path, (npz_mtime + 60, npz_mtime + 60))
+    monkeypatch.setattr("ml_pipeline.models.tree_ensemble.compile_model", None)
+
+    assert load_compiled(json_path).source_sha256 == file_sha256(json_path)
+
+
+def test_compiled_model_is_rebuilt_when_the_json_changes(trained, tmp_path):
+    model, path, X = trained
+    json_path = tmp_path / "model.json"
+    shutil.copy(path, json_path)
+    load_compiled(json_path)
+    npz_path = compiled_path(json_path)
+    npz_mtime = npz_path.stat().st_mtime
+
+    # Retrained model, but the stale .npz looks newer
+    other = xgboost.XGBClassifier(objective="multi:softprob", num_class=3, n_estimators=5, max_depth=2)
+    other.fit(X, model.predict(X))
+    other.save_model(json_path)
+    os.utime(npz_path, (npz_mtime + 60, npz_mtime + 60))
+
+    ensemble = load_compiled(json_path)
+
+    assert ensemble.num_trees == 15
+    assert TreeEnsemble.load(npz_path).source_sha256 == file_sha256(json_path)
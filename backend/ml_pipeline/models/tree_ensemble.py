@@ -0,0 +1,374 @@
+"""
+Flattened NumPy evaluator for the XGBoost risk model.
+
+compile_model() turns xgboost_risk_model.json into contiguous node arrays
+(feature, threshold, children, default direction, leaf value), padded to
+one fixed-size block per tree. TreeEnsemble.predict_proba() scores any
+number of rows with a handful of vectorized lookups per feature, so
+serving needs neither xgboost nor a DMatrix, only json + numpy.
+
+Usage:
+    python -m ml_pipeline.models.tree_ensemble   # JSON -> .npz next to it
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+
+SUPPORTED_OBJECTIVES = ("multi:softprob", "multi:softmax")
+
+# Rows evaluated per vectorized block; small blocks keep the
+# (rows x trees) temporaries cache-resident
+BLOCK_ROWS = 256
+
+
+def _parse_base_score(raw: str, num_class: int) -> np.ndarray:
+    # Scalar ("5E-1") in older models, vector ("[a,b,c]") in xgboost >= 3
+    raw = raw.strip()
+    if raw.startswith("["):
+        values = [float(v) for v in raw.strip("[]").split(",")]
+    else:
+        values = [float(raw)] * num_class
+    return np.asarray(values, dtype=np.float32)
+
+
+def _tree_depth(left: list, right: list) -> int:
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, d)
+        else:
+            stack.append((left[node], d + 1))
+            stack.append((right[node], d + 1))
+    return depth
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+class TreeEnsemble:
+    """
+    Multi-class gradient boosted trees stored as flat arrays.
+
+    Node g of tree t lives at global index t * nodes_per_tree + local_id;
+    leaves (and padding) point to themselves. source_sha256 is the hash of
+    the JSON model it was compiled from.
+    """
+
+    ARRAYS = (
+        "feature", "threshold", "left", "right", "default_left",
+        "leaf_value", "tree_class", "base_score"
+    )
+
+    def __init__(self, feature, threshold, left, right, default_left,
+                 leaf_value, tree_class, base_score, max_depth,
+                 num_class, feature_names=None, source_sha256=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float32)
+        self.tree_class = np.ascontiguousarray(tree_class, dtype=np.int32)
+        self.base_score = np.ascontiguousarray(base_score, dtype=np.float32)
+        self.max_depth = int(max_depth)
+        self.num_class = int(num_class)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.source_sha256 = source_sha256
+
+        self.num_trees = len(self.tree_class)
+        self.nodes_per_tree = len(self.feature) // self.num_trees
+        self.roots = np.arange(self.num_trees, dtype=np.int32) * self.nodes_per_tree
+
+        # (trees x classes) 0/1 matrix: margins = leaf_values @ class_onehot
+        self.class_onehot = np.zeros((self.num_trees, self.num_class), dtype=np.float64)
+        self.class_onehot[np.arange(self.num_trees), self.tree_class] = 1.0
+
+        self._build_tables()
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+
+    def save(self, path: Union[str, Path]) -> None:
+        np.savez(
+            path,
+            max_depth=self.max_depth,
+            num_class=self.num_class,
+            feature_names=np.asarray(self.feature_names or [], dtype=str),
+            source_sha256=np.asarray(self.source_sha256 or ""),
+            **{name: getattr(self, name) for name in self.ARRAYS}
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "TreeEnsemble":
+        with np.load(path) as data:
+            names = [str(n) for n in data["feature_names"]]
+            return cls(
+                max_depth=int(data["max_depth"]),
+                num_class=int(data["num_class"]),
+                feature_names=names or None,
+                source_sha256=cls.stored_source(data),
+                **{name: data[name] for name in cls.ARRAYS}
+            )
+
+    @staticmethod
+    def stored_source(data) -> Union[str, None]:
+        # Files saved before the source hash was recorded have none
+        if "source_sha256" not in data.files:
+            return None
+        return str(data["source_sha256"]) or None
+
+    # -------------------------
+    # Scoring tables
+    # -------------------------
+    # QuickScorer-style bitvectors: number every tree's leaves left to right.
+    # A node whose test is false (x >= threshold) rules out all leaves of
+    # its left subtree; the exit leaf is the leftmost leaf still allowed.
+    # For a feature, the false nodes for value x are exactly those with
+    # threshold <= x, i.e. a prefix of the nodes sorted by threshold, so the
+    # AND of their masks can be precomputed per prefix length and looked up
+    # with one searchsorted per feature.
+
+    def _build_tables(self) -> None:
+        T = self.num_trees
+        M = self.nodes_per_tree
+
+        leaf_ids = []         # per tree: local node id of each leaf, in order
+        node_masks = {}       # global node id -> bitmask of its left-subtree leaves
+        for t in range(T):
+            root = t * M
+            leaves = []
+
+            def visit(g):
+                if self.left[g] == g:
+                    leaves.append(g)
+                    return 1 << (len(leaves) - 1)
+                left_mask = visit(self.left[g])
+                right_mask = visit(self.right[g])
+                node_masks[g] = left_mask
+                return left_mask | right_mask
+
+            visit(root)
+            leaf_ids.append(leaves)
+
+        max_leaves = max(len(leaves) for leaves in leaf_ids)
+        if max_leaves > 64:
+            raise ValueError(f"Trees with {max_leaves} leaves exceed the 64-bit leaf masks")
+        mask_dtype = next(
+            dt for dt, bits in ((np.uint8, 8), (np.uint16, 16), (np.uint32, 32), (np.uint64, 64))
+            if max_leaves <= bits
+        )
+        all_ones = np.iinfo(mask_dtype).max
+
+        # Lowest-set-bit lookup for narrow masks (log2 fallback for wide ones)
+        if max_leaves <= 16:
+            values = np.arange(1 << np.iinfo(mask_dtype).bits, dtype=np.int64)
+            lowest = values & -values
+            self._lowest_bit = np.zeros(len(values), dtype=np.int32)
+            self._lowest_bit[1:] = np.log2(lowest[1:]).astype(np.int32)
+        else:
+            self._lowest_bit = None
+
+        # Leaf values by (tree, leaf ordinal), flattened
+        leaf_table = np.zeros((T, max_leaves), dtype=np.float32)
+        for t, leaves in enumerate(leaf_ids):
+            leaf_table[t, :len(leaves)] = self.leaf_value[leaves]
+        self._leaf_table = leaf_table.ravel()
+        self._leaf_offsets = (np.arange(T, dtype=np.int32) * max_leaves)[None, :]
+
+        # Per-feature threshold-sorted prefix masks
+        n_features = int(self.feature.max()) + 1 if node_masks else 0
+        self._thresholds = []
+        self._prefix_masks = []
+        for f in range(n_features):
+            nodes = [g for g in node_masks if self.feature[g] == f]
+            nodes.sort(key=lambda g: self.threshold[g])
+
+            # rows: 0 = no node false, k = first k nodes false, last = missing value
+            prefix = np.empty((len(nodes) + 2, T), dtype=mask_dtype)
+            current = np.full(T, all_ones, dtype=mask_dtype)
+            prefix[0] = current
+            for k, g in enumerate(nodes, start=1):
+                current[g // M] &= mask_dtype(~node_masks[g] & all_ones)
+                prefix[k] = current
+
+            missing = np.full(T, all_ones, dtype=mask_dtype)
+            for g in nodes:
+                if not self.default_left[g]:
+                    missing[g // M] &= mask_dtype(~node_masks[g] & all_ones)
+            prefix[-1] = missing
+
+            self._thresholds.append(self.threshold[nodes])
+            self._prefix_masks.append(prefix)
+
+    def _leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """
+        (rows x trees) leaf ordinals reached by each row.
+        """
+        masks = None
+        for f, (thresholds, prefix) in enumerate(zip(self._thresholds, self._prefix_masks)):
+            x = X[:, f]
+            k = np.searchsorted(thresholds, x, side="right")
+            k[np.isnan(x)] = len(prefix) - 1
+            masks = prefix[k] if masks is None else masks & prefix[k]
+
+        if masks is None:  # every tree is a single leaf
+            return np.zeros((X.shape[0], self.num_trees), dtype=np.int32)
+
+        # Index of the lowest set bit (powers of two are exact in float64)
+        if self._lowest_bit is not None:
+            return self._lowest_bit[masks]
+        lowest = masks & (~masks + 1)
+        return np.log2(lowest).astype(np.int32)
+
+    # -------------------------
+    # Scoring
+    # -------------------------
+
+    def predict_margin(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        margins = np.empty((X.shape[0], self.num_class), dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            leaves = self._leaf_table[self._leaf_indices(block) + self._leaf_offsets]
+            margins[start:start + len(block)] = leaves @ self.class_onehot
+
+        margins += self.base_score
+        return margins
+
+    def predict_proba(self, X) -> np.ndarray:
+        margins = self.predict_margin(X)
+        margins -= margins.max(axis=1, keepdims=True)
+        np.exp(margins, out=margins)
+        margins /= margins.sum(axis=1, keepdims=True)
+        return margins
+
+    def predict(self, X) -> np.ndarray:
+        return np.argmax(self.predict_margin(X), axis=1)
+
+
+# -------------------------
+# Exporter
+# -------------------------
+
+def compile_model(json_path: Union[str, Path]) -> TreeEnsemble:
+    """
+    Compiles an XGBoost JSON model (as written by XGBClassifier.save_model)
+    into a TreeEnsemble. Only numerical splits are supported.
+    """
+    raw = Path(json_path).read_bytes()
+    learner = json.loads(raw)["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective not in SUPPORTED_OBJECTIVES:
+        raise ValueError(f"Unsupported objective for TreeEnsemble: {objective}")
+
+    params = learner["learner_model_param"]
+    num_class = int(params["num_class"])
+    base_score = _parse_base_score(params["base_score"], num_class)
+
+    booster = learner["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"Unsupported booster for TreeEnsemble: {booster['name']}")
+
+    trees = booster["model"]["trees"]
+    tree_info = booster["model"]["tree_info"]
+
+    nodes_per_tree = max(len(t["left_children"]) for t in trees)
+    size = len(trees) * nodes_per_tree
+
+    feature = np.zeros(size, dtype=np.int32)
+    threshold = np.full(size, np.nan, dtype=np.float32)
+    left = np.zeros(size, dtype=np.int32)
+    right = np.zeros(size, dtype=np.int32)
+    default_left = np.zeros(size, dtype=bool)
+    leaf_value = np.zeros(size, dtype=np.float32)
+    max_depth = 0
+
+    for t, tree in enumerate(trees):
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits are not supported by TreeEnsemble")
+
+        offset = t * nodes_per_tree
+        lc = tree["left_children"]
+        rc = tree["right_children"]
+        max_depth = max(max_depth, _tree_depth(lc, rc))
+
+        for i in range(nodes_per_tree):
+            g = offset + i
+            if i >= len(lc) or lc[i] == -1:
+                # Leaf (or padding): self-loop
+                left[g] = right[g] = g
+                if i < len(lc):
+                    leaf_value[g] = tree["split_conditions"][i]
+                continue
+
+            feature[g] = tree["split_indices"][i]
+            threshold[g] = tree["split_conditions"][i]
+            left[g] = offset + lc[i]
+            right[g] = offset + rc[i]
+            default_left[g] = bool(tree["default_left"][i])
+
+    return TreeEnsemble(
+        feature=feature,
+        threshold=threshold,
+        left=left,
+        right=right,
+        default_left=default_left,
+        leaf_value=leaf_value,
+        tree_class=np.asarray(tree_info, dtype=np.int32),
+        base_score=base_score,
+        max_depth=max_depth,
+        num_class=num_class,
+        feature_names=learner.get("feature_names"),
+        source_sha256=hashlib.sha256(raw).hexdigest()
+    )
+
+
+def compiled_path(json_path: Union[str, Path]) -> Path:
+    return Path(json_path).with_suffix(".npz")
+
+
+def load_compiled(json_path: Union[str, Path]) -> TreeEnsemble:
+    """
+    Loads the compiled .npz next to json_path, (re)building it when it is
+    missing or was compiled from different JSON content. The check is by
+    content hash, not mtime: checkouts and copies do not keep mtimes.
+    """
+    json_path = Path(json_path)
+    npz_path = compiled_path(json_path)
+
+    if npz_path.exists():
+        with np.load(npz_path) as data:
+            stored = TreeEnsemble.stored_source(data)
+        if stored is not None and stored == file_sha256(json_path):
+            return TreeEnsemble.load(npz_path)
+
+    ensemble = compile_model(json_path)
+    try:
+        ensemble.save(npz_path)
+    except OSError:
+        pass  # read-only deployment: keep the in-memory compile
+    return ensemble
+
+
+if __name__ == "__main__":
+    import config
+
+    ensemble = compile_model(config.MODEL_PATH)
+    ensemble.save(compiled_path(config.MODEL_PATH))
+    print(
+        f"Compiled {ensemble.num_trees} trees (max depth {ensemble.max_depth}, "
+        f"{ensemble.nodes_per_tree} nodes/tree) -> {compiled_path(config.MODEL_PATH)}"
+    )
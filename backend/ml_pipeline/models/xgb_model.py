@@ -10,6 +10,7 @@ from xgboost import XGBClassifier
 from ml_pipeline.preprocessing.encoder import encode
 from ml_pipeline.features.feature_builder import build_features
 from ml_pipeline.labels.risk_labeler import label_risk
+from ml_pipeline.models.tree_ensemble import compile_model
 
 
 def main():
@@ -87,6 +88,12 @@ def main():
     model.save_model("ml_pipeline/models/xgboost_risk_model.json")
     print("\nModel saved to ml_pipeline/models/xgboost_risk_model.json")
 
+    # Compiled NumPy version used for serving
+    compile_model("ml_pipeline/models/xgboost_risk_model.json").save(
+        "ml_pipeline/models/xgboost_risk_model.npz"
+    )
+    print("Compiled model saved to ml_pipeline/models/xgboost_risk_model.npz")
+
 
 if __name__ == "__main__":
     main()
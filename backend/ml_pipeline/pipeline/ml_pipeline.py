@@ -1,9 +1,26 @@
-from typing import Dict
+from typing import Dict, List
 
 from ml_pipeline.preprocessing.encoder import encode
 from ml_pipeline.features.feature_builder import build_features
-from ml_pipeline.models.inference import predict_single
-from ml_pipeline.models.risk_interpreter import interpret_risk
+from ml_pipeline.models.inference import predict_batch, predict_single
+from ml_pipeline.models.risk_interpreter import interpret_risk, interpret_risk_batch
+
+
+def _combine(interpretation: Dict, inference_output: Dict) -> Dict:
+    return {
+        "prediction": {
+            "risk_label": interpretation["overall_risk_level"],
+            "confidence": interpretation["confidence_level"],
+            "confidence_score": interpretation["confidence_score"]
+        },
+        "risk_drivers": {
+            "primary": interpretation["primary_risk_driver"],
+            "high_domains": interpretation["high_risk_domains"],
+            "moderate_domains": interpretation["moderate_risk_domains"]
+        },
+        "risk_indices": inference_output["risk_indices"],
+        "model_probabilities": inference_output["probabilities"]
+    }
 
 
 def run_ml_pipeline(raw_input: Dict) -> Dict:
@@ -30,23 +47,71 @@ def run_ml_pipeline(raw_input: Dict) -> Dict:
     # --------------------------------------------------
     # Step 3: Combine outputs
     # --------------------------------------------------
-    result = {
-        "prediction": {
-            "risk_label": interpretation["overall_risk_level"],
-            "confidence": interpretation["confidence_level"],
-            "confidence_score": interpretation["confidence_score"]
-        },
-        "risk_drivers": {
-            "primary": interpretation["primary_risk_driver"],
-            "high_domains": interpretation["high_risk_domains"],
-            "moderate_domains": interpretation["moderate_risk_domains"]
-        },
-        "risk_indices": inference_output["risk_indices"],
-        "model_probabilities": inference_output["probabilities"]
-    }
+    result = _combine(interpretation, inference_output)
 
     return result
 
+
+def run_ml_pipeline_batch(raw_inputs: List[Dict]) -> List[Dict]:
+    """
+    Batch ML pipeline entry point.
+
+    Input:
+        raw_inputs: list of faculty form responses
+
+    Output:
+        One entry per input, in input order:
+        - {"index": i, "status": "ok", "result": <run_ml_pipeline output>}
+        - {"index": i, "status": "error", "error": "<reason>"}
+        A malformed row only fails its own entry.
+    """
+
+    # --------------------------------------------------
+    # Step 1: One vectorized inference pass
+    # --------------------------------------------------
+    batch = predict_batch(raw_inputs)
+
+    # --------------------------------------------------
+    # Step 2: Vectorized interpretation
+    # --------------------------------------------------
+    interpretations = interpret_risk_batch(
+        batch["predicted_labels"],
+        batch["probabilities"],
+        batch["risk_indices"],
+        batch["index_columns"]
+    )
+
+    # --------------------------------------------------
+    # Step 3: Combine outputs, restoring input order
+    # --------------------------------------------------
+    results: List[Dict] = [None] * len(raw_inputs)
+
+    index_cols = batch["index_columns"]
+    index_values = batch["risk_indices"]
+    probs = batch["probabilities"]
+
+    for pos, (row, interpretation) in enumerate(zip(batch["row_index"], interpretations)):
+        inference_output = {
+            "probabilities": {
+                "low": float(probs[pos, 0]),
+                "moderate": float(probs[pos, 1]),
+                "high": float(probs[pos, 2])
+            },
+            "risk_indices": {
+                col: float(v) for col, v in zip(index_cols, index_values[pos])
+            }
+        }
+        results[int(row)] = {
+            "index": int(row),
+            "status": "ok",
+            "result": _combine(interpretation, inference_output)
+        }
+
+    for row, error in batch["errors"].items():
+        results[row] = {"index": row, "status": "error", "error": error}
+
+    return results
+
 if __name__ == "__main__":
     import pandas as pd
 
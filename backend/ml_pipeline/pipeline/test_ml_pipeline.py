@@ -0,0 +1,120 @@
+import math
+import random
+
+import pytest
+
+xgboost = pytest.importorskip("xgboost")
+
+import config  # noqa: E402
+from ml_pipeline.data.synthetic.generate_synthetic import generate_dataset, generate_row  # noqa: E402
+from ml_pipeline.features.feature_builder import build_features  # noqa: E402
+from ml_pipeline.labels.risk_labeler import label_risk  # noqa: E402
+from ml_pipeline.models import inference  # noqa: E402
+from ml_pipeline.models.tree_ensemble import compile_model  # noqa: E402
+from ml_pipeline.pipeline.ml_pipeline import run_ml_pipeline, run_ml_pipeline_batch  # noqa: E402
+from ml_pipeline.preprocessing.encoder import encode  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def ensemble(tmp_path_factory):
+    random.seed(5)
+    features = build_features(encode(generate_dataset(300)))
+    y = label_risk(features)
+    X = features.drop(columns=["overall_risk_index"])
+
+    model = xgboost.XGBClassifier(
+        objective="multi:softprob",
+        num_class=3,
+        n_estimators=30,
+        max_depth=3,
+        random_state=42
+    )
+    model.fit(X, y)
+
+    path = tmp_path_factory.mktemp("model") / "model.json"
+    model.save_model(path)
+    return compile_model(path)
+
+
+@pytest.fixture(autouse=True)
+def model(ensemble, monkeypatch):
+    monkeypatch.setattr(inference, "get_model", lambda: ensemble)
+
+
+def rows(n: int = 40, seed: int = 9) -> list:
+    """
+    Synthetic responses, a few with unmapped answers (NaN indices) and a
+    few malformed ones.
+    """
+    random.seed(seed)
+    out = [generate_row() for _ in range(n)]
+    for i in range(0, n, 7):
+        out[i]["sleep_hours"] = "Not a listed option"
+        out[i]["workspace_setup"] = "Not a listed option"
+    del out[3]["neck_pain"]
+    out[11]["lower_back_pain"] = "lots"
+    return out
+
+
+def assert_same(actual, expected):
+    """
+    Equal nested results, NaN == NaN.
+    """
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert isinstance(actual, float) and math.isnan(actual)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-6, abs=1e-9)
+    else:
+        assert actual == expected
+
+
+def check_parity(raw_inputs: list):
+    results = run_ml_pipeline_batch(raw_inputs)
+
+    assert [r["index"] for r in results] == list(range(len(raw_inputs)))
+    for raw, result in zip(raw_inputs, results):
+        try:
+            expected = run_ml_pipeline(raw)
+        except Exception:
+            assert result["status"] == "error"
+            continue
+        assert result["status"] == "ok"
+        assert_same(result["result"], expected)
+    return results
+
+
+# -------------------------
+# Parity with run_ml_pipeline
+# -------------------------
+
+def test_batch_matches_per_row_pipeline():
+    results = check_parity(rows())
+
+    errors = {r["index"]: r["error"] for r in results if r["status"] == "error"}
+    assert sorted(errors) == [3, 11]
+    assert errors[3].startswith("KeyError")
+
+
+def test_nan_indices_are_scored_like_a_single_row():
+    raw = rows()[0]
+    result = run_ml_pipeline_batch([raw])[0]
+
+    assert math.isnan(result["result"]["risk_indices"]["posture_risk_index"])
+    assert_same(result["result"], run_ml_pipeline(raw))
+
+
+def test_pandas_path_matches_per_row_pipeline(monkeypatch):
+    monkeypatch.setattr(config, "PANDAS_BATCH_MIN_ROWS", 1)
+    check_parity(rows())
+
+
+def test_empty_and_all_malformed_batches():
+    assert run_ml_pipeline_batch([]) == []
+
+    bad = [{"neck_pain": 1}, {}]
+    results = run_ml_pipeline_batch(bad)
+    assert [r["status"] for r in results] == ["error", "error"]
@@ -1,3 +1,16 @@
+from itertools import product
+from typing import Iterator
+
+
+RISK_LABELS = ("Low", "Moderate", "High")
+
+# A 0-100 index that map_score_to_risk() puts in each label
+REPRESENTATIVE_INDEX = {"Low": 0, "Moderate": 50, "High": 100}
+
+# Used when the ML output carries no raw sitting_hours
+DEFAULT_SITTING_HOURS = 6
+
+
 def map_score_to_risk(score: float) -> str:
     """
     Converts 0-100 index into Low/Moderate/High
@@ -40,7 +53,7 @@ def build_rag_user_data(ml_output: dict) -> dict:
 
     if sitting_hours is None:
         # fallback estimate
-        sitting_hours = 6
+        sitting_hours = DEFAULT_SITTING_HOURS
 
     return {
         "posture_risk": posture_risk,
@@ -52,3 +65,20 @@ def build_rag_user_data(ml_output: dict) -> dict:
         "eye_strain": eye_strain,
         "stress_level": stress_level
     }
+
+
+def enumerate_rag_user_data() -> Iterator[dict]:
+    """
+    Every profile build_rag_user_data() can return for the ML output: one
+    per posture / vision / cognitive risk label combination (3^3). The ML
+    output carries no "raw" answers, so the discomfort fields are always
+    "No" and sitting_hours is DEFAULT_SITTING_HOURS.
+    """
+    for posture, vision, cognitive in product(RISK_LABELS, repeat=3):
+        yield build_rag_user_data({
+            "risk_indices": {
+                "posture_risk_index": REPRESENTATIVE_INDEX[posture],
+                "visual_strain_index": REPRESENTATIVE_INDEX[vision],
+                "cognitive_load_index": REPRESENTATIVE_INDEX[cognitive]
+            }
+        })
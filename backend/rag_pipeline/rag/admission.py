@@ -0,0 +1,193 @@
+"""
+Admission control for the local LLM.
+
+At most max_in_flight generations run at once; up to max_queue more wait
+for a slot in arrival order. Anything beyond that is rejected immediately
+with Overloaded, so a spike turns into fast 503s instead of every request
+slowing down together.
+
+A caller may pass a cancel event (e.g. set when an SSE client goes
+away); it is checked before queueing and while waiting, and a cancelled
+caller leaves the queue with Cancelled instead of taking the slot.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import config
+from metrics import metrics
+
+
+class Overloaded(Exception):
+    """Raised when no slot is free and the wait queue is full (or timed out)."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Cancelled(Exception):
+    """Raised when the caller's cancel event is set before it got a slot."""
+
+
+# How often a waiter with a cancel event wakes up to check it
+CANCEL_POLL_S = 0.1
+
+
+class AdmissionGate:
+
+    def __init__(
+        self,
+        max_in_flight: int = 1,
+        max_queue: int = 8,
+        wait_timeout_s: Optional[float] = 60.0,
+        name: str = "llm_gate"
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout_s
+        self.name = name
+
+        self._in_flight = 0
+        self._waiting = deque()   # tickets, FIFO
+        self._next_ticket = 0
+        self._cond = threading.Condition()
+
+        # Smoothed slot hold time, used for Retry-After
+        self._avg_hold_s = None
+
+        self._queue_wait = metrics.histogram(f"{name}.queue_wait_ms")
+        self._hold_time = metrics.histogram(f"{name}.hold_ms")
+        self._in_flight_gauge = metrics.gauge(f"{name}.in_flight")
+        self._waiting_gauge = metrics.gauge(f"{name}.waiting")
+        self._rejected = metrics.counter(f"{name}.rejected")
+        self._timeouts = metrics.counter(f"{name}.timeouts")
+
+    # -------------------------
+    # State
+    # -------------------------
+
+    def saturated(self) -> bool:
+        """
+        True if a new caller would be rejected right now.
+        """
+        with self._cond:
+            return self._in_flight >= self.max_in_flight and len(self._waiting) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely to free up, from the average hold
+        time and the current backlog.
+        """
+        with self._cond:
+            return self._retry_after()
+
+    def _retry_after(self) -> int:
+        # caller holds self._cond
+        if self._avg_hold_s is None:
+            return 1
+        backlog = (len(self._waiting) + 1) / self.max_in_flight
+        return max(1, math.ceil(self._avg_hold_s * backlog))
+
+    def _publish(self) -> None:
+        self._in_flight_gauge.set(self._in_flight)
+        self._waiting_gauge.set(len(self._waiting))
+
+    # -------------------------
+    # Acquire / release
+    # -------------------------
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> None:
+        enqueued_at = time.perf_counter()
+
+        with self._cond:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled(f"{self.name}: cancelled before queueing")
+
+            if self._in_flight < self.max_in_flight and not self._waiting:
+                self._in_flight += 1
+                self._publish()
+                self._queue_wait.observe(0.0)
+                return
+
+            if len(self._waiting) >= self.max_queue:
+                self._rejected.inc()
+                raise Overloaded(
+                    f"{self.name} is saturated ({self._in_flight} running, "
+                    f"{len(self._waiting)} waiting)",
+                    retry_after=self._retry_after()
+                )
+
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting.append(ticket)
+            self._publish()
+
+            deadline = None if self.wait_timeout is None else enqueued_at + self.wait_timeout
+            try:
+                while not (self._waiting[0] == ticket and self._in_flight < self.max_in_flight):
+                    remaining = None if deadline is None else deadline - time.perf_counter()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts.inc()
+                        raise Overloaded(
+                            f"{self.name}: no slot within {self.wait_timeout}s",
+                            retry_after=self._retry_after()
+                        )
+                    if cancel is not None:
+                        if cancel.is_set():
+                            raise Cancelled(f"{self.name}: cancelled while waiting for a slot")
+                        # Setting the event does not notify us; poll it
+                        remaining = CANCEL_POLL_S if remaining is None else min(remaining, CANCEL_POLL_S)
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._publish()
+                self._cond.notify_all()
+                raise
+
+            self._waiting.popleft()
+            self._in_flight += 1
+            self._publish()
+            # The next ticket may be admissible too (max_in_flight > 1)
+            self._cond.notify_all()
+
+        self._queue_wait.observe((time.perf_counter() - enqueued_at) * 1000)
+
+    def release(self, held_s: Optional[float] = None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if held_s is not None:
+                self._avg_hold_s = (
+                    held_s if self._avg_hold_s is None
+                    else 0.8 * self._avg_hold_s + 0.2 * held_s
+                )
+            self._publish()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cancel: Optional[threading.Event] = None):
+        """
+        with gate.slot(): ...  -- blocks for a slot or raises Overloaded
+        (Cancelled once `cancel` is set).
+        """
+        self.acquire(cancel)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - start
+            self._hold_time.observe(held * 1000)
+            self.release(held)
+
+
+# Shared by every code path that calls the LLM in this process
+llm_gate = AdmissionGate(
+    max_in_flight=config.LLM_MAX_IN_FLIGHT,
+    max_queue=config.LLM_MAX_QUEUE,
+    wait_timeout_s=config.LLM_QUEUE_TIMEOUT_S,
+    name="llm_gate"
+)
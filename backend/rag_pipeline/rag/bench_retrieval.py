@@ -0,0 +1,122 @@
+"""
+Benchmark: Chroma (HNSW + SQLite) vs in-memory NumpyIndex.
+
+Reports, per retrieval pattern, mean / p95 latency for both backends and
+recall@k of the NumpyIndex results against Chroma's.
+
+Run from backend/ after ingest:
+    python -m rag_pipeline.rag.bench_retrieval
+"""
+
+import random
+import time
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+import config
+from rag_pipeline.rag.index_store import current_index_dir
+from rag_pipeline.rag.ingest import DOMAIN_ANCHORS
+from rag_pipeline.rag.numpy_index import NumpyIndex
+from resources import get_embeddings
+
+
+K = 8
+REPORT_DOMAINS = {"general": 4, "posture": 8, "vision": 3, "cognitive": 3}
+SAMPLE_QUERIES = 100
+REPEATS = 3
+
+
+def percentile_ms(samples, q) -> float:
+    return float(np.percentile(samples, q)) * 1000
+
+
+def timed(fn, repeats: int = REPEATS):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, min(samples)
+
+
+def chroma_ids(chroma, vector, k: int, domain: str = None):
+    res = chroma._collection.query(
+        query_embeddings=[vector],
+        n_results=k,
+        where={"domain": domain} if domain else None,
+        include=[]
+    )
+    return res["ids"][0]
+
+
+def report(name: str, chroma_times, numpy_times, recalls) -> None:
+    print(
+        f"{name:<22s} "
+        f"{np.mean(chroma_times) * 1000:>9.2f} {percentile_ms(chroma_times, 95):>9.2f} "
+        f"{np.mean(numpy_times) * 1000:>9.2f} {percentile_ms(numpy_times, 95):>9.2f} "
+        f"{np.mean(recalls):>9.3f}"
+    )
+
+
+def main():
+    embeddings = get_embeddings()
+    chroma = Chroma(
+        persist_directory=str(current_index_dir(config.CHROMA_DIR)),
+        embedding_function=embeddings
+    )
+
+    start = time.perf_counter()
+    index = NumpyIndex.from_chroma(chroma)
+    load_s = time.perf_counter() - start
+    print(
+        f"NumpyIndex: {len(index)} chunks x {index.dim} dims, "
+        f"{index.vectors.nbytes / 1e6:.1f} MB, loaded in {load_s:.2f}s"
+    )
+    print("Domains:", {d: e - s for d, (s, e) in index.domain_slices.items()})
+
+    # Queries: the domain anchors plus the opening of random chunks
+    random.seed(0)
+    queries = list(DOMAIN_ANCHORS.values()) + [
+        index.texts[i][:300] for i in random.sample(range(len(index)), min(SAMPLE_QUERIES, len(index)))
+    ]
+    vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+
+    print(f"\n{len(queries)} queries, k={K}, best of {REPEATS} runs")
+    print(f"{'pattern':<22s} {'chroma ms':>9s} {'p95':>9s} {'numpy ms':>9s} {'p95':>9s} {'recall':>9s}")
+
+    # Single query, no filter / one domain filter
+    for domain in [None, "policy", "posture"]:
+        c_times, n_times, recalls = [], [], []
+        for v in vectors:
+            expected, t_c = timed(lambda: chroma_ids(chroma, v.tolist(), K, domain))
+            (rows, _), t_n = timed(lambda: index.search(v, K, {"domain": domain} if domain else None))
+            got = {index.ids[i] for i in rows[0]}
+            c_times.append(t_c)
+            n_times.append(t_n)
+            recalls.append(len(got & set(expected)) / max(len(expected), 1))
+        report(f"top-{K} {domain or 'all'}", c_times, n_times, recalls)
+
+    # The per-report pattern: several domains for one query
+    c_times, n_times, recalls = [], [], []
+    for v in vectors:
+        expected, t_c = timed(lambda: {
+            d: chroma_ids(chroma, v.tolist(), k, d) for d, k in REPORT_DOMAINS.items()
+        })
+        got, t_n = timed(lambda: index.search_domains(v, REPORT_DOMAINS))
+        c_times.append(t_c)
+        n_times.append(t_n)
+        for d in REPORT_DOMAINS:
+            ids = {index.ids[i] for i in got[d]}
+            recalls.append(len(ids & set(expected[d])) / max(len(expected[d]), 1))
+    report("report (4 domains)", c_times, n_times, recalls)
+
+    # Batched: every query in one GEMM
+    _, t_batch = timed(lambda: index.search(vectors, K))
+    print(f"\nNumpyIndex batched: {len(vectors)} queries in {t_batch * 1000:.2f} ms "
+          f"({t_batch / len(vectors) * 1e6:.1f} us/query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: report wall-clock time for
+
+    monolithic   one prompt for the whole report (rag_gen.generate_report)
+    hybrid       templates + one prompt for the Moderate / High sections
+    parallel     templates + one prompt per section, generated concurrently
+
+Run from backend/ after ingest:
+    python -m rag_pipeline.rag.bench_sections [--repeats 3] [--concurrency 3]
+    python -m rag_pipeline.rag.bench_sections --simulate --slots 3
+
+Parallel mode only helps when the LLM serves several requests at once
+(OLLAMA_NUM_PARALLEL > 1, or several replicas); with a single slot the
+sections queue behind each other. --simulate replaces Ollama with a cost
+model (fixed prefill / decode token rates, at most --slots generations at
+once) to show that effect without a GPU. It is optimistic: real decode
+slows down when a single GPU serves several streams.
+"""
+
+import argparse
+import re
+import threading
+import time
+
+import config
+from rag_pipeline.rag import report_renderer
+from rag_pipeline.rag.context_assembler import estimate_tokens
+from rag_pipeline.rag.rag_gen import generate_report, prompt_text, resolve_pinned
+from resources import get_llm, get_vectordb
+
+
+PROFILES = [
+    {
+        "posture_risk": "High", "vision_risk": "Low", "cognitive_risk": "Moderate",
+        "sitting_hours": 7, "neck_discomfort": "Yes", "back_discomfort": "Sometimes",
+        "eye_strain": "No", "stress_level": "Moderate"
+    },
+    {
+        "posture_risk": "High", "vision_risk": "High", "cognitive_risk": "High",
+        "sitting_hours": 9, "neck_discomfort": "Yes", "back_discomfort": "Yes",
+        "eye_strain": "Yes", "stress_level": "High"
+    },
+    {
+        "posture_risk": "Moderate", "vision_risk": "Moderate", "cognitive_risk": "Low",
+        "sitting_hours": 6, "neck_discomfort": "No", "back_discomfort": "No",
+        "eye_strain": "Sometimes", "stress_level": "Low"
+    },
+]
+
+
+class SimulatedLLM:
+    """
+    Sleeps for prefill + decode time. Output length: report_tokens for the
+    monolithic prompt, section_tokens per requested section otherwise.
+    """
+
+    def __init__(
+        self,
+        prefill_tps: float = 400.0,
+        decode_tps: float = 20.0,
+        slots: int = 1,
+        report_tokens: int = 900,
+        section_tokens: int = 180
+    ):
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.report_tokens = report_tokens
+        self.section_tokens = section_tokens
+        self._slots = threading.Semaphore(slots)
+
+    def invoke(self, messages) -> str:
+        prompt = prompt_text(messages)
+        sections = []
+        if "SECTIONS TO WRITE:" in prompt:
+            listed = prompt.split("SECTIONS TO WRITE:", 1)[1].split("USER DATA (JSON):", 1)[0]
+            sections = re.findall(r"^- (.+) \((Moderate|High)\)$", listed, re.M)
+        output_tokens = self.section_tokens * len(sections) if sections else self.report_tokens
+
+        with self._slots:
+            time.sleep(estimate_tokens(prompt) / self.prefill_tps + output_tokens / self.decode_tps)
+
+        return "".join(
+            f"### {heading}\n- Risk Level: {level}\n- Recommendations: ...\n- Why This Helps: ...\n\n"
+            for heading, level in sections
+        )
+
+
+def run_mode(mode: str, llm, vectordb, pinned, user_data) -> float:
+    start = time.perf_counter()
+    if mode == "monolithic":
+        generate_report(llm, vectordb, user_data, pinned=pinned)
+    else:
+        config.REPORT_SECTION_MODE = "parallel" if mode == "parallel" else "single"
+        report_renderer.render_report(llm, vectordb, user_data, pinned=pinned)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monolithic vs hybrid vs parallel report generation")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=3, help="sections generated at once")
+    parser.add_argument("--simulate", action="store_true", help="use SimulatedLLM instead of Ollama")
+    parser.add_argument("--slots", type=int, default=1, help="SimulatedLLM concurrent generations")
+    parser.add_argument("--prefill-tps", type=float, default=400.0, help="SimulatedLLM prompt tokens / s")
+    parser.add_argument("--decode-tps", type=float, default=20.0, help="SimulatedLLM output tokens / s")
+    args = parser.parse_args()
+
+    vectordb = get_vectordb()
+    pinned = resolve_pinned(vectordb)
+    llm = (
+        SimulatedLLM(args.prefill_tps, args.decode_tps, slots=args.slots)
+        if args.simulate else get_llm()
+    )
+
+    config.REPORT_SECTION_CONCURRENCY = args.concurrency
+
+    print(
+        f"LLM: {'simulated, ' + str(args.slots) + ' slot(s)' if args.simulate else config.LLM_MODEL_NAME}, "
+        f"section concurrency {args.concurrency}, best of {args.repeats} runs"
+    )
+    print(f"{'profile':<34s} {'monolithic s':>12s} {'hybrid s':>10s} {'parallel s':>10s} {'speedup':>8s}")
+
+    for user_data in PROFILES:
+        times = {}
+        for mode in ("monolithic", "hybrid", "parallel"):
+            times[mode] = min(
+                run_mode(mode, llm, vectordb, pinned, user_data) for _ in range(args.repeats)
+            )
+
+        name = "/".join(user_data[f"{d}_risk"] for d in ("posture", "vision", "cognitive"))
+        print(
+            f"{name:<34s} {times['monolithic']:>12.2f} {times['hybrid']:>10.2f} "
+            f"{times['parallel']:>10.2f} {times['monolithic'] / max(times['parallel'], 1e-9):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Benchmark: time to first token of the report prompt, old vs new LLM call.
+
+    before   one flattened prompt string through Ollama (/api/generate),
+             no keep_alive / num_ctx (the server defaults apply)
+    after    system + user messages through ChatOllama (/api/chat) with
+             config.LLM_KEEP_ALIVE and config.LLM_NUM_CTX
+
+Both run against StubOllama, a local HTTP server speaking the streaming
+Ollama API, which models what makes the first token slow:
+
+    - a single slot whose KV cache holds the last prompt; a new prompt
+      only prefills the tokens after the longest common prefix
+    - the model (and its cache) is unloaded keep_alive after a request,
+      and reloaded on the next one (also when num_ctx changes)
+
+Token counts are characters / CHARS_PER_TOKEN. The stub's default
+keep-alive (--stub-keep-alive, seconds) stands in for Ollama's 5 minutes
+so an idle gap between bursts of reports (--idle) fits in a benchmark.
+
+Run from backend/ after ingest:
+    python -m rag_pipeline.rag.bench_ttft [--bursts 3] [--idle 3]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import config
+from rag_pipeline.rag.bench_sections import PROFILES
+from rag_pipeline.rag.context_assembler import CHARS_PER_TOKEN
+from rag_pipeline.rag.rag_gen import build_report_prompt, prompt_text, resolve_pinned
+from resources import get_vectordb
+
+
+# -------------------------
+# Stub server
+# -------------------------
+
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(value, default: float) -> float:
+    """
+    Ollama keep_alive (seconds, or a duration such as "30m" / "1h30m")
+    -> seconds; negative means forever.
+    """
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    elif re.fullmatch(r"-?\d+(\.\d+)?", value):
+        seconds = float(value)
+    else:
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+        seconds = sum(float(n) * DURATION_UNITS[unit] for n, unit in parts)
+    return float("inf") if seconds < 0 else seconds
+
+
+class StubOllama:
+    """
+    Streaming /api/generate and /api/chat with simulated load, prefill and
+    decode times. Every request is recorded in self.requests.
+    """
+
+    def __init__(
+        self,
+        prefill_tps: float = 400.0,
+        load_s: float = 2.0,
+        default_keep_alive_s: float = 2.0,
+        default_num_ctx: int = 2048,
+        output_tokens: int = 8,
+        decode_tps: float = 50.0
+    ):
+        self.prefill_tps = prefill_tps
+        self.load_s = load_s
+        self.default_keep_alive_s = default_keep_alive_s
+        self.default_num_ctx = default_num_ctx
+        self.output_tokens = output_tokens
+        self.decode_tps = decode_tps
+
+        self.requests: List[Dict] = []
+
+        self._slot = threading.Lock()
+        self._cached = None       # rendered prompt held in the KV cache
+        self._loaded_ctx = None   # num_ctx of the loaded model, None = unloaded
+        self._expires_at = 0.0
+        self._server = None
+
+    @staticmethod
+    def render(endpoint: str, body: Dict) -> str:
+        # Stand-in for the model's chat template
+        if endpoint == "/api/chat":
+            turns = [(m["role"], m["content"]) for m in body.get("messages", [])]
+        else:
+            turns = [("system", body["system"])] if body.get("system") else []
+            turns.append(("user", body.get("prompt", "")))
+        return "".join(f"<|{role}|>\n{text}<|end|>\n" for role, text in turns) + "<|assistant|>\n"
+
+    def _prefill(self, endpoint: str, body: Dict) -> Dict:
+        # caller holds self._slot
+        options = body.get("options") or {}
+        num_ctx = options.get("num_ctx") or self.default_num_ctx
+        now = time.monotonic()
+
+        cold = self._loaded_ctx is None or now > self._expires_at or num_ctx != self._loaded_ctx
+        if cold:
+            time.sleep(self.load_s)
+            self._loaded_ctx = num_ctx
+            self._cached = None
+
+        prompt = self.render(endpoint, body)
+        common = 0
+        if self._cached is not None:
+            limit = min(len(prompt), len(self._cached))
+            while common < limit and prompt[common] == self._cached[common]:
+                common += 1
+
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        cached_tokens = common // CHARS_PER_TOKEN
+        prefill_tokens = prompt_tokens - cached_tokens
+        time.sleep(prefill_tokens / self.prefill_tps)
+        self._cached = prompt
+
+        record = {
+            "endpoint": endpoint,
+            "cold_load": cold,
+            "num_ctx": num_ctx,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "prefill_tokens": prefill_tokens,
+        }
+        self.requests.append(record)
+        return record
+
+    def _finish(self, body: Dict) -> None:
+        # caller holds self._slot
+        keep_alive = keep_alive_seconds(body.get("keep_alive"), self.default_keep_alive_s)
+        self._expires_at = time.monotonic() + keep_alive
+
+    def start(self) -> str:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                with stub._slot:
+                    record = stub._prefill(self.path, body)
+                    try:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        for i in range(stub.output_tokens):
+                            if i:
+                                time.sleep(1 / stub.decode_tps)
+                            self._send_line(self.path, f"tok{i} ", done=False)
+                        self._send_line(self.path, "", done=True, prompt_eval_count=record["prefill_tokens"])
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client stopped reading after the first token
+                        pass
+                    finally:
+                        stub._finish(body)
+
+            def _send_line(self, endpoint: str, text: str, done: bool, **extra):
+                line = {"model": "stub", "created_at": "", "done": done, **extra}
+                if endpoint == "/api/chat":
+                    line["message"] = {"role": "assistant", "content": text}
+                else:
+                    line["response"] = text
+                self.wfile.write((json.dumps(line) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# -------------------------
+# Clients
+# -------------------------
+
+def make_client(mode: str, base_url: str):
+    if mode == "before":
+        from langchain_community.llms import Ollama
+        return Ollama(model=config.LLM_MODEL_NAME, base_url=base_url)
+
+    from langchain_ollama import ChatOllama
+    return ChatOllama(
+        model=config.LLM_MODEL_NAME,
+        base_url=base_url,
+        keep_alive=config.LLM_KEEP_ALIVE,
+        num_ctx=config.LLM_NUM_CTX or None
+    )
+
+
+def time_to_first_token(llm, prompt) -> float:
+    start = time.perf_counter()
+    stream = llm.stream(prompt)
+    try:
+        for chunk in stream:
+            if getattr(chunk, "content", chunk):
+                return time.perf_counter() - start
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return time.perf_counter() - start
+
+
+def run_mode(mode: str, prompts: List, stub_args: Dict, bursts: int, idle_s: float) -> Dict:
+    stub = StubOllama(**stub_args)
+    llm = make_client(mode, stub.start())
+    ttfts = []
+    try:
+        for burst in range(bursts):
+            if burst:
+                time.sleep(idle_s)
+            for messages in prompts:
+                ttfts.append(time_to_first_token(llm, prompt_text(messages) if mode == "before" else messages))
+    finally:
+        stub.stop()
+
+    records = stub.requests
+    return {
+        "ttft_mean": statistics.mean(ttfts),
+        "ttft_max": max(ttfts),
+        "cold_loads": sum(r["cold_load"] for r in records),
+        "prompt_tokens": statistics.mean(r["prompt_tokens"] for r in records),
+        "prefill_tokens": statistics.mean(r["prefill_tokens"] for r in records),
+        "requests": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt time to first token against a stub Ollama")
+    parser.add_argument("--bursts", type=int, default=3, help="rounds over the sample profiles")
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds without requests between bursts")
+    parser.add_argument("--prefill-tps", type=float, default=400.0, help="stub prompt tokens / s")
+    parser.add_argument("--load-s", type=float, default=2.0, help="stub model load time")
+    parser.add_argument("--stub-keep-alive", type=float, default=2.0, help="stub default keep-alive, seconds")
+    parser.add_argument("--verbose", action="store_true", help="print every recorded request")
+    args = parser.parse_args()
+
+    vectordb = get_vectordb()
+    pinned = resolve_pinned(vectordb)
+    prompts = [build_report_prompt(vectordb, user_data, pinned=pinned) for user_data in PROFILES]
+
+    stub_args = {
+        "prefill_tps": args.prefill_tps,
+        "load_s": args.load_s,
+        "default_keep_alive_s": args.stub_keep_alive,
+    }
+
+    print(
+        f"{len(PROFILES)} profiles x {args.bursts} bursts, {args.idle:g}s idle between bursts; "
+        f"after: keep_alive={config.LLM_KEEP_ALIVE}, num_ctx={config.LLM_NUM_CTX}"
+    )
+    print(
+        f"{'mode':<8s} {'cold loads':>10s} {'prompt tok':>10s} {'prefilled tok':>13s} "
+        f"{'TTFT mean s':>11s} {'TTFT max s':>10s}"
+    )
+
+    for mode in ("before", "after"):
+        result = run_mode(mode, prompts, stub_args, args.bursts, args.idle)
+        print(
+            f"{mode:<8s} {result['cold_loads']:>10d} {result['prompt_tokens']:>10.0f} "
+            f"{result['prefill_tokens']:>13.0f} {result['ttft_mean']:>11.2f} {result['ttft_max']:>10.2f}"
+        )
+        if args.verbose:
+            for record in result["requests"]:
+                print("    ", record)
+
+
+if __name__ == "__main__":
+    main()
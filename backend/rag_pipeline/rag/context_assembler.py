@@ -0,0 +1,160 @@
+"""
+Token-budgeted, de-duplicated context for the report prompt.
+
+The report retrieval asks for overlapping lists: the primary domain is
+also one of the per-domain lookups, and neighbouring chunks / different
+documents repeat the same guidance. assemble_context():
+
+    1. drops repeated chunks (same id or text, or word shingles mostly
+       contained in the chunks already selected),
+    2. splits the token budget across domains by their risk level,
+    3. fills each domain's share best-first, then hands unused budget to
+       the best remaining chunks of any domain,
+
+so whatever is cut is the lowest-scoring material. Token counts are
+estimates (characters / CHARS_PER_TOKEN); no tokenizer is loaded.
+"""
+
+import hashlib
+import math
+from typing import Dict, List, Sequence, Set, Tuple
+
+
+CHARS_PER_TOKEN = 4
+
+# "[DOC n] (domain=...)\nSOURCE: ...\nCONTENT:" around every chunk
+DOC_OVERHEAD_TOKENS = 24
+
+SHINGLE_WORDS = 5
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def doc_tokens(doc) -> int:
+    return estimate_tokens(doc.page_content) + DOC_OVERHEAD_TOKENS
+
+
+def _keys(doc) -> List[str]:
+    keys = ["text:" + hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()]
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        keys.append(f"id:{doc_id}")
+    return keys
+
+
+def _shingles(text: str) -> Set[int]:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + SHINGLE_WORDS])) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+class ContextSelection:
+    """
+    docs:       selected profile docs, in prompt order
+    duplicates: candidates dropped as exact / near duplicates
+    trimmed:    candidates dropped to fit the budget
+    tokens:     estimated tokens of pinned + selected docs
+    """
+
+    def __init__(self, docs: List, duplicates: int, trimmed: int, tokens: int):
+        self.docs = docs
+        self.duplicates = duplicates
+        self.trimmed = trimmed
+        self.tokens = tokens
+
+
+def assemble_context(
+    groups: Sequence[Tuple[str, List[Tuple[object, float]]]],
+    risk_levels: Dict[str, str],
+    budget: int,
+    weights: Dict[str, float],
+    pinned: Sequence = (),
+    near_duplicate: float = 0.8
+) -> ContextSelection:
+    """
+    Input:
+        groups:      [(domain, [(doc, score), ...] best first), ...] in
+                     prompt order; a domain may appear more than once.
+                     Higher score = closer to the query.
+        risk_levels: {domain: "Low" / "Moderate" / "High"}; missing
+                     domains weigh as Low
+        budget:      estimated tokens for pinned + selected docs
+                     (0 = de-duplicate only)
+        weights:     {risk level: budget weight}
+        pinned:      docs that are always included (and ahead of the rest)
+
+    Output: ContextSelection
+    """
+
+    # ----------------------------
+    # De-duplicate (prompt order, pinned first)
+    # ----------------------------
+    seen_keys: Set[str] = set()
+    seen_shingles: Set[int] = set()
+
+    for doc in pinned:
+        seen_keys.update(_keys(doc))
+        seen_shingles |= _shingles(doc.page_content)
+
+    candidates = []   # (position, domain, doc, score, tokens)
+    duplicates = 0
+    for domain, scored in groups:
+        for doc, score in scored:
+            keys = _keys(doc)
+            shingles = _shingles(doc.page_content)
+            contained = len(shingles & seen_shingles) / len(shingles) if shingles else 1.0
+
+            if any(k in seen_keys for k in keys) or contained >= near_duplicate:
+                duplicates += 1
+                continue
+
+            seen_keys.update(keys)
+            seen_shingles |= shingles
+            candidates.append((len(candidates), domain, doc, score, doc_tokens(doc)))
+
+    pinned_tokens = sum(doc_tokens(d) for d in pinned)
+
+    if budget <= 0:
+        return ContextSelection(
+            [c[2] for c in candidates], duplicates, 0,
+            pinned_tokens + sum(c[4] for c in candidates)
+        )
+
+    # ----------------------------
+    # Budget: per-domain shares by risk, then best-first leftovers
+    # ----------------------------
+    remaining = max(0, budget - pinned_tokens)
+
+    by_domain: Dict[str, List] = {}
+    for c in candidates:
+        by_domain.setdefault(c[1], []).append(c)
+
+    domain_weight = {d: weights.get(risk_levels.get(d, "Low"), 1.0) for d in by_domain}
+    total_weight = sum(domain_weight.values()) or 1.0
+
+    selected = set()
+    used = 0
+    for domain, items in by_domain.items():
+        share = remaining * domain_weight[domain] / total_weight
+        spent = 0
+        for c in sorted(items, key=lambda c: -c[3]):
+            if spent + c[4] > share:
+                break
+            selected.add(c[0])
+            spent += c[4]
+        used += spent
+
+    for c in sorted(candidates, key=lambda c: -c[3]):
+        if c[0] not in selected and used + c[4] <= remaining:
+            selected.add(c[0])
+            used += c[4]
+
+    return ContextSelection(
+        [c[2] for c in candidates if c[0] in selected],
+        duplicates,
+        len(candidates) - len(selected),
+        pinned_tokens + used
+    )
@@ -0,0 +1,180 @@
+"""
+Helpers describing the on-disk vector index: where it lives and which
+build of it is current.
+
+Layout under the index root (config.CHROMA_DIR):
+
+    versions/<version>/      one complete build: Chroma store, ingest
+                             manifest, INDEX_VERSION, snapshot/
+    versions/.staging-<v>/   a build in progress (never read)
+    CURRENT                  name of the published version
+
+ingest.main() builds into a staging directory and publishes it by
+replacing CURRENT atomically, so readers only ever see a complete build.
+A root without CURRENT is read as a single unversioned (legacy) store.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+VERSION_FILE = "INDEX_VERSION"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+STAGING_PREFIX = ".staging-"
+SNAPSHOT_DIRNAME = "snapshot"
+
+
+def new_index_version() -> str:
+    # Sorts chronologically (gc_index_versions relies on it): UTC, so a DST
+    # fall-back or a timezone change cannot make a newer build sort first
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+    return f"{stamp}.{int(now * 1e6) % 1000000:06d}Z-{uuid.uuid4().hex[:8]}"
+
+
+def write_index_version(index_dir: Path, version: Optional[str] = None) -> str:
+    version = version or new_index_version()
+    (Path(index_dir) / VERSION_FILE).write_text(version, encoding="utf-8")
+    return version
+
+
+# Legacy fingerprints by directory; walking a store on every request is
+# too slow, so it is only redone on refresh_legacy=True (the vectordb
+# reload path)
+_legacy_versions: Dict[str, str] = {}
+_legacy_lock = threading.Lock()
+
+
+def read_index_version(index_dir: Path, refresh_legacy: bool = False) -> str:
+    """
+    Version stamp of the index at index_dir (an index root or one build).
+
+    Indexes built before versioning existed get a fingerprint of their
+    files' names, sizes and mtimes instead, computed once per directory
+    and then reused until refresh_legacy is set.
+    """
+    index_dir = Path(index_dir)
+
+    try:
+        return (index_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        pass
+
+    marker = index_dir / VERSION_FILE
+    if marker.exists():
+        return marker.read_text(encoding="utf-8").strip()
+
+    if not index_dir.exists():
+        return "missing"
+
+    key = str(index_dir.resolve())
+    with _legacy_lock:
+        if refresh_legacy or key not in _legacy_versions:
+            _legacy_versions[key] = _legacy_fingerprint(index_dir)
+        return _legacy_versions[key]
+
+
+def _legacy_fingerprint(index_dir: Path) -> str:
+    h = hashlib.sha256()
+    for f in sorted(p for p in index_dir.rglob("*") if p.is_file()):
+        st = f.stat()
+        h.update(f"{f.relative_to(index_dir)}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return f"legacy-{h.hexdigest()[:12]}"
+
+
+# -------------------------
+# Versioned builds
+# -------------------------
+
+def published_index_dir(root: Path) -> Optional[Path]:
+    """
+    Directory of the published build, or None if nothing was published.
+    """
+    root = Path(root)
+    try:
+        version = (root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return root / VERSIONS_DIR / version
+
+
+def current_index_dir(root: Path) -> Path:
+    """
+    Directory readers should open: the published build, or the root
+    itself for an unversioned store.
+    """
+    return published_index_dir(root) or Path(root)
+
+
+def stage_index_version(
+    root: Path,
+    base: Optional[Path] = None,
+    ignore: Iterable[str] = ()
+) -> Tuple[str, Path]:
+    """
+    Creates the staging directory of a new build, starting as a copy of
+    base (an incremental update) or empty (a full build).
+
+    Output: (version, staging_dir)
+    """
+    version = new_index_version()
+    staging = Path(root) / VERSIONS_DIR / f"{STAGING_PREFIX}{version}"
+
+    if base is not None:
+        shutil.copytree(base, staging, ignore=shutil.ignore_patterns(*ignore))
+    else:
+        staging.mkdir(parents=True)
+    return version, staging
+
+
+def publish_index_version(root: Path, version: str, staging: Path) -> Path:
+    """
+    Makes a finished staging build the current version. The CURRENT swap
+    is a single os.replace, so a reader sees either the old or the new
+    build.
+    """
+    root = Path(root)
+    write_index_version(staging, version)
+    final = root / VERSIONS_DIR / version
+    os.replace(staging, final)
+
+    tmp = root / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root / CURRENT_FILE)
+    return final
+
+
+def gc_index_versions(root: Path, keep: int = 2) -> List[str]:
+    """
+    Deletes all but the newest `keep` builds (never the current one) and
+    leftover staging directories of interrupted builds. Assumes a single
+    writer: do not run two ingests against the same root at once.
+
+    Output: names of the deleted directories
+    """
+    versions_dir = Path(root) / VERSIONS_DIR
+    if not versions_dir.exists():
+        return []
+
+    current = published_index_dir(root)
+    builds = sorted(
+        (d for d in versions_dir.iterdir() if d.is_dir() and not d.name.startswith(STAGING_PREFIX)),
+        key=lambda d: d.name,
+        reverse=True
+    )
+    doomed = [d for d in builds[max(keep, 1):] if d != current]
+    doomed += [d for d in versions_dir.iterdir() if d.name.startswith(STAGING_PREFIX)]
+
+    for d in doomed:
+        shutil.rmtree(d, ignore_errors=True)
+    return [d.name for d in doomed]
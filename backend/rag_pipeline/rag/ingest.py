@@ -1,23 +1,56 @@
+import argparse
+import gzip
+import hashlib
+import json
 import os
-import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 import numpy as np
 
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_community.vectorstores import Chroma
 
 from langchain_huggingface import HuggingFaceEmbeddings
 
+import config
+from rag_pipeline.rag.index_store import (
+    SNAPSHOT_DIRNAME,
+    gc_index_versions,
+    publish_index_version,
+    published_index_dir,
+    stage_index_version
+)
+from rag_pipeline.rag.numpy_index import NumpyIndex, quantization_report
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 KB_DIR = BASE_DIR / "knowledge_base"
-CHROMA_DIR = BASE_DIR / "chroma_db"
+# Index root: builds go to versions/<version>, CURRENT names the live one
+CHROMA_DIR = config.CHROMA_DIR
 
 POLICY_DIR = KB_DIR / "policy"
 DOCS_DIR = KB_DIR / "docs"
 
+# path -> content hash -> chunk IDs of every ingested file
+MANIFEST_FILE = "ingest_manifest.json"
+
+# Extracted PDF pages, one gzip JSONL file per PDF content hash. Re-chunking
+# or re-embedding an unchanged PDF skips pypdf extraction entirely.
+PARSED_CACHE_DIRNAME = ".parsed_cache"
+PARSED_CACHE_FORMAT = 1
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 900
+CHUNK_OVERLAP = 200
+
+# Chunks per Chroma add call (Chroma caps the batch size)
+ADD_BATCH_SIZE = 1000
+
 
 DOMAIN_ANCHORS = {
     "posture": (
@@ -40,35 +73,82 @@ DOMAIN_ANCHORS = {
 }
 
 
-def cosine_sim(a, b):
-    a = np.array(a)
-    b = np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+# Below this cosine similarity to every anchor a page stays "general"
+DOMAIN_MIN_SIMILARITY = 0.35
 
+# Texts per embed_documents call
+EMBED_BATCH_SIZE = 64
+
+# Characters of a page used for classification
+CLASSIFY_CHARS = 1500
+
+
+class MemoEmbeddings:
+    """
+    Embedding wrapper that remembers every vector it computed, keyed by
+    the exact text. Texts embedded for classification and then stored
+    unchanged as a chunk are not embedded twice.
+    """
+
+    def __init__(self, embeddings_model, batch_size: int = EMBED_BATCH_SIZE):
+        self.model = embeddings_model
+        self.batch_size = batch_size
+        self._memo = {}
+        self.computed = 0
+        self.reused = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = list(dict.fromkeys(t for t in texts if t not in self._memo))
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            for text, vector in zip(batch, self.model.embed_documents(batch)):
+                self._memo[text] = vector
+        self.computed += len(missing)
+        self.reused += len(texts) - len(missing)
+        return [self._memo[t] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    m = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
 
-def classify_domain(text: str, embeddings_model) -> str:
-    text = text.strip()
-    if not text:
-        return "general"
 
-    text_emb = embeddings_model.embed_query(text[:1500])
+def classify_domains(texts: List[str], embeddings_model) -> List[str]:
+    """
+    Domain of each page: the most similar DOMAIN_ANCHORS entry, or
+    "general" for empty pages and weak matches.
 
-    best_domain = "general"
-    best_score = -1
+    Anchors are embedded once, pages in batches, and every page is scored
+    against every anchor with one matrix product.
+    """
+    domains = list(DOMAIN_ANCHORS)
+    labels = ["general"] * len(texts)
 
-    for domain, anchor_text in DOMAIN_ANCHORS.items():
-        anchor_emb = embeddings_model.embed_query(anchor_text)
-        score = cosine_sim(text_emb, anchor_emb)
+    snippets = [t.strip()[:CLASSIFY_CHARS] for t in texts]
+    todo = [i for i, snippet in enumerate(snippets) if snippet]
+    if not todo:
+        return labels
 
-        if score > best_score:
-            best_score = score
-            best_domain = domain
+    anchors = _unit_rows(embeddings_model.embed_documents(list(DOMAIN_ANCHORS.values())))
+    pages = _unit_rows(embeddings_model.embed_documents([snippets[i] for i in todo]))
 
-    # Threshold: if too weak similarity, mark general
-    if best_score < 0.35:
-        return "general"
+    sims = pages @ anchors.T
+    best = sims.argmax(axis=1)
+    best_score = sims[np.arange(len(todo)), best]
 
-    return best_domain
+    for row, i in enumerate(todo):
+        if best_score[row] >= DOMAIN_MIN_SIMILARITY:
+            labels[i] = domains[best[row]]
+    return labels
+
+
+def classify_domain(text: str, embeddings_model) -> str:
+    return classify_domains([text], embeddings_model)[0]
 
 
 def collect_files(folder: Path, exts: List[str]) -> List[Path]:
@@ -90,8 +170,169 @@ def load_pdf_file(file_path: Path):
     return loader.load()
 
 
-def main():
+# ----------------------------
+# Parsed-page cache
+# ----------------------------
+
+def parsed_cache_path(cache_dir: Path, file_hash: str) -> Path:
+    return cache_dir / f"{file_hash}.v{PARSED_CACHE_FORMAT}.jsonl.gz"
+
+
+def read_parsed_pages(path: Path) -> Optional[List[Document]]:
+    """
+    Output: the cached pages, or None if missing / unreadable
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [
+                Document(page_content=row["text"], metadata=row["metadata"])
+                for row in map(json.loads, f)
+            ]
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, KeyError):
+        # Truncated / corrupt entry: extract again and overwrite it
+        return None
+
+
+def write_parsed_pages(path: Path, docs: List[Document]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for d in docs:
+            f.write(json.dumps({"text": d.page_content, "metadata": d.metadata}) + "\n")
+    os.replace(tmp, path)
+
+
+def parsed_cache_size(cache_dir: Path) -> Tuple[int, int]:
+    """
+    Output: (entries, bytes)
+    """
+    if not cache_dir.exists():
+        return 0, 0
+    entries = list(cache_dir.glob("*.jsonl.gz"))
+    return len(entries), sum(f.stat().st_size for f in entries)
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_chunk_ids(rel_path: str, file_hash: str, count: int) -> List[str]:
+    """
+    Deterministic chunk IDs: same file content at the same path always
+    yields the same IDs, so unchanged files never need rewriting.
+    """
+    prefix = hashlib.sha256(f"{rel_path}:{file_hash}".encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i:05d}" for i in range(count)]
+
+
+def build_settings() -> Dict:
+    # Any change here invalidates every stored chunk -> full rebuild
+    return {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "domain_anchors": DOMAIN_ANCHORS,
+        "domain_min_similarity": DOMAIN_MIN_SIMILARITY,
+    }
+
+
+def load_manifest(index_dir: Path) -> Optional[Dict]:
+    path = index_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(index_dir: Path, manifest: Dict) -> None:
+    path = index_dir / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def diff_manifest(known: Dict[str, Dict], hashes: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Input: manifest["files"] of the live build, {rel_path: sha256} on disk now
+    Output: (added, changed, removed) relative paths, each sorted
+    """
+    added = sorted(rel for rel in hashes if rel not in known)
+    changed = sorted(rel for rel in hashes if rel in known and known[rel]["sha256"] != hashes[rel])
+    removed = sorted(rel for rel in known if rel not in hashes)
+    return added, changed, removed
+
+
+def parse_file(task: Tuple) -> Tuple[str, List[Tuple[str, Dict]], List[Tuple[str, int]], Optional[bool]]:
+    """
+    Process-pool worker: loads one file and chunks it page by page.
+
+    Input: (rel_path, path, file_type, file_hash, parsed_cache_dir or None)
+    Output: (rel_path, [(page_text, page_metadata)], [(chunk_text, page_index)],
+             parsed-cache hit for PDFs / None for markdown)
+
+    PDF pages have no domain yet; the parent classifies them and chunks
+    inherit their page's metadata (same result as split_documents).
+    """
+    rel, path, file_type, file_hash, cache_dir = task
+
+    cache_hit = None
+    if file_type == "md":
+        docs = load_md_file(Path(path))
+    elif cache_dir is None:
+        docs = load_pdf_file(Path(path))
+    else:
+        cache_file = parsed_cache_path(Path(cache_dir), file_hash)
+        docs = read_parsed_pages(cache_file)
+        cache_hit = docs is not None
+        if not cache_hit:
+            docs = load_pdf_file(Path(path))
+            write_parsed_pages(cache_file, docs)
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+
+    pages = []
+    chunks = []
+    for page_index, d in enumerate(docs):
+        metadata = dict(d.metadata)
+        metadata["source"] = path
+        metadata["file_type"] = file_type
+        if file_type == "md":
+            metadata["domain"] = "policy"
+
+        pages.append((d.page_content, metadata))
+        chunks.extend((text, page_index) for text in splitter.split_text(d.page_content))
+
+    return rel, pages, chunks, cache_hit
+
+
+def iter_parsed(tasks: List[Tuple], workers: int) -> Iterator:
+    """
+    parse_file over tasks, results in task order. With workers > 1 files
+    are parsed in a process pool while the caller embeds earlier results.
+
+    The pool is created after the embedding model is loaded, so workers are
+    spawned rather than forked: a fork would copy torch's threads and locks
+    into children that may deadlock on them.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(parse_file, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        yield from pool.map(parse_file, tasks)
+
+
+def main(full: bool = False, workers: int = None, parse_cache: bool = True):
     print("=== Base Ingestion (PDF + MD) ===")
+    start = time.perf_counter()
 
     if not POLICY_DIR.exists():
         raise FileNotFoundError(f"Policy folder not found: {POLICY_DIR}")
@@ -99,82 +340,204 @@ def main():
     if not DOCS_DIR.exists():
         raise FileNotFoundError(f"Docs folder not found: {DOCS_DIR}")
 
-    # Reset Chroma DB
-    if CHROMA_DIR.exists():
-        print(f"[INFO] Removing old Chroma DB at: {CHROMA_DIR}")
-        shutil.rmtree(CHROMA_DIR)
-
     md_files = collect_files(POLICY_DIR, [".md"])
     pdf_files = collect_files(DOCS_DIR, [".pdf"])
 
     print(f"[INFO] Found {len(md_files)} policy markdown files")
     print(f"[INFO] Found {len(pdf_files)} PDF documents")
 
-    # Load embeddings once
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    sources = {
+        f.relative_to(KB_DIR).as_posix(): (f, file_type)
+        for file_type, files in (("md", md_files), ("pdf", pdf_files))
+        for f in files
+    }
+    hashes = {rel: file_sha256(f) for rel, (f, _) in sources.items()}
+
+    # ----------------------------
+    # Decide what to (re)index
+    # ----------------------------
+    settings = build_settings()
+    live_dir = published_index_dir(CHROMA_DIR)
+    manifest = None if full or live_dir is None else load_manifest(live_dir)
+
+    if manifest is not None and manifest.get("settings") != settings:
+        print("[INFO] Chunking / embedding settings changed -> full rebuild")
+        manifest = None
+
+    if manifest is None:
+        manifest = {"settings": settings, "files": {}}
+        live_dir = None
+
+    known = manifest["files"]
+    added, changed, removed = diff_manifest(known, hashes)
+
+    print(
+        f"[INFO] Files: {len(added)} new, {len(changed)} changed, {len(removed)} removed, "
+        f"{len(sources) - len(added) - len(changed)} unchanged"
     )
 
-    all_docs = []
+    if not (added or changed or removed):
+        print("[INFO] Knowledge base unchanged; index left as is")
+        return
 
-    # Load markdown policy docs
-    for f in md_files:
-        docs = load_md_file(f)
-
-        for d in docs:
-            d.metadata["source"] = str(f)
-            d.metadata["domain"] = "policy"
-            d.metadata["file_type"] = "md"
+    # Load embeddings once; the memo lets chunk storage reuse vectors
+    # already computed for classification
+    embeddings = MemoEmbeddings(HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME
+    ))
 
-        all_docs.extend(docs)
-
-    # Load PDFs and classify their domain
-    for f in pdf_files:
-        docs = load_pdf_file(f)
-
-        for d in docs:
-            predicted_domain = classify_domain(d.page_content, embeddings)
+    # The live build is never written to: an incremental update starts
+    # from a copy of it, a full rebuild from an empty directory
+    version, staging_dir = stage_index_version(CHROMA_DIR, base=live_dir, ignore=[SNAPSHOT_DIRNAME])
+    print(f"[INFO] Building index {version} in {staging_dir}")
 
-            d.metadata["source"] = str(f)
-            d.metadata["domain"] = predicted_domain
-            d.metadata["file_type"] = "pdf"
-
-        all_docs.extend(docs)
-
-    print(f"[INFO] Total raw loaded docs: {len(all_docs)}")
+    vectordb = Chroma(
+        persist_directory=str(staging_dir),
+        embedding_function=embeddings
+    )
 
-    # Chunking
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=900,
-        chunk_overlap=200
+    # ----------------------------
+    # Drop chunks of removed / changed files
+    # ----------------------------
+    stale_ids = [cid for rel in removed + changed for cid in known[rel]["chunk_ids"]]
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+    for rel in removed:
+        del known[rel]
+
+    print(f"[INFO] Deleted {len(stale_ids)} stale chunks")
+
+    # ----------------------------
+    # Load + chunk (process pool) -> classify + embed + store (here)
+    # ----------------------------
+    workers = workers or config.INGEST_WORKERS
+    pending = sorted(changed + added)
+    cache_dir = KB_DIR / PARSED_CACHE_DIRNAME
+    tasks = [
+        (rel, str(sources[rel][0]), sources[rel][1], hashes[rel], str(cache_dir) if parse_cache else None)
+        for rel in pending
+    ]
+
+    parse_start = time.perf_counter()
+    page_count = 0
+    chunk_count = 0
+    cache_hits = 0
+    cache_misses = 0
+
+    for rel, pages, chunks, cache_hit in iter_parsed(tasks, workers):
+        # One batched classification per file (anchor vectors are memoized)
+        pdf_pages = [(text, meta) for text, meta in pages if meta["file_type"] == "pdf"]
+        if pdf_pages:
+            domains = classify_domains([text for text, _ in pdf_pages], embeddings)
+            for (_, meta), predicted_domain in zip(pdf_pages, domains):
+                meta["domain"] = predicted_domain
+
+        docs = [Document(page_content=text, metadata=dict(pages[i][1])) for text, i in chunks]
+        ids = make_chunk_ids(rel, hashes[rel], len(docs))
+
+        # Store into Chroma
+        for i in range(0, len(docs), ADD_BATCH_SIZE):
+            vectordb.add_documents(docs[i:i + ADD_BATCH_SIZE], ids=ids[i:i + ADD_BATCH_SIZE])
+
+        known[rel] = {"sha256": hashes[rel], "file_type": sources[rel][1], "chunk_ids": ids}
+        page_count += len(pages)
+        chunk_count += len(docs)
+        cache_hits += cache_hit is True
+        cache_misses += cache_hit is False
+
+    parse_seconds = time.perf_counter() - parse_start
+
+    print(f"[INFO] Total raw loaded docs: {page_count}")
+    print(f"[INFO] Total chunks created: {chunk_count}")
+    print(
+        f"[INFO] Parsed + embedded {page_count} pages from {len(tasks)} files in "
+        f"{parse_seconds:.1f}s ({page_count / max(parse_seconds, 1e-9):.1f} pages/s, "
+        f"{workers} workers)"
     )
 
-    chunked_docs = splitter.split_documents(all_docs)
+    vectordb.persist()
+    save_manifest(staging_dir, manifest)
+
+    # Memory-mapped snapshot for the numpy retrieval backend
+    index = NumpyIndex.from_chroma(vectordb)
+    index.save(
+        staging_dir / SNAPSHOT_DIRNAME,
+        dtype=config.SNAPSHOT_DTYPE,
+        version=version,
+        quantizations=config.SNAPSHOT_QUANTIZATIONS
+    )
+    del vectordb
 
-    print(f"[INFO] Total chunks created: {len(chunked_docs)}")
+    # Atomic swap: running API processes switch to the new build on their
+    # next request (new version also invalidates cached reports)
+    build_dir = publish_index_version(CHROMA_DIR, version, staging_dir)
+    collected = gc_index_versions(CHROMA_DIR, keep=config.INDEX_KEEP_VERSIONS)
 
-    # Store into Chroma
-    vectordb = Chroma.from_documents(
-        documents=chunked_docs,
-        embedding=embeddings,
-        persist_directory=str(CHROMA_DIR)
+    print(
+        f"[INFO] Embeddings computed: {embeddings.computed}, "
+        f"reused: {embeddings.reused}"
     )
 
-    vectordb.persist()
+    if parse_cache:
+        entries, size = parsed_cache_size(cache_dir)
+        lookups = cache_hits + cache_misses
+        print(
+            f"[INFO] Parsed-page cache: {cache_hits}/{lookups} PDF hits "
+            f"({cache_hits / lookups if lookups else 0:.0%}), "
+            f"{entries} entries, {size / 1e6:.1f} MB at {cache_dir}"
+        )
 
     print("=== Ingestion Completed Successfully ===")
-    print(f"[INFO] Vector DB saved at: {CHROMA_DIR}")
-
-    # Domain distribution stats
+    print(f"[INFO] Vector DB saved at: {build_dir}")
+    print(f"[INFO] Snapshot saved at: {build_dir / SNAPSHOT_DIRNAME} ({config.SNAPSHOT_DTYPE})")
+    print(f"[INFO] Published index version: {version}")
+    print(f"[INFO] Removed old builds: {', '.join(collected) or 'none'}")
+    print(f"[INFO] Total chunks in index: {len(index)}")
+    print(f"[INFO] Elapsed: {time.perf_counter() - start:.1f}s")
+
+    # Domain distribution stats (whole index, not just this run)
     domain_count = {}
-    for d in chunked_docs:
-        dom = d.metadata.get("domain", "unknown")
+    for meta in index.metadatas:
+        dom = meta.get("domain", "unknown")
         domain_count[dom] = domain_count.get(dom, 0) + 1
 
     print("\n=== Domain Distribution ===")
     for k, v in sorted(domain_count.items(), key=lambda x: x[1], reverse=True):
         print(f"{k:10s} -> {v}")
 
+    # Quantized copies: memory vs recall@8, using stored chunks as queries
+    if config.SNAPSHOT_QUANTIZATIONS and len(index):
+        sample = np.random.default_rng(0).choice(len(index), min(200, len(index)), replace=False)
+        stats = quantization_report(
+            index,
+            index.vectors[np.sort(sample)],
+            k=8,
+            kinds=config.SNAPSHOT_QUANTIZATIONS,
+            rescore_factor=config.RETRIEVAL_RESCORE_FACTOR
+        )
+
+        print("\n=== Quantization (recall@8 vs float32) ===")
+        for row in stats:
+            print(
+                f"{row['kind']:8s} {row['bytes'] / 1e6:8.2f} MB  x{row['savings']:.1f} smaller  "
+                f"first-stage {row['recall_first_stage']:.3f}  rescored {row['recall']:.3f}"
+            )
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build / update the knowledge-base index")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="delete the index and re-ingest every file instead of only new / changed ones"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help=f"PDF parsing processes (default {config.INGEST_WORKERS})"
+    )
+    parser.add_argument(
+        "--no-parse-cache", action="store_true",
+        help="always extract PDF text with pypdf instead of reading cached pages"
+    )
+    args = parser.parse_args()
+
+    main(full=args.full, workers=args.workers, parse_cache=not args.no_parse_cache)
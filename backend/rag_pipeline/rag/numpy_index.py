@@ -0,0 +1,510 @@
+"""
+In-memory brute-force vector index.
+
+The knowledge base is a few thousand chunks, so one float32 matrix
+product over every chunk embedding is cheaper and far more predictable
+than Chroma's HNSW + SQLite round trip. Rows are stored sorted by their
+"domain" metadata, so a domain filter is just a contiguous slice, and
+several domain lookups for the same query share one GEMM.
+
+Ranking matches Chroma's default L2 space exactly:
+    argmin ||q - x||^2  ==  argmax (q . x - ||x||^2 / 2)
+
+The class implements the parts of the langchain vector store interface
+that rag_gen uses (embeddings, similarity_search,
+similarity_search_by_vector), so it can be swapped in for Chroma with
+ERGOCARE_RETRIEVAL_BACKEND=numpy.
+
+save() writes a snapshot directory that load() memory-maps:
+
+    vectors.npy        (n, dim) float32 / float16, rows sorted by domain
+    half_sq_norms.npy  (n,) float32
+    texts.bin          every chunk text, utf-8, back to back
+    text_offsets.npy   (n + 1,) int64 byte offsets into texts.bin
+    meta.json          ids, metadatas, domain slices, index version
+    vectors_int8.npy, scales_int8.npy, vectors_float16.npy
+                       optional quantized copies (see quantization.py)
+
+Opening it costs a few milliseconds, and every worker process shares the
+same pages through the OS page cache.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_pipeline.rag.quantization import QUANTIZATION_KINDS, QuantizedVectors
+
+
+SNAPSHOT_FORMAT = 1
+
+
+def _make_document(text: str, metadata: Dict):
+    from langchain_core.documents import Document
+    return Document(page_content=text, metadata=dict(metadata))
+
+
+def _half_sq_norms(vectors: np.ndarray) -> np.ndarray:
+    v = np.asarray(vectors, dtype=np.float32)
+    return 0.5 * np.einsum("ij,ij->i", v, v)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the k largest scores per row, best first.
+    argpartition is O(n); only the k survivors get sorted.
+    """
+    n = scores.shape[1]
+    if k >= n:
+        return np.argsort(-scores, axis=1, kind="stable")
+
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class MappedTexts:
+    """
+    Read-only list of chunk texts backed by texts.bin + offsets;
+    a text is decoded only when it is accessed.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class NumpyIndex:
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict],
+        ids: Optional[Sequence[str]] = None,
+        embedding_function=None
+    ):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts) or len(texts) != len(metadatas):
+            raise ValueError("vectors, texts and metadatas must have matching lengths")
+
+        # Group rows by domain so each domain is one contiguous slice
+        domains = [str((m or {}).get("domain", "")) for m in metadatas]
+        order = sorted(range(len(domains)), key=lambda i: (domains[i], i))
+
+        domain_slices: Dict[str, Tuple[int, int]] = {}
+        for row, i in enumerate(order):
+            start, _ = domain_slices.get(domains[i], (row, row))
+            domain_slices[domains[i]] = (start, row + 1)
+
+        sorted_vectors = np.ascontiguousarray(vectors[order])
+        self._set(
+            sorted_vectors,
+            _half_sq_norms(sorted_vectors),
+            [texts[i] for i in order],
+            [dict(metadatas[i] or {}) for i in order],
+            [ids[i] for i in order] if ids is not None else [str(i) for i in order],
+            domain_slices,
+            embedding_function
+        )
+
+    def _set(self, vectors, half_sq_norms, texts, metadatas, ids, domain_slices, embedding_function):
+        self.vectors = vectors
+        self.half_sq_norms = half_sq_norms
+        self.texts = texts
+        self.metadatas = metadatas
+        self.ids = ids
+        self.domain_slices = domain_slices
+        self.embeddings = embedding_function
+        self.version = None
+        self._use_quantized(None, 4)
+
+    def _use_quantized(self, quantized: Optional[QuantizedVectors], rescore_factor: int) -> None:
+        self.quantized = quantized
+        self.rescore_factor = rescore_factor
+
+    def quantize(self, kind: Optional[str], rescore_factor: int = 4) -> "NumpyIndex":
+        """
+        Scores with a float16 / int8 copy first and rescores the best
+        k * rescore_factor candidates at full precision. None switches back
+        to exact full-precision scoring.
+        """
+        self._use_quantized(QuantizedVectors.quantize(self.vectors, kind) if kind else None, rescore_factor)
+        return self
+
+    @classmethod
+    def from_chroma(cls, vectordb, embedding_function=None) -> "NumpyIndex":
+        """
+        Copies every chunk (embedding, text, metadata) out of a langchain
+        Chroma store.
+        """
+        data = vectordb.get(include=["embeddings", "documents", "metadatas"])
+        if embedding_function is None:
+            embedding_function = getattr(vectordb, "embeddings", None)
+        return cls(
+            np.asarray(data["embeddings"], dtype=np.float32),
+            data["documents"],
+            data["metadatas"],
+            ids=data.get("ids"),
+            embedding_function=embedding_function
+        )
+
+    # -------------------------
+    # Snapshot
+    # -------------------------
+
+    def save(
+        self,
+        snapshot_dir: Path,
+        dtype: str = "float32",
+        version: str = None,
+        quantizations: Sequence[str] = ()
+    ) -> Path:
+        """
+        Writes the snapshot next to snapshot_dir and swaps it in with a
+        rename, so a reader never sees a half-written directory.
+        quantizations: extra compact copies to store ("float16", "int8").
+        """
+        snapshot_dir = Path(snapshot_dir)
+        tmp_dir = snapshot_dir.with_name(snapshot_dir.name + ".tmp")
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        vectors = self.vectors.astype(dtype)
+        np.save(tmp_dir / "vectors.npy", vectors)
+        # Norms of the stored (possibly rounded) vectors keep ranking consistent
+        np.save(tmp_dir / "half_sq_norms.npy", _half_sq_norms(vectors))
+
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        with open(tmp_dir / "texts.bin", "wb") as f:
+            for i, text in enumerate(self.texts):
+                encoded = text.encode("utf-8")
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(tmp_dir / "text_offsets.npy", offsets)
+
+        for kind in quantizations:
+            q = QuantizedVectors.quantize(self.vectors, kind)
+            np.save(tmp_dir / f"vectors_{kind}.npy", q.codes)
+            if q.scales is not None:
+                np.save(tmp_dir / f"scales_{kind}.npy", q.scales)
+
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "dtype": str(vectors.dtype),
+            "count": len(self),
+            "dim": self.dim,
+            "ids": list(self.ids),
+            "metadatas": list(self.metadatas),
+            "domain_slices": self.domain_slices,
+            "quantizations": list(quantizations),
+        }
+        (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+        if snapshot_dir.exists():
+            shutil.rmtree(snapshot_dir)
+        os.replace(tmp_dir, snapshot_dir)
+        return snapshot_dir
+
+    @staticmethod
+    def snapshot_version(snapshot_dir: Path) -> Optional[str]:
+        meta_path = Path(snapshot_dir) / "meta.json"
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text(encoding="utf-8")).get("version")
+
+    @classmethod
+    def load(
+        cls,
+        snapshot_dir: Path,
+        embedding_function=None,
+        mmap: bool = True,
+        quantization: Optional[str] = None,
+        rescore_factor: int = 4
+    ) -> "NumpyIndex":
+        """
+        Opens a snapshot written by save(). With mmap (default) nothing is
+        read up front except meta.json; pages are faulted in on first search.
+
+        quantization: score with the stored float16 / int8 copy (computed on
+        the fly if the snapshot does not contain it).
+        """
+        snapshot_dir = Path(snapshot_dir)
+        meta = json.loads((snapshot_dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {meta.get('format')}")
+
+        mode = "r" if mmap else None
+        offsets = np.load(snapshot_dir / "text_offsets.npy", mmap_mode=mode)
+        if offsets[-1] > 0:
+            data = np.memmap(snapshot_dir / "texts.bin", dtype=np.uint8, mode="r")
+            if not mmap:
+                data = np.array(data)
+        else:
+            data = np.empty(0, dtype=np.uint8)
+
+        index = cls.__new__(cls)
+        index._set(
+            np.load(snapshot_dir / "vectors.npy", mmap_mode=mode),
+            np.load(snapshot_dir / "half_sq_norms.npy", mmap_mode=mode),
+            MappedTexts(data, offsets),
+            meta["metadatas"],
+            meta["ids"],
+            {d: tuple(bounds) for d, bounds in meta["domain_slices"].items()},
+            embedding_function
+        )
+        index.version = meta.get("version")
+
+        if quantization:
+            if quantization in meta.get("quantizations", []):
+                scales_path = snapshot_dir / f"scales_{quantization}.npy"
+                index._use_quantized(
+                    QuantizedVectors(
+                        quantization,
+                        np.load(snapshot_dir / f"vectors_{quantization}.npy", mmap_mode=mode),
+                        np.load(scales_path, mmap_mode=mode) if scales_path.exists() else None
+                    ),
+                    rescore_factor
+                )
+            else:
+                index.quantize(quantization, rescore_factor)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    # -------------------------
+    # Core search
+    # -------------------------
+
+    def _rows(self, search_filter: Optional[Dict]) -> Tuple[int, int, Optional[np.ndarray]]:
+        """
+        (start, end, mask) of the rows a filter allows. Domain filters map
+        to a slice; any other equality filter becomes a mask on top of it.
+        """
+        if not search_filter:
+            return 0, len(self), None
+
+        start, end = 0, len(self)
+        rest = dict(search_filter)
+        if "domain" in rest and not isinstance(rest["domain"], dict):
+            start, end = self.domain_slices.get(str(rest.pop("domain")), (0, 0))
+        if not rest:
+            return start, end, None
+
+        for key, value in rest.items():
+            if isinstance(value, dict):
+                raise ValueError(f"Unsupported filter operator for '{key}': {value}")
+        mask = np.fromiter(
+            (all(self.metadatas[i].get(k) == v for k, v in rest.items()) for i in range(start, end)),
+            dtype=bool, count=end - start
+        )
+        return start, end, mask
+
+    def _scores(self, Q: np.ndarray, start: int, end: int) -> np.ndarray:
+        # First stage: compact copy if quantized, else full precision
+        if self.quantized is not None:
+            scores = self.quantized.dot(Q, start, end)
+        else:
+            scores = Q @ self.vectors[start:end].T
+        scores -= self.half_sq_norms[start:end]
+        return scores
+
+    def _best(self, Q: np.ndarray, scores: np.ndarray, start: int, k: int):
+        """
+        (rows, scores) of the k best columns per query. Quantized scores
+        only pick k * rescore_factor candidates, which are then rescored
+        against the full-precision vectors.
+        """
+        if self.quantized is None:
+            idx = top_k(scores, k)
+            return idx + start, np.take_along_axis(scores, idx, axis=1)
+
+        candidates = top_k(scores, min(scores.shape[1], k * self.rescore_factor))
+        approx = np.take_along_axis(scores, candidates, axis=1)
+        rows = candidates + start
+
+        # Only the candidate rows are read (from the mmap) and upcast; a
+        # full float32 copy would undo the float16 / mmap memory savings
+        candidate_vectors = self.vectors[rows].astype(np.float32, copy=False)
+        exact = np.einsum("md,mcd->mc", Q, candidate_vectors) - self.half_sq_norms[rows]
+        exact[np.isneginf(approx)] = -np.inf   # keep filtered-out rows out
+
+        best = top_k(exact, k)
+        return np.take_along_axis(rows, best, axis=1), np.take_along_axis(exact, best, axis=1)
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        search_filter: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Input: (m, dim) query vectors
+        Output: (row indices, scores), each (m, <=k), best first.
+                Scores are q.x - |x|^2/2 (higher is closer).
+        """
+        Q = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        start, end, mask = self._rows(search_filter)
+
+        scores = self._scores(Q, start, end)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        available = end - start if mask is None else int(mask.sum())
+        k = min(k, available)
+        if k <= 0:
+            empty = np.empty((len(Q), 0))
+            return empty.astype(np.int64), empty
+
+        return self._best(Q, scores, start, k)
+
+    def search_domains(
+        self,
+        query_vector,
+        requests: Dict[str, int],
+        with_scores: bool = False
+    ) -> Dict[str, np.ndarray]:
+        """
+        Input: one query vector + {domain: k}
+        Output: {domain: row indices, best first}
+                ({domain: (rows, scores)} with with_scores)
+
+        One GEMM against the whole matrix serves every domain; each domain
+        then only runs argpartition over its own slice of the scores.
+        """
+        Q = np.asarray(query_vector, dtype=np.float32)[None, :]
+        scores = self._scores(Q, 0, len(self))
+
+        out = {}
+        for domain, k in requests.items():
+            start, end = self.domain_slices.get(domain, (0, 0))
+            k = min(k, end - start)
+            if k <= 0:
+                empty = np.empty(0, dtype=np.int64)
+                out[domain] = (empty, np.empty(0)) if with_scores else empty
+                continue
+            rows, best = self._best(Q, scores[:, start:end], start, k)
+            out[domain] = (rows[0], best[0]) if with_scores else rows[0]
+        return out
+
+    # -------------------------
+    # langchain-compatible surface
+    # -------------------------
+
+    def documents(self, rows) -> List:
+        return [_make_document(self.texts[i], self.metadatas[i]) for i in rows]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: Dict = None, **kwargs):
+        rows, _ = self.search(embedding, k, filter)
+        return self.documents(rows[0])
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k: int = 4, filter: Dict = None, **kwargs
+    ) -> List[Tuple]:
+        """
+        [(doc, squared L2 distance)], closest first (Chroma's convention).
+        """
+        q = np.asarray(embedding, dtype=np.float32)
+        rows, scores = self.search(q, k, filter)
+        return list(zip(self.documents(rows[0]), _distances(q, scores[0])))
+
+    def similarity_search(self, query: str, k: int = 4, filter: Dict = None, **kwargs):
+        if self.embeddings is None:
+            raise ValueError("NumpyIndex has no embedding function for text queries")
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, filter)
+
+    def similarity_search_by_domain(
+        self,
+        embedding,
+        requests: Dict[str, int],
+        with_scores: bool = False
+    ) -> Dict[str, List]:
+        """
+        {domain: docs}, or {domain: [(doc, squared L2 distance)]} with
+        with_scores.
+        """
+        if not with_scores:
+            return {
+                domain: self.documents(rows)
+                for domain, rows in self.search_domains(embedding, requests).items()
+            }
+
+        q = np.asarray(embedding, dtype=np.float32)
+        return {
+            domain: list(zip(self.documents(rows), _distances(q, scores)))
+            for domain, (rows, scores) in self.search_domains(q, requests, with_scores=True).items()
+        }
+
+
+def _distances(q: np.ndarray, scores: np.ndarray) -> List[float]:
+    # |q - x|^2 = |q|^2 - 2 (q.x - |x|^2 / 2)
+    return [float(d) for d in float(q @ q) - 2 * np.asarray(scores, dtype=np.float64)]
+
+
+def quantization_report(
+    index: NumpyIndex,
+    queries: np.ndarray,
+    k: int = 8,
+    kinds: Sequence[str] = QUANTIZATION_KINDS,
+    rescore_factor: int = 4
+) -> List[Dict]:
+    """
+    Memory of each first-stage matrix and recall@k (with and without
+    rescoring) against exact full-precision search.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    saved = (index.quantized, index.rescore_factor)
+
+    index._use_quantized(None, rescore_factor)
+    baseline_bytes = 4 * index.vectors.size   # float32
+    exact, _ = index.search(queries, k)
+
+    def recall(rows) -> float:
+        hits = [len(set(a) & set(b)) for a, b in zip(rows, exact)]
+        return sum(hits) / max(exact.size, 1)
+
+    rows_out = [{
+        "kind": "float32", "bytes": baseline_bytes, "savings": 1.0,
+        "recall_first_stage": 1.0, "recall": 1.0
+    }]
+    try:
+        for kind in kinds:
+            q = QuantizedVectors.quantize(index.vectors, kind)
+            index._use_quantized(q, 1)
+            first_stage, _ = index.search(queries, k)
+            index.rescore_factor = rescore_factor
+            rescored, _ = index.search(queries, k)
+            rows_out.append({
+                "kind": kind,
+                "bytes": q.nbytes,
+                "savings": baseline_bytes / q.nbytes,
+                "recall_first_stage": recall(first_stage),
+                "recall": recall(rescored)
+            })
+    finally:
+        index._use_quantized(*saved)
+
+    return rows_out
@@ -0,0 +1,51 @@
+"""
+Profile-independent report context (the policy / safety chunks), resolved
+once per index build instead of once per report.
+
+The resolved block is tied to the index version stamped by ingest.main()
+and to the vectordb instance it came from; when either changes, the next
+get() resolves it again.
+"""
+
+import threading
+from pathlib import Path
+
+from metrics import metrics
+from rag_pipeline.rag.index_store import read_index_version
+from rag_pipeline.rag.rag_gen import PinnedBlock, resolve_pinned
+
+
+class PinnedContext:
+
+    def __init__(self, index_dir: Path, name: str = "pinned_context"):
+        self.index_dir = Path(index_dir)
+        self._lock = threading.Lock()
+        self._version = None
+        self._vectordb = None
+        self._pinned = None
+
+        self._refreshes = metrics.counter(f"{name}.refreshes")
+
+    def _is_current(self, version: str, vectordb) -> bool:
+        return (
+            self._pinned is not None
+            and self._version == version
+            and self._vectordb is vectordb
+        )
+
+    def get(self, vectordb) -> PinnedBlock:
+        version = read_index_version(self.index_dir)
+        if self._is_current(version, vectordb):
+            return self._pinned
+
+        with self._lock:
+            if not self._is_current(version, vectordb):
+                self._pinned = resolve_pinned(vectordb)
+                self._version = version
+                self._vectordb = vectordb
+                self._refreshes.inc()
+            return self._pinned
+
+    @property
+    def version(self) -> str:
+        return self._version
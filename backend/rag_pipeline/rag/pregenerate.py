@@ -0,0 +1,265 @@
+"""
+Offline pre-generation of reports for every reachable profile.
+
+build_rag_user_data() only produces the 3^3 posture / vision / cognitive
+risk label combinations for the ML output (see
+enumerate_rag_user_data). This job renders a report for each of them
+into a SQLite store keyed by profile, which /report reads before the
+report cache or the LLM.
+
+Every entry records two fingerprints:
+
+    stamp   kb / prompt / model versions the entry is valid for; /report
+            only serves an entry whose stamp matches the current one
+    inputs  hash of what the LLM was actually given (prompts, evidence
+            sources, renderer / prompt version, model)
+
+After an ingest or a prompt change the job re-runs retrieval for every
+stale entry. If the prompts came out identical (the changed documents
+were not selected for that profile, a Low-only profile, ...) the entry
+is only re-stamped; the LLM is called just for the rest. Each finished
+entry is committed at once, so an interrupted run resumes where it
+stopped.
+
+Run from backend/ after ingest:
+    python -m rag_pipeline.rag.pregenerate [--concurrency 2] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import config
+from metrics import metrics
+from ml_to_rag_bridge import enumerate_rag_user_data
+from rag_pipeline.rag.admission import AdmissionGate
+from rag_pipeline.rag.rag_gen import build_report_prompt, generate_from_prompt
+from rag_pipeline.rag.rag_pipeline import HYBRID, report_versions
+from rag_pipeline.rag.report_cache import profile_key, version_stamp
+from rag_pipeline.rag.report_renderer import RENDERER_VERSION, prepare_report, render_prepared
+
+
+# -------------------------
+# Store
+# -------------------------
+
+class PregeneratedStore:
+    """
+    profile key -> (stamp, inputs, zlib-compressed report)
+    """
+
+    def __init__(self, db_path: Path, name: str = "pregenerated"):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pregenerated (
+                profile TEXT PRIMARY KEY,
+                stamp TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                report BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+        self._hits = metrics.counter(f"{name}.hits")
+        self._misses = metrics.counter(f"{name}.misses")
+
+    def get(self, profile: str, stamp: str) -> Optional[str]:
+        """
+        The report for this profile, if it is valid for `stamp`.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT report FROM pregenerated WHERE profile = ? AND stamp = ?", (profile, stamp)
+            ).fetchone()
+
+        if row is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def entry(self, profile: str) -> Optional[Tuple[str, str]]:
+        """
+        (stamp, inputs) of the stored entry, whatever its stamp.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT stamp, inputs FROM pregenerated WHERE profile = ?", (profile,)
+            ).fetchone()
+
+    def put(self, profile: str, stamp: str, inputs: str, report: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pregenerated (profile, stamp, inputs, report, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (profile, stamp, inputs, zlib.compress(report.encode("utf-8"), 9), time.time())
+            )
+            self._db.commit()
+
+    def restamp(self, profile: str, stamp: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE pregenerated SET stamp = ? WHERE profile = ?", (stamp, profile))
+            self._db.commit()
+
+    def stats(self, stamp: str = None) -> Dict:
+        with self._lock:
+            (entries, size) = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(report)), 0) FROM pregenerated"
+            ).fetchone()
+            current = None
+            if stamp is not None:
+                (current,) = self._db.execute(
+                    "SELECT COUNT(*) FROM pregenerated WHERE stamp = ?", (stamp,)
+                ).fetchone()
+        return {
+            "entries": entries,
+            "current": current,
+            "report_bytes": size,
+            "hits": self._hits.value,
+            "misses": self._misses.value
+        }
+
+
+# -------------------------
+# Job
+# -------------------------
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def plan_report(vectordb, user_data: Dict, pinned=None, gate: AdmissionGate = None) -> Tuple[str, Callable]:
+    """
+    Retrieval and prompt assembly for one profile, without the LLM.
+
+    Output: (inputs fingerprint, generate(llm) -> report), generate()
+    admitted through `gate` (llm_gate unless given)
+    """
+    if HYBRID:
+        prepared = prepare_report(vectordb, user_data, pinned=pinned)
+        _, prompts, sources = prepared
+        inputs = _fingerprint(RENDERER_VERSION, config.LLM_MODEL_NAME, user_data, prompts, sources)
+        return inputs, lambda llm: render_prepared(llm, user_data, prepared, gate=gate)
+
+    prompt = build_report_prompt(vectordb, user_data, pinned=pinned)
+    inputs = _fingerprint(config.LLM_MODEL_NAME, prompt)
+    return inputs, lambda llm: generate_from_prompt(llm, prompt, gate=gate)
+
+
+def pregenerate(
+    store: PregeneratedStore,
+    llm,
+    vectordb,
+    profiles: Iterable[Dict],
+    pinned=None,
+    concurrency: int = 1,
+    force: bool = False,
+    progress_every: int = 25,
+    gate: AdmissionGate = None
+) -> Dict[str, int]:
+    """
+    Brings every profile's entry up to the current versions.
+
+    Input:
+        profiles:    user_data dicts (see enumerate_rag_user_data)
+        concurrency: profiles processed at once
+        force:       regenerate even entries that are up to date
+        gate:        admission for the LLM calls, llm_gate unless given
+
+    Output: {"current", "restamped", "generated", "failed"} counts
+    """
+    stamp = version_stamp(**report_versions())
+    counts = {"current": 0, "restamped": 0, "generated": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def process(user_data: Dict) -> str:
+        profile = profile_key(user_data)
+        entry = store.entry(profile)
+        if entry is not None and entry[0] == stamp and not force:
+            return "current"
+
+        inputs, generate = plan_report(vectordb, user_data, pinned, gate)
+        if entry is not None and entry[1] == inputs and not force:
+            store.restamp(profile, stamp)
+            return "restamped"
+
+        store.put(profile, stamp, inputs, generate(llm))
+        return "generated"
+
+    def run(user_data: Dict) -> None:
+        try:
+            outcome = process(user_data)
+        except Exception as e:
+            print(f"[WARN] Profile {json.dumps(user_data, sort_keys=True)} failed: {e}")
+            outcome = "failed"
+
+        with counts_lock:
+            counts[outcome] += 1
+            done = sum(counts.values())
+            if progress_every and done % progress_every == 0:
+                print(f"[INFO] {done} profiles: {counts}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(run, profiles))
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate reports for every reachable profile")
+    parser.add_argument("--concurrency", type=int, default=config.PREGEN_CONCURRENCY)
+    parser.add_argument("--force", action="store_true", help="regenerate every entry")
+    args = parser.parse_args()
+
+    from resources import get_llm, get_pinned_context, get_vectordb
+
+    profiles = list(enumerate_rag_user_data())
+
+    vectordb = get_vectordb()
+    pinned = get_pinned_context().get(vectordb)
+    store = PregeneratedStore(config.PREGEN_PATH)
+
+    # The job's own gate, so the shared llm_gate keeps its configured
+    # limits: one slot per report in flight (parallel section mode
+    # included), and a profile waits for a slot instead of failing
+    gate = AdmissionGate(
+        max_in_flight=args.concurrency,
+        max_queue=args.concurrency,
+        wait_timeout_s=None,
+        name="pregenerate_gate"
+    )
+
+    print(f"[INFO] {len(profiles)} profiles, concurrency {args.concurrency}, store {config.PREGEN_PATH}")
+    start = time.perf_counter()
+    counts = pregenerate(
+        store, get_llm(), vectordb, profiles,
+        pinned=pinned, concurrency=args.concurrency, force=args.force, gate=gate
+    )
+    elapsed = time.perf_counter() - start
+
+    stats = store.stats(version_stamp(**report_versions()))
+    print(
+        f"[INFO] Done in {elapsed:.1f}s: {counts['current']} up to date, {counts['restamped']} re-validated "
+        f"without the LLM, {counts['generated']} generated, {counts['failed']} failed"
+    )
+    print(
+        f"[INFO] Store: {stats['current']}/{stats['entries']} entries current, "
+        f"{stats['report_bytes'] / 1024:.0f} KiB of compressed reports"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compact copies of the chunk embedding matrix for first-stage scoring.
+
+    float16  2 bytes / dim            x ~= codes
+    int8     1 byte / dim + 1 scale   x ~= codes * scale   (per vector)
+
+int8 uses a symmetric per-vector scale (max |x| / 127), so every row keeps
+its full 8-bit range regardless of its norm. NumpyIndex scores all rows on
+the compact copy, then rescores the best candidates against the
+full-precision vectors, which only touches a handful of rows.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+QUANTIZATION_KINDS = ("float16", "int8")
+
+# Rows converted to float32 per step; bounds the temporary to
+# BLOCK_ROWS x dim floats however large the corpus is
+BLOCK_ROWS = 4096
+
+
+class QuantizedVectors:
+
+    def __init__(self, kind: str, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        if kind not in QUANTIZATION_KINDS:
+            raise ValueError(f"Unknown quantization: {kind} (expected one of {QUANTIZATION_KINDS})")
+        self.kind = kind
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, kind: str) -> "QuantizedVectors":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if kind == "float16":
+            return cls(kind, vectors.astype(np.float16))
+        if kind == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            return cls(kind, codes, scales.astype(np.float32))
+        raise ValueError(f"Unknown quantization: {kind} (expected one of {QUANTIZATION_KINDS})")
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def dot(self, Q: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Approximate Q @ x.T for rows [start, end), shape (m, end - start).
+        """
+        out = np.empty((len(Q), end - start), dtype=np.float32)
+        for lo in range(start, end, BLOCK_ROWS):
+            hi = min(lo + BLOCK_ROWS, end)
+            block = Q @ self.codes[lo:hi].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[lo:hi]
+            out[:, lo - start:hi - start] = block
+        return out
+
+    def dequantize(self) -> np.ndarray:
+        x = self.codes.astype(np.float32)
+        if self.scales is not None:
+            x *= self.scales[:, None]
+        return x
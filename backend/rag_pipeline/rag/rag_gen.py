@@ -1,85 +1,43 @@
+import hashlib
 import json
-from pathlib import Path
-from typing import Dict, List
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
+import config
+from metrics import metrics
+from rag_pipeline.rag.admission import AdmissionGate, llm_gate
+from rag_pipeline.rag.context_assembler import assemble_context, estimate_tokens
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-CHROMA_DIR = BASE_DIR / "chroma_db"
+logger = logging.getLogger("ergocare-rag")
 
-def retrieve_docs(vectordb, query: str, k: int = 5, domain: str = None):
-    if domain:
-        return vectordb.similarity_search(query, k=k, filter={"domain": domain})
-    return vectordb.similarity_search(query, k=k)
 
+STAGE_TIMES = {
+    "retrieval": metrics.histogram("rag.retrieval_ms"),
+    "generation": metrics.histogram("rag.generation_ms"),
+}
 
-def format_context(docs) -> str:
-    context_blocks = []
-    for i, d in enumerate(docs):
-        source = d.metadata.get("source", "unknown")
-        domain = d.metadata.get("domain", "unknown")
+PROMPT_STATS = {
+    "prompt_tokens": metrics.histogram("rag.prompt_tokens"),
+    "context_chunks": metrics.histogram("rag.context_chunks"),
+    "duplicates": metrics.counter("rag.context_duplicates"),
+    "trimmed": metrics.counter("rag.context_trimmed"),
+}
 
-        context_blocks.append(
-            f"[DOC {i+1}] (domain={domain})\nSOURCE: {source}\nCONTENT:\n{d.page_content}\n"
-        )
-    return "\n\n".join(context_blocks)
 
+# ----------------------------
+# Prompt templates
+# ----------------------------
+# Any edit here changes PROMPT_VERSION, which invalidates cached reports.
+#
+# Prompts are sent as a system and a user message. Everything that is the
+# same for every profile comes first (SYSTEM_PROMPT, then the pinned
+# context block at the top of the user message), so Ollama reuses that
+# prefix from its KV cache instead of prefilling it on every report.
 
-def extract_sources(docs) -> List[str]:
-    seen = set()
-    sources = []
-    for d in docs:
-        src = d.metadata.get("source", "unknown")
-        if src not in seen:
-            seen.add(src)
-            sources.append(src)
-    return sources
-
-def generate_report(llm, vectordb, user_data: Dict):
-    """
-    Generates a structured ergonomic recommendation report using:
-    - ML pipeline outputs (risk indices + drivers)
-    - Retrieved ergonomic/policy documents from Chroma
-    """
-
-    # ----------------------------
-    # Helper: format numeric risk score to label
-    # ----------------------------
-    def score_to_label(score: float) -> str:
-        if score < 35:
-            return "Low"
-        elif score < 70:
-            return "Moderate"
-        return "High"
-
-    # ----------------------------
-    # Extract indices (safe fallback)
-    # ----------------------------
-    posture_score = float(user_data.get("posture_risk_index", 0))
-    vision_score = float(user_data.get("visual_strain_index", 0))
-    cognitive_score = float(user_data.get("cognitive_load_index", 0))
-    msk_score = float(user_data.get("msk_risk_index", 0))
-    lifestyle_score = float(user_data.get("lifestyle_risk_index", 0))
-    overall_score = float(user_data.get("overall_risk_index", 0))
-
-    posture_label = score_to_label(posture_score)
-    vision_label = score_to_label(vision_score)
-    cognitive_label = score_to_label(cognitive_score)
-    msk_label = score_to_label(msk_score)
-    lifestyle_label = score_to_label(lifestyle_score)
-    overall_label = score_to_label(overall_score)
-
-    primary_domain = user_data.get("primary_domain", "general")
-    high_domains = user_data.get("high_domains", [])
-    moderate_domains = user_data.get("moderate_domains", [])
-
-    # ----------------------------
-    # Strong query for retrieval
-    # ----------------------------
-    query = f"""
+QUERY_TEMPLATE = """
 User ergonomic risk assessment (ErgoCare AI):
 
 Overall Risk Score: {overall_score:.1f} ({overall_label})
@@ -98,41 +56,7 @@ stretching guidance, and preventive strategies.
 Keep it non-diagnostic.
 """
 
-    # ----------------------------
-    # Retrieval Strategy (weighted)
-    # ----------------------------
-    policy_docs = retrieve_docs(
-        vectordb,
-        query="clinical safety disclaimer do not diagnose non medical ergonomic report format",
-        k=4,
-        domain="policy"
-    )
-
-    general_docs = retrieve_docs(vectordb, query=query, k=4, domain="general")
-
-    # Primary domain gets more retrieval weight
-    primary_docs = retrieve_docs(vectordb, query=query, k=8, domain=primary_domain)
-
-    posture_docs = retrieve_docs(vectordb, query=query, k=3, domain="posture")
-    vision_docs = retrieve_docs(vectordb, query=query, k=3, domain="vision")
-    cognitive_docs = retrieve_docs(vectordb, query=query, k=3, domain="cognitive")
-
-    retrieved_docs = (
-        policy_docs
-        + general_docs
-        + primary_docs
-        + posture_docs
-        + vision_docs
-        + cognitive_docs
-    )
-
-    context = format_context(retrieved_docs)
-    sources = extract_sources(retrieved_docs)
-
-    # ----------------------------
-    # Hard-constraint system prompt
-    # ----------------------------
-    system_prompt = f"""
+SYSTEM_PROMPT = """
 You are ErgoCare AI, an ergonomic decision-support assistant.
 
 You MUST follow these rules:
@@ -203,12 +127,12 @@ FAILURE CONDITION:
 If you output anything outside this format, the answer is invalid.
 """
 
-    # ----------------------------
-    # User prompt includes user data + retrieved context
-    # ----------------------------
-    user_prompt = f"""
+USER_PROMPT_TEMPLATE = """
+CONTEXT DOCUMENTS:
+{context}
+
 USER DATA (JSON):
-{json.dumps(user_data, indent=2)}
+{user_json}
 
 DERIVED RISK LABELS:
 - Overall: {overall_label} ({overall_score:.1f})
@@ -218,9 +142,6 @@ DERIVED RISK LABELS:
 - MSK Pain: {msk_label} ({msk_score:.1f})
 - Lifestyle: {lifestyle_label} ({lifestyle_score:.1f})
 
-CONTEXT DOCUMENTS:
-{context}
-
 IMPORTANT INSTRUCTIONS:
 - You MUST generate recommendations personalized to the risk scores.
 - If a risk domain is Low, explicitly state:
@@ -230,31 +151,443 @@ IMPORTANT INSTRUCTIONS:
 - Evidence sources must ONLY be from the available retrieved sources list.
 
 AVAILABLE RETRIEVED SOURCES:
-{chr(10).join(["- " + s for s in sources])}
+{source_list}
 
 Now generate the final ergonomic report.
 """
 
+# Context assembly settings change the prompt too
+CONTEXT_SETTINGS = json.dumps({
+    "budget": config.CONTEXT_TOKEN_BUDGET,
+    "weights": config.CONTEXT_RISK_WEIGHTS,
+    "near_duplicate": config.CONTEXT_NEAR_DUPLICATE,
+}, sort_keys=True)
+
+PROMPT_VERSION = hashlib.sha256(
+    (QUERY_TEMPLATE + SYSTEM_PROMPT + USER_PROMPT_TEMPLATE + CONTEXT_SETTINGS).encode("utf-8")
+).hexdigest()[:12]
+
+
+def score_to_label(score: float) -> str:
+    if score < 35:
+        return "Low"
+    elif score < 70:
+        return "Moderate"
+    return "High"
+
+
+# Risk domain -> (Low/Moderate/High label, as set by ml_to_rag_bridge,
+# and the 0-100 index used when no label is given)
+DOMAIN_RISK_FIELDS = {
+    "posture": ("posture_risk", "posture_risk_index"),
+    "vision": ("vision_risk", "visual_strain_index"),
+    "cognitive": ("cognitive_risk", "cognitive_load_index"),
+    "msk": ("msk_risk", "msk_risk_index"),
+    "lifestyle": ("lifestyle_risk", "lifestyle_risk_index"),
+}
+
+
+# The ML output has no msk / lifestyle index; without one their level
+# follows the questionnaire answers instead
+DISCOMFORT_RISK = {"No": "Low", "Sometimes": "Moderate", "Yes": "High"}
+MSK_DISCOMFORT_FIELDS = ("neck_discomfort", "back_discomfort")
+# (minimum sitting_hours, level), highest first
+SITTING_HOURS_RISK = ((8, "High"), (6, "Moderate"))
+
+RISK_ORDER = {"Low": 0, "Moderate": 1, "High": 2}
+
+
+def _derived_level(domain: str, user_data: Dict) -> Optional[str]:
+    if domain == "msk":
+        levels = [DISCOMFORT_RISK.get(user_data.get(f), "Low") for f in MSK_DISCOMFORT_FIELDS]
+        return max(levels, key=RISK_ORDER.get)
+
+    if domain == "lifestyle":
+        sitting_hours = user_data.get("sitting_hours")
+        if not isinstance(sitting_hours, (int, float)):
+            return "Low"
+        return next((level for hours, level in SITTING_HOURS_RISK if sitting_hours >= hours), "Low")
+
+    return None
+
+
+def domain_risk_levels(user_data: Dict) -> Dict[str, str]:
+    """
+    Low / Moderate / High per risk domain: the label when present, else
+    the label of the numeric index. msk and lifestyle without either are
+    derived from the neck / back discomfort answers and sitting_hours.
+    """
+    levels = {}
+    for domain, (label_field, index_field) in DOMAIN_RISK_FIELDS.items():
+        label = user_data.get(label_field)
+        if label not in ("Low", "Moderate", "High"):
+            if index_field in user_data:
+                label = score_to_label(float(user_data[index_field]))
+            else:
+                label = _derived_level(domain, user_data) or "Low"
+        levels[domain] = label
+    return levels
+
+
+def embed_query(vectordb, query: str):
+    """
+    Query embedding from the store's own embedding function, or None if
+    the store does not expose one (then searches embed per call).
+    """
+    embeddings = getattr(vectordb, "embeddings", None)
+    if embeddings is None:
+        return None
+    return embeddings.embed_query(query)
+
+
+def retrieve_docs(vectordb, query: str, k: int = 5, domain: str = None, embedding=None):
+    search_filter = {"domain": domain} if domain else None
+    if embedding is not None:
+        return vectordb.similarity_search_by_vector(embedding, k=k, filter=search_filter)
+    if search_filter:
+        return vectordb.similarity_search(query, k=k, filter=search_filter)
+    return vectordb.similarity_search(query, k=k)
+
+
+def retrieve_docs_with_scores(vectordb, query: str, k: int = 5, domain: str = None, embedding=None):
+    """
+    [(doc, score)], best first; score is the negated distance, so higher
+    is closer.
+    """
+    search_filter = {"domain": domain} if domain else None
+    if embedding is not None:
+        pairs = vectordb.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=search_filter)
+    else:
+        pairs = vectordb.similarity_search_with_score(query, k=k, filter=search_filter)
+    return [(d, -distance) for d, distance in pairs]
+
+
+def retrieve_by_domain(
+    vectordb,
+    query: str,
+    requests: List[Tuple[str, int]],
+    with_scores: bool = False
+) -> Dict[str, List]:
+    """
+    Input: query + [(domain, k), ...]
+    Output: {domain: docs} with the largest k requested for that domain
+            ({domain: [(doc, score)]} with with_scores, see
+            retrieve_docs_with_scores)
+
+    The query is embedded once and every distinct domain is searched once
+    by vector; a caller that asked for fewer docs slices the list (top-k
+    of a larger top-k is the same ranking). Stores that can serve all
+    domains in one pass (NumpyIndex) get a single call.
+    """
+    wanted: Dict[str, int] = {}
+    for domain, k in requests:
+        wanted[domain] = max(k, wanted.get(domain, 0))
+
+    embedding = embed_query(vectordb, query)
+    if embedding is not None and hasattr(vectordb, "similarity_search_by_domain"):
+        if not with_scores:
+            return vectordb.similarity_search_by_domain(embedding, wanted)
+        return {
+            domain: [(d, -distance) for d, distance in pairs]
+            for domain, pairs in vectordb.similarity_search_by_domain(embedding, wanted, with_scores=True).items()
+        }
+
+    if with_scores:
+        return {
+            domain: retrieve_docs_with_scores(vectordb, query, k=k, domain=domain, embedding=embedding)
+            for domain, k in wanted.items()
+        }
+
+    return {
+        domain: retrieve_docs(vectordb, query, k=k, domain=domain, embedding=embedding)
+        for domain, k in wanted.items()
+    }
+
+
+# Profile-independent lookups, identical for every report:
+# (domain, query, k). Resolved once per index build, see pinned_context.py.
+PINNED_RETRIEVALS = [
+    ("policy", "clinical safety disclaimer do not diagnose non medical ergonomic report format", 4),
+]
+
+
+def chat_messages(system_prompt: str, user_prompt: str) -> List[Tuple[str, str]]:
+    """
+    Chat model input: [("system", ...), ("human", ...)].
+    """
+    return [("system", system_prompt), ("human", user_prompt)]
+
+
+def prompt_text(messages: List[Tuple[str, str]]) -> str:
+    """
+    All message texts, for token estimates and logging.
+    """
+    return "\n\n".join(text for _, text in messages)
+
+
+def format_context(docs, start: int = 1) -> str:
+    context_blocks = []
+    for i, d in enumerate(docs, start=start - 1):
+        source = d.metadata.get("source", "unknown")
+        domain = d.metadata.get("domain", "unknown")
+
+        context_blocks.append(
+            f"[DOC {i+1}] (domain={domain})\nSOURCE: {source}\nCONTENT:\n{d.page_content}\n"
+        )
+    return "\n\n".join(context_blocks)
+
+
+def extract_sources(docs) -> List[str]:
+    seen = set()
+    sources = []
+    for d in docs:
+        src = d.metadata.get("source", "unknown")
+        if src not in seen:
+            seen.add(src)
+            sources.append(src)
+    return sources
+
+class PinnedBlock:
+    """
+    Results of PINNED_RETRIEVALS plus their rendered [DOC n] context,
+    which always opens the report context.
+    """
+
+    def __init__(self, docs: Dict[str, List]):
+        self.docs = docs
+        self.all_docs = [d for domain, _, _ in PINNED_RETRIEVALS for d in docs[domain]]
+        self.block = format_context(self.all_docs)
+
+
+def resolve_pinned(vectordb) -> PinnedBlock:
+    return PinnedBlock({
+        domain: retrieve_docs(vectordb, query=query, k=k, domain=domain)
+        for domain, query, k in PINNED_RETRIEVALS
+    })
+
+
+def build_report_prompt(
+    vectordb,
+    user_data: Dict,
+    timings: Dict = None,
+    pinned: PinnedBlock = None
+) -> List[Tuple[str, str]]:
+    """
+    Retrieves context for user_data and renders the system and user
+    messages that generate_report / stream_report send.
+
+    pinned: pre-resolved profile-independent context for this vectordb;
+            looked up on the spot when not given.
+    """
+
     # ----------------------------
-    # Invoke LLM safely
+    # Extract indices (safe fallback)
     # ----------------------------
-    response = llm.invoke(system_prompt + "\n\n" + user_prompt)
+    posture_score = float(user_data.get("posture_risk_index", 0))
+    vision_score = float(user_data.get("visual_strain_index", 0))
+    cognitive_score = float(user_data.get("cognitive_load_index", 0))
+    msk_score = float(user_data.get("msk_risk_index", 0))
+    lifestyle_score = float(user_data.get("lifestyle_risk_index", 0))
+    overall_score = float(user_data.get("overall_risk_index", 0))
 
-    # Ollama sometimes returns plain string, sometimes object
-    if hasattr(response, "content"):
-        response = response.content
+    posture_label = score_to_label(posture_score)
+    vision_label = score_to_label(vision_score)
+    cognitive_label = score_to_label(cognitive_score)
+    msk_label = score_to_label(msk_score)
+    lifestyle_label = score_to_label(lifestyle_score)
+    overall_label = score_to_label(overall_score)
 
-    return response
+    primary_domain = user_data.get("primary_domain", "general")
+    high_domains = user_data.get("high_domains", [])
+    moderate_domains = user_data.get("moderate_domains", [])
 
-if __name__ == "__main__":
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    # ----------------------------
+    # Strong query for retrieval
+    # ----------------------------
+    query = QUERY_TEMPLATE.format(
+        overall_score=overall_score, overall_label=overall_label,
+        posture_score=posture_score, posture_label=posture_label,
+        vision_score=vision_score, vision_label=vision_label,
+        cognitive_score=cognitive_score, cognitive_label=cognitive_label,
+        msk_score=msk_score, msk_label=msk_label,
+        lifestyle_score=lifestyle_score, lifestyle_label=lifestyle_label,
+        primary_domain=primary_domain,
+        high_domains=high_domains,
+        moderate_domains=moderate_domains
+    )
+
+    # ----------------------------
+    # Retrieval Strategy (weighted)
+    # ----------------------------
+    retrieval_start = time.perf_counter()
+
+    if pinned is None:
+        pinned = resolve_pinned(vectordb)
+
+    # Primary domain gets more retrieval weight; it usually coincides with
+    # one of the per-domain lookups, which is then served from its results
+    by_domain = retrieve_by_domain(vectordb, query, [
+        ("general", 4),
+        (primary_domain, 8),
+        ("posture", 3),
+        ("vision", 3),
+        ("cognitive", 3),
+    ], with_scores=True)
+
+    # Drop repeats, then fit the token budget (higher-risk domains get a
+    # larger share; the lowest-scoring chunks go first)
+    selection = assemble_context(
+        [
+            ("general", by_domain["general"][:4]),
+            (primary_domain, by_domain[primary_domain][:8]),
+            ("posture", by_domain["posture"][:3]),
+            ("vision", by_domain["vision"][:3]),
+            ("cognitive", by_domain["cognitive"][:3]),
+        ],
+        risk_levels=domain_risk_levels(user_data),
+        budget=config.CONTEXT_TOKEN_BUDGET,
+        weights=config.CONTEXT_RISK_WEIGHTS,
+        pinned=pinned.all_docs,
+        near_duplicate=config.CONTEXT_NEAR_DUPLICATE
+    )
+
+    profile_docs = selection.docs
+    retrieved_docs = pinned.all_docs + profile_docs
+
+    # Pinned docs come first, so their rendered block is reused as-is
+    context = "\n\n".join(block for block in (
+        pinned.block,
+        format_context(profile_docs, start=len(pinned.all_docs) + 1)
+    ) if block)
+    sources = extract_sources(retrieved_docs)
+
+    _record(timings, "retrieval", time.perf_counter() - retrieval_start)
+
+    # ----------------------------
+    # Hard-constraint system prompt
+    # ----------------------------
+    system_prompt = SYSTEM_PROMPT
+
+    # ----------------------------
+    # User prompt includes user data + retrieved context
+    # ----------------------------
+    user_prompt = USER_PROMPT_TEMPLATE.format(
+        user_json=json.dumps(user_data, indent=2),
+        overall_label=overall_label, overall_score=overall_score,
+        posture_label=posture_label, posture_score=posture_score,
+        vision_label=vision_label, vision_score=vision_score,
+        cognitive_label=cognitive_label, cognitive_score=cognitive_score,
+        msk_label=msk_label, msk_score=msk_score,
+        lifestyle_label=lifestyle_label, lifestyle_score=lifestyle_score,
+        context=context,
+        source_list=chr(10).join(["- " + s for s in sources])
+    )
 
-    vectordb = Chroma(
-        persist_directory=str(CHROMA_DIR),
-        embedding_function=embeddings
+    messages = chat_messages(system_prompt, user_prompt)
+
+    prompt_tokens = estimate_tokens(prompt_text(messages))
+    PROMPT_STATS["prompt_tokens"].observe(prompt_tokens)
+    PROMPT_STATS["context_chunks"].observe(len(retrieved_docs))
+    PROMPT_STATS["duplicates"].inc(selection.duplicates)
+    PROMPT_STATS["trimmed"].inc(selection.trimmed)
+    logger.info(
+        f"Prompt ~{prompt_tokens} tokens: {len(retrieved_docs)} context chunks "
+        f"(~{selection.tokens} tokens), {selection.duplicates} duplicates dropped, "
+        f"{selection.trimmed} trimmed to budget"
     )
 
-    llm = Ollama(model="llama3.1:8b")
+    return messages
+
+
+def _text(chunk) -> str:
+    # Ollama sometimes returns plain string, sometimes object
+    if hasattr(chunk, "content"):
+        return chunk.content
+    return chunk
+
+
+def _record(timings: Dict, stage: str, seconds: float) -> None:
+    STAGE_TIMES[stage].observe(seconds * 1000)
+    if timings is not None:
+        timings[stage] = seconds
+
+
+def generate_report(
+    llm,
+    vectordb,
+    user_data: Dict,
+    timings: Dict = None,
+    pinned: PinnedBlock = None
+):
+    """
+    Generates a structured ergonomic recommendation report using:
+    - ML pipeline outputs (risk indices + drivers)
+    - Retrieved ergonomic/policy documents from Chroma
+
+    If timings is given, "retrieval" and "generation" seconds are written
+    into it (both are also exported as rag.*_ms histograms).
+    """
+    messages = build_report_prompt(vectordb, user_data, timings, pinned)
+    return generate_from_prompt(llm, messages, timings)
+
+
+def generate_from_prompt(
+    llm,
+    messages: List[Tuple[str, str]],
+    timings: Dict = None,
+    gate: AdmissionGate = None
+) -> str:
+    """
+    Sends the messages from build_report_prompt() to the LLM, admitted
+    through `gate` (llm_gate unless given).
+    """
+    # Raises Overloaded when Ollama already has a full backlog
+    with (gate or llm_gate).slot():
+        start = time.perf_counter()
+        report = _text(llm.invoke(messages))
+        _record(timings, "generation", time.perf_counter() - start)
+    return report
+
+
+def stream_report(
+    llm,
+    vectordb,
+    user_data: Dict,
+    timings: Dict = None,
+    pinned: PinnedBlock = None,
+    cancel: threading.Event = None
+) -> Iterator[str]:
+    """
+    Same report as generate_report, yielded as text chunks while the LLM
+    generates them.
+
+    Closing the generator early (client went away) closes the underlying
+    streaming HTTP response, which makes Ollama abort the generation.
+    Once `cancel` is set, a caller still waiting for an llm_gate slot
+    gives it up (Cancelled) instead of starting the generation.
+    """
+    messages = build_report_prompt(vectordb, user_data, timings, pinned)
+
+    # The slot is held until the stream ends or is closed
+    with llm_gate.slot(cancel):
+        start = time.perf_counter()
+        stream = llm.stream(messages)
+        try:
+            for chunk in stream:
+                text = _text(chunk)
+                if text:
+                    yield text
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            _record(timings, "generation", time.perf_counter() - start)
+
+if __name__ == "__main__":
+    from resources import get_llm, get_vectordb
+
+    vectordb = get_vectordb()
+    llm = get_llm()
 
     user_data = {
         "posture_risk": "High",
@@ -1,35 +1,145 @@
-from pathlib import Path
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
+import threading
+from typing import Dict, Iterator, Optional
 
-from rag_pipeline.rag.rag_gen import generate_report
+import config
+from rag_pipeline.rag.admission import llm_gate
+from rag_pipeline.rag.index_store import read_index_version
+from rag_pipeline.rag.rag_gen import PROMPT_VERSION, generate_report, stream_report
+from rag_pipeline.rag.report_cache import profile_key, report_key, version_stamp
+from rag_pipeline.rag.report_renderer import RENDERER_VERSION, render_report, stream_rendered_report
+from rag_pipeline.rag.single_flight import SingleFlight
+from resources import get_llm, get_pinned_context, get_pregenerated, get_report_cache, get_vectordb
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-CHROMA_DIR = BASE_DIR / "chroma_db"
+# Concurrent requests for the same profile share one generation; the
+# followers each hold a threadpool thread, so only so many may wait
+report_flights = SingleFlight(
+    "report_single_flight",
+    max_followers=config.SINGLE_FLIGHT_MAX_FOLLOWERS,
+    retry_after=llm_gate.retry_after
+)
 
+HYBRID = config.REPORT_RENDERER == "hybrid"
 
-def run_rag_pipeline(user_data: dict) -> str:
+# config.REPORT_RENDERER picks the generator
+build_report = render_report if HYBRID else generate_report
+stream_built_report = stream_rendered_report if HYBRID else stream_report
+
+
+def report_prompt_version() -> str:
+    return f"hybrid-{config.REPORT_SECTION_MODE}-{RENDERER_VERSION}" if HYBRID else PROMPT_VERSION
+
+
+def report_versions() -> Dict[str, str]:
+    """
+    Index / prompt / model versions a report generated now depends on.
+    """
+    return {
+        "kb_version": read_index_version(config.CHROMA_DIR),
+        "prompt_version": report_prompt_version(),
+        "model": config.LLM_MODEL_NAME
+    }
+
+
+def report_cache_key(user_data: dict, versions: Dict[str, str] = None) -> str:
+    return report_key(user_data, **(versions or report_versions()))
+
+
+def lookup_pregenerated(user_data: dict, versions: Dict[str, str]) -> Optional[str]:
+    """
+    Report written by the pre-generation job for this profile, if it was
+    generated (or re-validated) against the current versions.
+    """
+    if not config.PREGEN_ENABLED:
+        return None
+    return get_pregenerated().get(profile_key(user_data), version_stamp(**versions))
+
+
+def run_rag_pipeline(user_data: dict, timings: dict = None) -> str:
     """
     Input: structured user_data (risk + discomfort info)
     Output: final ergonomic report (string)
+
+    If timings is given and the report is generated by this call, the
+    retrieval / generation durations are written into it.
+
+    Reports are served from the pre-generated store or the report cache
+    when the same profile was already generated against the current
+    index / prompt / model, and concurrent identical requests wait on a
+    single generation.
+    """
+
+    versions = report_versions()
+    pregenerated = lookup_pregenerated(user_data, versions)
+    if pregenerated is not None:
+        return pregenerated
+
+    key = report_cache_key(user_data, versions)
+
+    cache = get_report_cache() if config.REPORT_CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    def generate() -> str:
+        # Shared, already-loaded instances (see resources.py)
+        vectordb = get_vectordb()
+        llm = get_llm()
+        pinned = get_pinned_context().get(vectordb)
+
+        report = build_report(llm, vectordb, user_data, timings, pinned)
+
+        if cache is not None:
+            cache.put(key, report)
+        return report
+
+    if not config.SINGLE_FLIGHT_ENABLED:
+        return generate()
+
+    return report_flights.do(key, generate, timeout=config.SINGLE_FLIGHT_TIMEOUT_S)
+
+
+def stream_rag_pipeline(user_data: dict, cancel: threading.Event = None) -> Iterator[str]:
+    """
+    Input: structured user_data (risk + discomfort info)
+    Output: the report as text chunks, as the LLM produces them
+
+    A pre-generated or cached report is yielded as a single chunk. A fully
+    streamed report is cached for later calls; an aborted stream is not.
+    Streams are not single-flighted: each client gets its own token stream.
+    Setting `cancel` (client gone) makes a call still waiting for an LLM
+    slot raise Cancelled instead of generating.
     """
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+    versions = report_versions()
+    pregenerated = lookup_pregenerated(user_data, versions)
+    if pregenerated is not None:
+        yield pregenerated
+        return
 
-    vectordb = Chroma(
-        persist_directory=str(CHROMA_DIR),
-        embedding_function=embeddings
-    )
+    key = report_cache_key(user_data, versions)
 
-    llm = Ollama(model="llama3.1:8b")
+    cache = get_report_cache() if config.REPORT_CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
 
-    report = generate_report(llm, vectordb, user_data)
+    parts = []
+    vectordb = get_vectordb()
+    pinned = get_pinned_context().get(vectordb)
+    stream = stream_built_report(get_llm(), vectordb, user_data, pinned=pinned, cancel=cancel)
+    try:
+        for chunk in stream:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        stream.close()
 
-    return report
+    if cache is not None:
+        cache.put(key, "".join(parts))
 
 
 if __name__ == "__main__":
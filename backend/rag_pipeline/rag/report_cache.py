@@ -0,0 +1,217 @@
+"""
+Two-tier cache for generated reports.
+
+build_rag_user_data() collapses every survey into a small discrete
+profile, so most /report calls repeat a profile that was already
+generated. Reports are keyed by a canonical hash of that profile plus
+the knowledge-base, prompt and LLM versions that produced them:
+
+    memory (LRU, per process) -> SQLite (shared, survives restarts)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from metrics import metrics
+
+
+# -------------------------
+# Keys
+# -------------------------
+
+def _normalize(value):
+    # 6 and 6.0 must hash the same
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def canonical_profile(user_data: Dict) -> str:
+    return json.dumps(_normalize(user_data), sort_keys=True, separators=(",", ":"))
+
+
+def profile_key(user_data: Dict) -> str:
+    """
+    Stable hash of the RAG user profile alone.
+    """
+    return hashlib.sha256(canonical_profile(user_data).encode("utf-8")).hexdigest()
+
+
+def version_stamp(kb_version: str, prompt_version: str, model: str) -> str:
+    """
+    Everything except the profile that determines the report.
+    """
+    return f"kb={kb_version}|prompt={prompt_version}|model={model}"
+
+
+def report_key(user_data: Dict, kb_version: str, prompt_version: str, model: str) -> str:
+    """
+    Cache key: profile + everything else that determines the report.
+    """
+    payload = f"{canonical_profile(user_data)}|{version_stamp(kb_version, prompt_version, model)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -------------------------
+# Cache
+# -------------------------
+
+class ReportCache:
+
+    def __init__(
+        self,
+        db_path: Optional[Path],
+        memory_entries: int = 512,
+        disk_entries: int = 10000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        name: str = "report_cache"
+    ):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl_seconds
+
+        self._memory = OrderedDict()   # key -> (report, created_at)
+        self._lock = threading.Lock()
+
+        self._db = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reports (
+                    key TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS reports_last_access ON reports(last_access)"
+            )
+            self._db.commit()
+
+        self._hits_memory = metrics.counter(f"{name}.hits_memory")
+        self._hits_disk = metrics.counter(f"{name}.hits_disk")
+        self._misses = metrics.counter(f"{name}.misses")
+        self._evictions = metrics.counter(f"{name}.evictions")
+        self._expired = metrics.counter(f"{name}.expired")
+        self._memory_size = metrics.gauge(f"{name}.memory_entries")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember(self, key: str, report: str, created_at: float) -> None:
+        # caller holds self._lock
+        self._memory[key] = (report, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._evictions.inc()
+        self._memory_size.set(len(self._memory))
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                report, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._hits_memory.inc()
+                    return report
+                del self._memory[key]
+                self._expired.inc()
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT report, created_at FROM reports WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    report, created_at = row
+                    if not self._is_expired(created_at, now):
+                        self._db.execute(
+                            "UPDATE reports SET last_access = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, report, created_at)
+                        self._hits_disk.inc()
+                        return report
+                    self._db.execute("DELETE FROM reports WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._expired.inc()
+
+        self._misses.inc()
+        return None
+
+    def put(self, key: str, report: str) -> None:
+        if not report:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, report, now)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO reports (key, report, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, report, now, now)
+                )
+                self._prune(now)
+                self._db.commit()
+
+    def _prune(self, now: float) -> None:
+        # caller holds self._lock
+        if self.ttl > 0:
+            cur = self._db.execute(
+                "DELETE FROM reports WHERE created_at < ?", (now - self.ttl,)
+            )
+            self._expired.inc(max(cur.rowcount, 0))
+
+        (count,) = self._db.execute("SELECT COUNT(*) FROM reports").fetchone()
+        overflow = count - self.disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM reports WHERE key IN ("
+                "SELECT key FROM reports ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._evictions.inc(overflow)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_size.set(0)
+            if self._db is not None:
+                self._db.execute("DELETE FROM reports")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        hits = self._hits_memory.value + self._hits_disk.value
+        total = hits + self._misses.value
+        disk_entries = None
+        if self._db is not None:
+            with self._lock:
+                (disk_entries,) = self._db.execute("SELECT COUNT(*) FROM reports").fetchone()
+        return {
+            "hits_memory": self._hits_memory.value,
+            "hits_disk": self._hits_disk.value,
+            "misses": self._misses.value,
+            "hit_rate": hits / total if total else None,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries
+        }
@@ -0,0 +1,663 @@
+"""
+Hybrid report renderer.
+
+The report structure is fixed (see SYSTEM_PROMPT in rag_gen.py). Every
+part that does not need retrieved evidence is rendered here from
+templates: the header, overall risk level, key contributors, Low-risk
+domain sections, break schedule, workstation checklist, evidence
+sources and the mandatory disclaimer. The LLM only writes the Moderate /
+High domain sections, from a prompt holding just those domains and
+their context. A profile with every domain Low is rendered without
+retrieval or an LLM call.
+
+With config.REPORT_SECTION_MODE = "parallel" every Moderate / High
+section gets its own prompt (only its domain's chunks) and the sections
+are generated concurrently.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+from rag_pipeline.rag.admission import AdmissionGate, llm_gate
+from rag_pipeline.rag.context_assembler import assemble_context, estimate_tokens
+from rag_pipeline.rag.rag_gen import (
+    CONTEXT_SETTINGS,
+    DISCOMFORT_RISK,
+    MSK_DISCOMFORT_FIELDS,
+    PROMPT_STATS,
+    RISK_ORDER,
+    SITTING_HOURS_RISK,
+    PinnedBlock,
+    _record,
+    _text,
+    chat_messages,
+    domain_risk_levels,
+    extract_sources,
+    format_context,
+    prompt_text,
+    retrieve_by_domain,
+    score_to_label
+)
+
+
+logger = logging.getLogger("ergocare-rag")
+
+
+# (key, section heading, wording of the Low sentence, retrieval domain)
+REPORT_DOMAINS = [
+    ("posture", "Posture", "posture", "posture"),
+    ("vision", "Vision", "vision", "vision"),
+    ("cognitive", "Cognitive / Stress", "cognitive", "cognitive"),
+    ("msk", "Musculoskeletal Pain", "musculoskeletal", "posture"),
+    ("lifestyle", "Lifestyle", "lifestyle", "general"),
+]
+
+# Words that identify a section heading written by the LLM
+SECTION_ALIASES = {
+    "posture": ("posture",),
+    "vision": ("vision",),
+    "cognitive": ("cognitive", "stress"),
+    "msk": ("musculoskeletal", "msk", "pain"),
+    "lifestyle": ("lifestyle",),
+}
+
+# Headings the LLM writes instead of "### Name": "**Posture**",
+# "**2. Vision (High):**", "3) Lifestyle"
+EMPHASIS_HEADING = re.compile(r"^(?:\d+[.)]\s*)?(?:\*\*|__)(?P<name>[^*_]+?)(?:\*\*|__)\s*:?$")
+NUMBERED_HEADING = re.compile(r"^\d+[.)]\s+(?P<name>[^*_:]+?)\s*:?$")
+# Words besides a section name that may appear in its heading
+HEADING_FILLER = {"risk", "section", "level", "low", "moderate", "high", "load", "strain"}
+
+RISK_LEVEL_LINE = re.compile(r"^[-*\s]*(?:\*\*|__)?\s*risk\s+level\b", re.IGNORECASE)
+
+# Chunks retrieved per section, by risk level
+SECTION_K = {"High": 6, "Moderate": 4}
+
+DISCOMFORT_FIELDS = [
+    ("neck_discomfort", "Neck discomfort"),
+    ("back_discomfort", "Back discomfort"),
+    ("eye_strain", "Eye strain"),
+]
+
+
+# ----------------------------
+# Templates
+# ----------------------------
+# Any edit here changes RENDERER_VERSION, which invalidates cached reports.
+
+HEADER_TEMPLATE = """### Ergonomic Recommendation Report
+
+## Overall Risk Level
+Risk Level: {overall_level}
+
+## Key Contributors
+{contributors}
+
+## Recommendations
+
+"""
+
+LOW_SECTION_TEMPLATE = """### {heading}
+- Risk Level: Low
+- Recommendations: No major {wording}-specific recommendations required.
+- Why This Helps: Current {wording} indicators are in the low-risk range; keeping the present habits maintains that.
+
+"""
+
+# A Moderate / High section the LLM did not write
+MISSING_SECTION_TEMPLATE = """### {heading}
+- Risk Level: {level}
+- Recommendations: Follow the break schedule and workstation checklist below, and review this area again if discomfort continues.
+- Why This Helps: Regular breaks and a well-adjusted workstation are commonly recommended to reduce ergonomic strain.
+
+"""
+
+FOOTER_TEMPLATE = """## Break Schedule (Practical)
+- Every 30-45 minutes: stand up, change posture or stretch (neck, shoulders, lower back) for 1-2 minutes.
+- Every 20 minutes of screen work: look at something about 20 feet away for 20 seconds (20-20-20 rule).
+- Every 1-2 hours: take a 5-10 minute walking break away from the desk.{sitting_note}
+
+## Workstation Checklist
+- Chair height: feet flat on the floor or a footrest, knees at about hip level.
+- Back support: use the chair's lumbar support or a small cushion.
+- Screen height: top of the screen at or slightly below eye level, about an arm's length away.
+- Keyboard and mouse: close to the body, elbows relaxed at about 90 degrees.
+- Desk and lighting: reduce glare, and adjust screen brightness and font size for comfortable reading.
+
+## Evidence Sources
+{sources}
+
+## Disclaimer
+ErgoCare AI provides ergonomic awareness and preventive recommendations based on questionnaire responses. It is not a diagnostic tool and does not replace professional medical advice.
+"""
+
+NO_EVIDENCE_LINE = "- Supporting guideline evidence was not found in the current knowledge base."
+
+SECTION_QUERY_TEMPLATE = """
+User ergonomic risk assessment (ErgoCare AI):
+
+{domain_lines}
+
+Generate practical ergonomic recommendations, workstation fixes, break scheduling,
+stretching guidance, and preventive strategies.
+Keep it non-diagnostic.
+"""
+
+SECTION_SYSTEM_PROMPT = """
+You are ErgoCare AI, an ergonomic decision-support assistant.
+
+You MUST follow these rules:
+1. Do NOT diagnose diseases or medical conditions.
+2. Do NOT prescribe medications or medical treatments.
+3. Be preventive, supportive, and non-alarming.
+4. Only use information supported by CONTEXT.
+5. If context does not support a claim, do NOT invent it.
+6. Recommendations must be specific, actionable, and easy to follow.
+7. Do NOT output research citations like (Gerr et al., 2005).
+
+Write ONLY the sections listed under SECTIONS TO WRITE, in that order,
+each in exactly this format, and nothing before or after them:
+
+### <Section name>
+- Risk Level: <Moderate/High>
+- Recommendations:
+- Why This Helps:
+"""
+
+SECTION_USER_TEMPLATE = """
+CONTEXT DOCUMENTS:
+{context}
+
+SECTIONS TO WRITE:
+{section_list}
+
+USER DATA (JSON):
+{user_json}
+
+Now write the sections.
+"""
+
+RENDERER_VERSION = hashlib.sha256(
+    (
+        HEADER_TEMPLATE + LOW_SECTION_TEMPLATE + MISSING_SECTION_TEMPLATE + FOOTER_TEMPLATE
+        + SECTION_QUERY_TEMPLATE + SECTION_SYSTEM_PROMPT + SECTION_USER_TEMPLATE
+        + json.dumps(REPORT_DOMAINS) + json.dumps(SECTION_K) + CONTEXT_SETTINGS
+        + json.dumps([DISCOMFORT_RISK, MSK_DISCOMFORT_FIELDS, SITTING_HOURS_RISK])
+    ).encode("utf-8")
+).hexdigest()[:12]
+
+
+# ----------------------------
+# Deterministic parts
+# ----------------------------
+
+def report_levels(user_data: Dict) -> Dict[str, str]:
+    """
+    Low / Moderate / High for every report section.
+    """
+    levels = domain_risk_levels(user_data)
+    return {key: levels[key] for key, _, _, _ in REPORT_DOMAINS}
+
+
+def overall_level(user_data: Dict, levels: Dict[str, str]) -> str:
+    if "overall_risk_index" in user_data:
+        return score_to_label(float(user_data["overall_risk_index"]))
+    return max(levels.values(), key=RISK_ORDER.get)
+
+
+def key_contributors(user_data: Dict, levels: Dict[str, str]) -> List[str]:
+    contributors = [
+        f"{heading} risk: {levels[key]}"
+        for level in ("High", "Moderate")
+        for key, heading, _, _ in REPORT_DOMAINS
+        if levels[key] == level
+    ]
+    for field, label in DISCOMFORT_FIELDS:
+        if user_data.get(field) in ("Yes", "Sometimes"):
+            contributors.append(f"{label}: {user_data[field]}")
+
+    sitting_hours = user_data.get("sitting_hours")
+    if isinstance(sitting_hours, (int, float)) and sitting_hours >= 6:
+        contributors.append(f"Sitting about {sitting_hours:g} hours per day")
+
+    return contributors or ["No major risk contributors identified"]
+
+
+def render_header(user_data: Dict, levels: Dict[str, str]) -> str:
+    return HEADER_TEMPLATE.format(
+        overall_level=overall_level(user_data, levels),
+        contributors="\n".join("- " + c for c in key_contributors(user_data, levels))
+    )
+
+
+def render_footer(user_data: Dict, sources: List[str]) -> str:
+    sitting_hours = user_data.get("sitting_hours")
+    sitting_note = ""
+    if isinstance(sitting_hours, (int, float)) and sitting_hours >= 6:
+        sitting_note = f"\n- With about {sitting_hours:g} hours of sitting per day, spread standing or walking breaks across the whole day."
+
+    return FOOTER_TEMPLATE.format(
+        sitting_note=sitting_note,
+        sources="\n".join(f"- [SOURCE: {s}]" for s in sources) or NO_EVIDENCE_LINE
+    )
+
+
+def _fixed_section(key: str, level: str) -> str:
+    _, heading, wording, _ = next(d for d in REPORT_DOMAINS if d[0] == key)
+    if level == "Low":
+        return LOW_SECTION_TEMPLATE.format(heading=heading, wording=wording)
+    return MISSING_SECTION_TEMPLATE.format(heading=heading, level=level)
+
+
+def _section_key(name: str, exact: bool = False) -> Optional[str]:
+    """
+    Section a heading names. A markdown heading only has to mention the
+    section; a bold / numbered line must consist of the section name
+    (plus words like "risk" or a level), so an emphasised or numbered
+    recommendation is not taken for a heading.
+    """
+    words = re.findall(r"[a-z]+", name.lower())
+    for key, aliases in SECTION_ALIASES.items():
+        if exact:
+            if any(w in aliases for w in words) and all(w in aliases or w in HEADING_FILLER for w in words):
+                return key
+        elif any(a in words for a in aliases):
+            return key
+    return None
+
+
+def _heading(line: str) -> Tuple[bool, Optional[str]]:
+    """
+    (is a heading, section key or None) of a stripped line.
+    """
+    if line.startswith("#"):
+        level = len(line) - len(line.lstrip("#"))
+        return True, _section_key(line[level:]) if 2 <= level <= 4 else None
+
+    m = EMPHASIS_HEADING.match(line) or NUMBERED_HEADING.match(line)
+    key = _section_key(m.group("name"), exact=True) if m else None
+    return key is not None, key
+
+
+def merge_sections(levels: Dict[str, str], llm_chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Interleaves the LLM's Moderate / High sections (streamed text) with
+    the templated Low sections, in report order.
+
+    Headings may be "##" to "####", bold or numbered. Each section's Risk
+    Level line is written from `levels`; the LLM's own is dropped. Text
+    outside a recognised Moderate / High section (preamble, repeated or
+    Low sections, other headings) is dropped too; a Moderate / High
+    section the LLM skipped gets MISSING_SECTION_TEMPLATE.
+    """
+    order = [key for key, _, _, _ in REPORT_DOMAINS]
+    headings = {key: heading for key, heading, _, _ in REPORT_DOMAINS}
+    emitted = set()
+    state = {"current": None, "lines": 0, "blank_lines": 0}
+
+    def fill_until(stop: Optional[str]) -> Iterator[str]:
+        for key in order:
+            if key == stop:
+                return
+            if key not in emitted:
+                emitted.add(key)
+                yield _fixed_section(key, levels[key])
+
+    def end_section() -> Iterator[str]:
+        if state["current"] is not None:
+            yield "\n"
+        state["current"] = None
+        state["lines"] = 0
+        state["blank_lines"] = 0
+
+    def handle(line: str) -> Iterator[str]:
+        stripped = line.strip()
+
+        is_heading, key = _heading(stripped)
+        if is_heading:
+            yield from end_section()
+            if key is not None and key not in emitted and levels[key] != "Low":
+                yield from fill_until(key)
+                emitted.add(key)
+                state["current"] = key
+                yield f"### {headings[key]}\n- Risk Level: {levels[key]}\n"
+            return
+
+        if state["current"] is None or RISK_LEVEL_LINE.match(stripped):
+            return
+
+        # Blank lines are held back (and collapsed) so every section ends
+        # with exactly one and none follows the Risk Level line
+        if not stripped:
+            state["blank_lines"] += state["lines"] > 0
+            return
+        if state["blank_lines"]:
+            yield "\n"
+            state["blank_lines"] = 0
+        state["lines"] += 1
+        yield line.rstrip() + "\n"
+
+    buffer = ""
+    for chunk in llm_chunks:
+        buffer += chunk
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            yield from handle(line)
+    if buffer:
+        yield from handle(buffer)
+
+    yield from end_section()
+    yield from fill_until(None)
+
+
+# ----------------------------
+# LLM part
+# ----------------------------
+
+def _needed_sections(levels: Dict[str, str]) -> List[Tuple[str, str, str]]:
+    # (key, heading, retrieval domain) of every Moderate / High section
+    return [(key, heading, domain) for key, heading, _, domain in REPORT_DOMAINS if levels[key] != "Low"]
+
+
+def _retrieve_sections(vectordb, levels: Dict[str, str], needed) -> Tuple[Dict[str, int], Dict[str, str], Dict]:
+    """
+    One query / lookup for all needed sections. Sections sharing a
+    retrieval domain share its results (largest k, highest risk level).
+
+    Output: ({domain: k}, {domain: level}, {domain: [(doc, score)]})
+    """
+    wanted: Dict[str, int] = {}
+    domain_levels: Dict[str, str] = {}
+    for key, _, domain in needed:
+        wanted[domain] = max(wanted.get(domain, 0), SECTION_K[levels[key]])
+        domain_levels[domain] = max(domain_levels.get(domain, "Low"), levels[key], key=RISK_ORDER.get)
+
+    query = SECTION_QUERY_TEMPLATE.format(
+        domain_lines="\n".join(f"{heading} risk: {levels[key]}" for key, heading, _ in needed)
+    )
+    by_domain = retrieve_by_domain(vectordb, query, list(wanted.items()), with_scores=True)
+    return wanted, domain_levels, by_domain
+
+
+def _section_prompt(user_data: Dict, sections: List[str], docs: List) -> List[Tuple[str, str]]:
+    # SECTION_SYSTEM_PROMPT is the stable prefix shared by every request
+    user_prompt = SECTION_USER_TEMPLATE.format(
+        user_json=json.dumps(user_data, indent=2),
+        section_list="\n".join(sections),
+        context=format_context(docs)
+    )
+    return chat_messages(SECTION_SYSTEM_PROMPT, user_prompt)
+
+
+def _log_prompt(prompt: List[Tuple[str, str]], sections: int, selection) -> None:
+    prompt_tokens = estimate_tokens(prompt_text(prompt))
+    PROMPT_STATS["prompt_tokens"].observe(prompt_tokens)
+    PROMPT_STATS["context_chunks"].observe(len(selection.docs))
+    PROMPT_STATS["duplicates"].inc(selection.duplicates)
+    PROMPT_STATS["trimmed"].inc(selection.trimmed)
+    logger.info(
+        f"Section prompt ~{prompt_tokens} tokens for {sections} section(s): "
+        f"{len(selection.docs)} context chunks, {selection.duplicates} duplicates dropped, "
+        f"{selection.trimmed} trimmed to budget"
+    )
+
+
+def build_section_prompt(
+    vectordb,
+    user_data: Dict,
+    levels: Dict[str, str],
+    timings: Dict = None
+) -> Tuple[Optional[List[Tuple[str, str]]], List]:
+    """
+    Output: (system / user messages for all Moderate / High sections or
+             None if every section is Low, docs used as context)
+    """
+    needed = _needed_sections(levels)
+    if not needed:
+        return None, []
+
+    retrieval_start = time.perf_counter()
+    wanted, domain_levels, by_domain = _retrieve_sections(vectordb, levels, needed)
+
+    selection = assemble_context(
+        [(domain, by_domain[domain][:k]) for domain, k in wanted.items()],
+        risk_levels=domain_levels,
+        budget=config.CONTEXT_TOKEN_BUDGET,
+        weights=config.CONTEXT_RISK_WEIGHTS,
+        near_duplicate=config.CONTEXT_NEAR_DUPLICATE
+    )
+    _record(timings, "retrieval", time.perf_counter() - retrieval_start)
+
+    prompt = _section_prompt(
+        user_data,
+        [f"- {heading} ({levels[key]})" for key, heading, _ in needed],
+        selection.docs
+    )
+    _log_prompt(prompt, len(needed), selection)
+    return prompt, selection.docs
+
+
+def build_domain_prompts(
+    vectordb,
+    user_data: Dict,
+    levels: Dict[str, str],
+    timings: Dict = None
+) -> Tuple[Dict[str, List[Tuple[str, str]]], List]:
+    """
+    One prompt per Moderate / High section, holding only that section's
+    retrieval domain as context. The token budget is split between the
+    sections by risk level.
+
+    Output: ({section key: prompt} in report order, docs used as context)
+    """
+    needed = _needed_sections(levels)
+    if not needed:
+        return {}, []
+
+    retrieval_start = time.perf_counter()
+    _, _, by_domain = _retrieve_sections(vectordb, levels, needed)
+
+    weights = config.CONTEXT_RISK_WEIGHTS
+    total_weight = sum(weights.get(levels[key], 1.0) for key, _, _ in needed) or 1.0
+
+    prompts = {}
+    docs = []
+    for key, heading, domain in needed:
+        budget = config.CONTEXT_TOKEN_BUDGET
+        if budget > 0:
+            budget = int(budget * weights.get(levels[key], 1.0) / total_weight)
+
+        selection = assemble_context(
+            [(domain, by_domain[domain][:SECTION_K[levels[key]]])],
+            risk_levels={domain: levels[key]},
+            budget=budget,
+            weights=weights,
+            near_duplicate=config.CONTEXT_NEAR_DUPLICATE
+        )
+        prompts[key] = _section_prompt(user_data, [f"- {heading} ({levels[key]})"], selection.docs)
+        docs += selection.docs
+        _log_prompt(prompts[key], 1, selection)
+
+    _record(timings, "retrieval", time.perf_counter() - retrieval_start)
+    return prompts, docs
+
+
+def prepare_report(vectordb, user_data: Dict, timings: Dict = None, pinned: Optional[PinnedBlock] = None):
+    """
+    Retrieval and prompts, everything before the LLM call.
+
+    Output: (levels, {key: prompt}, evidence sources); no prompts when
+            every section is Low
+
+    Only the documents placed in the section prompts are cited. `pinned`
+    is accepted for rag_gen.generate_report's signature; section prompts
+    carry no pinned block.
+    """
+    levels = report_levels(user_data)
+
+    if config.REPORT_SECTION_MODE == "parallel":
+        prompts, docs = build_domain_prompts(vectordb, user_data, levels, timings)
+    else:
+        prompt, docs = build_section_prompt(vectordb, user_data, levels, timings)
+        prompts = {"sections": prompt} if prompt is not None else {}
+
+    return levels, prompts, extract_sources(docs)
+
+
+# ----------------------------
+# Generation
+# ----------------------------
+
+def _generate_one(
+    llm,
+    prompt: List[Tuple[str, str]],
+    timings: Dict,
+    stream: bool,
+    cancel: threading.Event = None,
+    gate: AdmissionGate = None
+) -> Iterator[str]:
+    # Raises Overloaded when Ollama already has a full backlog
+    with (gate or llm_gate).slot(cancel):
+        start = time.perf_counter()
+        if not stream:
+            try:
+                yield _text(llm.invoke(prompt))
+            finally:
+                _record(timings, "generation", time.perf_counter() - start)
+            return
+
+        chunks = llm.stream(prompt)
+        try:
+            for chunk in chunks:
+                yield _text(chunk)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            _record(timings, "generation", time.perf_counter() - start)
+
+
+def generate_sections_parallel(
+    llm,
+    prompts: Dict[str, List[Tuple[str, str]]],
+    timings: Dict = None,
+    concurrency: int = None,
+    cancel: threading.Event = None,
+    gate: AdmissionGate = None
+) -> Iterator[str]:
+    """
+    One LLM call per section, run concurrently on an asyncio loop (at most
+    `concurrency` at once). Section texts are yielded in report order,
+    each as soon as it and every earlier section are done, and each
+    ending with a newline.
+
+    The whole report holds one slot of `gate` (llm_gate by default):
+    admission counts reports, so a report never competes with its own
+    sections for slots, and a burst is queued or rejected as whole
+    reports. How many section calls
+    Ollama actually runs at once is up to OLLAMA_NUM_PARALLEL.
+
+    Closing the generator early cancels sections that have not started;
+    calls already sent to the LLM run to completion in their threads.
+    Once `cancel` is set, a report still waiting for its slot gives up.
+    """
+    semaphore = asyncio.Semaphore(concurrency or config.REPORT_SECTION_CONCURRENCY)
+
+    async def run(prompt: List[Tuple[str, str]]) -> str:
+        async with semaphore:
+            return _text(await asyncio.to_thread(llm.invoke, prompt))
+
+    with (gate or llm_gate).slot(cancel):
+        loop = asyncio.new_event_loop()
+        start = time.perf_counter()
+        tasks = [loop.create_task(run(prompt)) for prompt in prompts.values()]
+        try:
+            for task in tasks:
+                text = loop.run_until_complete(task)
+                # merge_sections splits on lines: a section the LLM ended
+                # without a newline would swallow the next heading
+                yield text if text.endswith("\n") else text + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+            _record(timings, "generation", time.perf_counter() - start)
+
+
+def _llm_text(
+    llm,
+    prompts: Dict[str, List[Tuple[str, str]]],
+    timings: Dict,
+    stream: bool,
+    cancel: threading.Event = None,
+    gate: AdmissionGate = None
+) -> Iterator[str]:
+    if not prompts:
+        return iter(())
+    if len(prompts) == 1:
+        return _generate_one(llm, next(iter(prompts.values())), timings, stream, cancel, gate)
+    return generate_sections_parallel(llm, prompts, timings, cancel=cancel, gate=gate)
+
+
+def render_report(
+    llm,
+    vectordb,
+    user_data: Dict,
+    timings: Dict = None,
+    pinned: PinnedBlock = None
+) -> str:
+    """
+    Same contract as rag_gen.generate_report; the LLM is only called
+    when some section is Moderate or High.
+    """
+    return render_prepared(llm, user_data, prepare_report(vectordb, user_data, timings, pinned), timings)
+
+
+def render_prepared(llm, user_data: Dict, prepared, timings: Dict = None, gate: AdmissionGate = None) -> str:
+    """
+    render_report() from the output of prepare_report(). LLM calls are
+    admitted through `gate`, llm_gate unless given.
+    """
+    levels, prompts, sources = prepared
+
+    return (
+        render_header(user_data, levels)
+        + "".join(merge_sections(levels, _llm_text(llm, prompts, timings, stream=False, gate=gate)))
+        + render_footer(user_data, sources)
+    )
+
+
+def stream_rendered_report(
+    llm,
+    vectordb,
+    user_data: Dict,
+    timings: Dict = None,
+    pinned: PinnedBlock = None,
+    cancel: threading.Event = None
+) -> Iterator[str]:
+    """
+    Same contract as rag_gen.stream_report: the templated header is
+    yielded at once, then LLM sections line by line as they are generated
+    (whole sections, in order, in parallel mode).
+    """
+    levels, prompts, sources = prepare_report(vectordb, user_data, timings, pinned)
+
+    yield render_header(user_data, levels)
+
+    llm_text = _llm_text(llm, prompts, timings, stream=True, cancel=cancel)
+    try:
+        yield from merge_sections(levels, llm_text)
+    finally:
+        close = getattr(llm_text, "close", None)
+        if close is not None:
+            close()
+
+    yield render_footer(user_data, sources)
@@ -0,0 +1,102 @@
+"""
+Single-flight deduplication of concurrent identical work.
+
+The first caller for a key (the leader) runs the function; every caller
+that arrives with the same key while it is running waits on the leader's
+Future instead of starting its own copy. The leader's result or
+exception is delivered to all of them.
+
+Followers block their thread while they wait, and no admission gate
+counts them (only the leader takes an LLM slot), so at most
+max_followers wait per key; beyond that a caller is rejected with
+Overloaded, like a full gate.
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import metrics
+from rag_pipeline.rag.admission import Overloaded
+
+
+class SingleFlight:
+    """
+    Input:
+        max_followers: callers allowed to wait per key (None = no limit)
+        retry_after:   fn() -> Retry-After seconds for rejected callers
+    """
+
+    def __init__(
+        self,
+        name: str = "single_flight",
+        max_followers: Optional[int] = None,
+        retry_after: Callable[[], int] = None
+    ):
+        self.max_followers = max_followers
+        self._retry_after = retry_after or (lambda: 1)
+        # key -> [leader's Future, followers waiting on it]
+        self._calls: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+        self._leaders = metrics.counter(f"{name}.leaders")
+        self._shared = metrics.counter(f"{name}.shared")
+        self._timeouts = metrics.counter(f"{name}.timeouts")
+        self._rejected = metrics.counter(f"{name}.rejected")
+        self._in_flight = metrics.gauge(f"{name}.in_flight")
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn() once per key across concurrent callers.
+
+        timeout only bounds how long followers wait for the leader; the
+        leader itself always runs to completion so its result can still
+        be shared (and cached) by whoever is waiting.
+
+        Raises Overloaded when max_followers callers already wait on key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._calls[key] = [future, 0]
+                self._in_flight.set(len(self._calls))
+            else:
+                future = call[0]
+                if self.max_followers is not None and call[1] >= self.max_followers:
+                    self._rejected.inc()
+                    raise Overloaded(
+                        f"{call[1]} requests already waiting for this report",
+                        retry_after=self._retry_after()
+                    )
+                call[1] += 1
+
+        if not is_leader:
+            self._shared.inc()
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                self._timeouts.inc()
+                raise TimeoutError(f"Timed out after {timeout}s waiting for in-flight request")
+            finally:
+                with self._lock:
+                    call[1] -= 1
+
+        self._leaders.inc()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                self._in_flight.set(len(self._calls))
+
+    def in_flight(self) -> int:
+        return len(self._calls)
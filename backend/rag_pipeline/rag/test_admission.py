@@ -0,0 +1,244 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from rag_pipeline.rag.admission import AdmissionGate, Cancelled, Overloaded
+
+
+def make_gate(**kwargs) -> AdmissionGate:
+    kwargs.setdefault("max_in_flight", 1)
+    kwargs.setdefault("max_queue", 4)
+    kwargs.setdefault("wait_timeout_s", 5.0)
+    return AdmissionGate(name=f"test_gate_{uuid.uuid4().hex}", **kwargs)
+
+
+def wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def waiting(gate: AdmissionGate) -> int:
+    with gate._cond:
+        return len(gate._waiting)
+
+
+def start_waiter(gate: AdmissionGate, cancel: threading.Event = None):
+    outcome = {}
+
+    def run():
+        try:
+            gate.acquire(cancel)
+            outcome["result"] = "admitted"
+        except (Cancelled, Overloaded) as e:
+            outcome["result"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+# -------------------------
+# Cancellation
+# -------------------------
+
+def test_cancelled_before_queueing_never_takes_a_slot():
+    gate = make_gate()
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(Cancelled):
+        gate.acquire(cancel)
+
+    assert gate._in_flight == 0
+    assert waiting(gate) == 0
+
+
+def test_cancel_while_waiting_leaves_the_queue():
+    gate = make_gate()
+    gate.acquire()
+    cancel = threading.Event()
+
+    thread, outcome = start_waiter(gate, cancel)
+    wait_until(lambda: waiting(gate) == 1)
+
+    cancel.set()
+    thread.join(timeout=2)
+
+    assert isinstance(outcome["result"], Cancelled)
+    assert waiting(gate) == 0
+    assert gate._in_flight == 1
+
+    # The slot goes to the next caller, not to the cancelled one
+    gate.release()
+    gate.acquire()
+    gate.release()
+    assert gate._in_flight == 0
+
+
+def test_cancel_does_not_block_the_callers_behind():
+    gate = make_gate()
+    gate.acquire()
+    cancel = threading.Event()
+
+    first, first_outcome = start_waiter(gate, cancel)
+    wait_until(lambda: waiting(gate) == 1)
+    second, second_outcome = start_waiter(gate)
+    wait_until(lambda: waiting(gate) == 2)
+
+    cancel.set()
+    first.join(timeout=2)
+    gate.release()
+    second.join(timeout=2)
+
+    assert isinstance(first_outcome["result"], Cancelled)
+    assert second_outcome["result"] == "admitted"
+    gate.release()
+
+
+# -------------------------
+# Admission
+# -------------------------
+
+def test_free_slot_is_taken_at_once():
+    gate = make_gate(max_in_flight=2)
+
+    with gate.slot():
+        with gate.slot():
+            assert gate._in_flight == 2
+    assert gate._in_flight == 0
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    gate = make_gate(max_in_flight=1, max_queue=5)
+    gate.acquire()
+    order = []
+
+    def run(n):
+        with gate.slot():
+            order.append(n)
+
+    threads = []
+    for n in range(4):
+        thread = threading.Thread(target=run, args=(n,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: waiting(gate) == n + 1)
+
+    gate.release()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert order == [0, 1, 2, 3]
+    assert gate._in_flight == 0
+
+
+def test_full_queue_is_rejected_immediately():
+    gate = make_gate(max_in_flight=1, max_queue=1)
+    gate.acquire()
+    thread, outcome = start_waiter(gate)
+    wait_until(lambda: waiting(gate) == 1)
+    assert gate.saturated()
+
+    start = time.monotonic()
+    with pytest.raises(Overloaded):
+        gate.acquire()
+    assert time.monotonic() - start < 0.5
+    assert gate._rejected.value == 1
+
+    gate.release()
+    thread.join(timeout=2)
+    assert outcome["result"] == "admitted"
+    gate.release()
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    gate = make_gate(max_in_flight=1, max_queue=2, wait_timeout_s=0.05)
+    gate.acquire()
+
+    with pytest.raises(Overloaded):
+        gate.acquire()
+
+    assert waiting(gate) == 0
+    assert gate._timeouts.value == 1
+    assert not gate.saturated()
+
+    # The slot is still handed over normally afterwards
+    gate.release()
+    gate.acquire()
+    gate.release()
+    assert gate._in_flight == 0
+
+
+def test_timed_out_head_does_not_strand_the_next_waiter():
+    gate = make_gate(max_in_flight=1, max_queue=2, wait_timeout_s=0.2)
+    gate.acquire()
+    first, first_outcome = start_waiter(gate)
+    wait_until(lambda: waiting(gate) == 1)
+
+    # Arrives later, so its deadline is later than the head's
+    time.sleep(0.1)
+    second, second_outcome = start_waiter(gate)
+    wait_until(lambda: waiting(gate) == 2)
+
+    first.join(timeout=2)
+    assert isinstance(first_outcome["result"], Overloaded)
+
+    gate.release()
+    second.join(timeout=2)
+    assert second_outcome["result"] == "admitted"
+    gate.release()
+
+
+def test_slot_is_released_when_the_body_raises():
+    gate = make_gate()
+
+    with pytest.raises(RuntimeError):
+        with gate.slot():
+            raise RuntimeError("generation failed")
+
+    assert gate._in_flight == 0
+
+
+# -------------------------
+# Retry-After
+# -------------------------
+
+def test_retry_after_defaults_to_one_second():
+    assert make_gate().retry_after() == 1
+
+
+def test_retry_after_follows_hold_time_and_backlog():
+    gate = make_gate(max_in_flight=1, max_queue=4)
+    gate.acquire()
+    gate.release(held_s=2.0)
+    assert gate.retry_after() == 2
+
+    gate.acquire()
+    waiters = [start_waiter(gate) for _ in range(2)]
+    wait_until(lambda: waiting(gate) == 2)
+
+    # Two callers ahead plus this one, 2s each
+    assert gate.retry_after() == 6
+
+    for thread, outcome in waiters:
+        gate.release()
+        thread.join(timeout=2)
+        assert outcome["result"] == "admitted"
+    gate.release()
+
+
+def test_rejection_carries_retry_after():
+    gate = make_gate(max_in_flight=1, max_queue=0)
+    gate.acquire()
+    gate.release(held_s=3.0)
+    gate.acquire()
+
+    with pytest.raises(Overloaded) as excinfo:
+        gate.acquire()
+
+    assert excinfo.value.retry_after == 3
+    gate.release()
@@ -0,0 +1,159 @@
+from rag_pipeline.rag.context_assembler import assemble_context, doc_tokens
+
+
+WEIGHTS = {"Low": 1.0, "Moderate": 2.0, "High": 3.0}
+
+
+class Doc:
+    def __init__(self, page_content: str, id: str = None):
+        self.page_content = page_content
+        self.id = id
+
+    def __repr__(self):
+        return f"Doc({self.page_content[:12]!r})"
+
+
+def make_doc(name: str, words: int = 30, **kwargs) -> Doc:
+    # Distinct words per doc, so docs only overlap where a test says so;
+    # equal-length names give equal token counts
+    return Doc(" ".join(f"{name}w{j:02d}" for j in range(words)), **kwargs)
+
+
+def scored(docs, top: float = 1.0):
+    """
+    [(doc, score)] best first.
+    """
+    return [(d, top - 0.1 * i) for i, d in enumerate(docs)]
+
+
+# -------------------------
+# De-duplication
+# -------------------------
+
+def test_exact_text_duplicates_are_dropped_across_domains():
+    a, b = make_doc("a"), make_doc("b")
+    again = Doc(a.page_content)
+
+    selection = assemble_context(
+        [("posture", scored([a, b])), ("general", scored([again]))],
+        {}, budget=0, weights=WEIGHTS
+    )
+
+    assert selection.docs == [a, b]
+    assert selection.duplicates == 1
+
+
+def test_same_id_is_a_duplicate_even_with_different_text():
+    a = make_doc("a", id="chunk-1")
+    b = make_doc("b", id="chunk-1")
+
+    selection = assemble_context([("posture", scored([a, b]))], {}, budget=0, weights=WEIGHTS)
+
+    assert selection.docs == [a]
+    assert selection.duplicates == 1
+
+
+def test_near_duplicates_are_dropped_and_partial_overlap_kept():
+    base = make_doc("a", words=40)
+    words = base.page_content.split()
+    # Neighbouring chunk: the same passage with a couple of words added
+    near = Doc(" ".join(words + ["extra1", "extra2"]))
+    # Overlapping chunk: half the passage, half new text
+    partial = Doc(" ".join(words[20:] + [f"new{j:02d}" for j in range(20)]))
+
+    selection = assemble_context(
+        [("posture", scored([base, near])), ("vision", scored([partial]))],
+        {}, budget=0, weights=WEIGHTS
+    )
+
+    assert selection.docs == [base, partial]
+    assert selection.duplicates == 1
+
+
+def test_pinned_docs_suppress_their_copies_and_count_toward_tokens():
+    pinned = make_doc("p")
+    a = make_doc("a")
+
+    selection = assemble_context(
+        [("posture", scored([Doc(pinned.page_content), a]))],
+        {}, budget=0, weights=WEIGHTS, pinned=[pinned]
+    )
+
+    assert selection.docs == [a]
+    assert selection.duplicates == 1
+    assert selection.tokens == doc_tokens(pinned) + doc_tokens(a)
+
+
+# -------------------------
+# Budget
+# -------------------------
+
+def test_budget_is_split_by_risk_level():
+    posture = [make_doc(f"p{i}") for i in range(4)]
+    vision = [make_doc(f"v{i}") for i in range(4)]
+    size = doc_tokens(posture[0])
+
+    selection = assemble_context(
+        [("posture", scored(posture)), ("vision", scored(vision))],
+        {"posture": "High", "vision": "Low"},
+        budget=4 * size, weights=WEIGHTS
+    )
+
+    # 3:1 split of four docs' worth of tokens, best-scored first
+    assert selection.docs == posture[:3] + vision[:1]
+    assert selection.trimmed == 4
+    assert selection.tokens == 4 * size
+
+
+def test_unused_share_goes_to_the_best_remaining_docs():
+    posture = [make_doc("p0")]
+    vision = [make_doc(f"v{i}") for i in range(4)]
+    size = doc_tokens(vision[0])
+
+    selection = assemble_context(
+        [("posture", scored(posture)), ("vision", scored(vision))],
+        {"posture": "High", "vision": "Low"},
+        budget=4 * size, weights=WEIGHTS
+    )
+
+    assert selection.docs == posture + vision[:3]
+    assert selection.trimmed == 1
+
+
+def test_pinned_tokens_come_out_of_the_budget():
+    pinned = make_doc("p0")
+    docs = [make_doc(f"d{i}") for i in range(3)]
+    size = doc_tokens(docs[0])
+
+    selection = assemble_context(
+        [("posture", scored(docs))], {"posture": "High"},
+        budget=3 * size, weights=WEIGHTS, pinned=[pinned]
+    )
+
+    assert selection.docs == docs[:2]
+    assert selection.tokens == doc_tokens(pinned) + 2 * size
+
+
+def test_selection_keeps_prompt_order_not_score_order():
+    low_first = [(make_doc("a0"), 0.1), (make_doc("a1"), 0.9)]
+    size = doc_tokens(low_first[0][0])
+
+    selection = assemble_context([("posture", low_first)], {}, budget=2 * size, weights=WEIGHTS)
+
+    assert selection.docs == [doc for doc, _ in low_first]
+
+
+def test_duplicates_are_removed_before_the_budget_is_split():
+    a = make_doc("a0")
+    b = make_doc("b0")
+    size = doc_tokens(a)
+
+    # The repeated doc must not use up the second slot
+    selection = assemble_context(
+        [("posture", scored([a, Doc(a.page_content), b]))],
+        {"posture": "High"}, budget=2 * size, weights=WEIGHTS
+    )
+
+    assert selection.docs == [a, b]
+    assert selection.duplicates == 1
+    assert selection.trimmed == 0
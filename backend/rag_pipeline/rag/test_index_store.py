@@ -0,0 +1,138 @@
+from rag_pipeline.rag import index_store
+from rag_pipeline.rag.index_store import (
+    CURRENT_FILE,
+    STAGING_PREFIX,
+    VERSION_FILE,
+    VERSIONS_DIR,
+    current_index_dir,
+    gc_index_versions,
+    new_index_version,
+    publish_index_version,
+    published_index_dir,
+    read_index_version,
+    stage_index_version
+)
+
+
+def build(root, text: str = "data", base=None):
+    """
+    Stages a build containing store.bin and publishes it.
+    """
+    version, staging = stage_index_version(root, base=base)
+    (staging / "store.bin").write_text(text, encoding="utf-8")
+    return version, publish_index_version(root, version, staging)
+
+
+# -------------------------
+# Staging / publish
+# -------------------------
+
+def test_unpublished_root_reads_as_a_legacy_store(tmp_path):
+    assert published_index_dir(tmp_path) is None
+    assert current_index_dir(tmp_path) == tmp_path
+
+
+def test_staging_is_invisible_until_published(tmp_path):
+    _, first = build(tmp_path, "v1")
+
+    version, staging = stage_index_version(tmp_path, base=first)
+    assert staging.name == f"{STAGING_PREFIX}{version}"
+    assert (staging / "store.bin").read_text(encoding="utf-8") == "v1"
+
+    (staging / "store.bin").write_text("v2", encoding="utf-8")
+    assert current_index_dir(tmp_path) == first
+    assert (first / "store.bin").read_text(encoding="utf-8") == "v1"
+
+    final = publish_index_version(tmp_path, version, staging)
+
+    assert current_index_dir(tmp_path) == final == tmp_path / VERSIONS_DIR / version
+    assert not staging.exists()
+    assert (final / "store.bin").read_text(encoding="utf-8") == "v2"
+    assert (final / VERSION_FILE).read_text(encoding="utf-8") == version
+    assert read_index_version(tmp_path) == version
+    assert read_index_version(final) == version
+
+
+def test_publish_replaces_current_without_temp_files(tmp_path):
+    build(tmp_path, "v1")
+    version, _ = build(tmp_path, "v2")
+
+    assert (tmp_path / CURRENT_FILE).read_text(encoding="utf-8") == version
+    assert not list(tmp_path.glob(f"{CURRENT_FILE}.*"))
+
+
+def test_staging_copy_skips_ignored_entries(tmp_path):
+    _, first = build(tmp_path)
+    (first / "snapshot").mkdir()
+    (first / "snapshot" / "vectors.npy").write_bytes(b"x")
+
+    _, staging = stage_index_version(tmp_path, base=first, ignore=["snapshot"])
+
+    assert (staging / "store.bin").exists()
+    assert not (staging / "snapshot").exists()
+
+
+def test_versions_sort_chronologically():
+    versions = [new_index_version() for _ in range(5)]
+    assert sorted(versions) == versions
+    assert len(set(versions)) == 5
+
+
+def test_versions_are_utc_stamps(monkeypatch):
+    # 2026-10-25T00:30:00Z, then an hour later: the EU DST fall-back night,
+    # when local time repeats 02:00-03:00 and would sort backwards
+    first = 1792888200.25
+    monkeypatch.setattr(index_store.time, "time", lambda: first)
+    early = new_index_version()
+    monkeypatch.setattr(index_store.time, "time", lambda: first + 3600)
+    late = new_index_version()
+
+    assert early.startswith("20261025T003000.250000Z-")
+    assert late.startswith("20261025T013000.250000Z-")
+    assert early < late
+
+
+# -------------------------
+# GC
+# -------------------------
+
+def test_gc_keeps_the_newest_builds(tmp_path):
+    versions = [build(tmp_path, str(i))[0] for i in range(4)]
+
+    deleted = gc_index_versions(tmp_path, keep=2)
+
+    assert sorted(deleted) == versions[:2]
+    remaining = sorted(d.name for d in (tmp_path / VERSIONS_DIR).iterdir())
+    assert remaining == versions[2:]
+
+
+def test_gc_never_deletes_the_current_build(tmp_path):
+    versions = [build(tmp_path, str(i))[0] for i in range(3)]
+    # Roll back: the oldest build is published again
+    (tmp_path / CURRENT_FILE).write_text(versions[0], encoding="utf-8")
+
+    deleted = gc_index_versions(tmp_path, keep=1)
+
+    assert deleted == [versions[1]]
+    assert current_index_dir(tmp_path).exists()
+
+
+def test_gc_removes_interrupted_staging_builds(tmp_path):
+    version, _ = build(tmp_path)
+    _, staging = stage_index_version(tmp_path)
+
+    deleted = gc_index_versions(tmp_path, keep=2)
+
+    assert deleted == [staging.name]
+    assert not staging.exists()
+    assert current_index_dir(tmp_path).name == version
+
+
+def test_gc_keeps_at_least_one_build(tmp_path):
+    version, _ = build(tmp_path)
+    assert gc_index_versions(tmp_path, keep=0) == []
+    assert current_index_dir(tmp_path).name == version
+
+
+def test_gc_of_an_unversioned_root_is_a_no_op(tmp_path):
+    assert gc_index_versions(tmp_path) == []
@@ -0,0 +1,205 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("langchain_community")
+pytest.importorskip("langchain_huggingface")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from rag_pipeline.rag import ingest  # noqa: E402
+from rag_pipeline.rag.ingest import (  # noqa: E402
+    build_settings,
+    diff_manifest,
+    file_sha256,
+    iter_parsed,
+    load_manifest,
+    make_chunk_ids,
+    parse_file,
+    parsed_cache_path,
+    parsed_cache_size,
+    read_parsed_pages,
+    save_manifest
+)
+
+
+def entry(sha256: str, count: int = 2, rel: str = "docs/a.pdf") -> dict:
+    return {"sha256": sha256, "file_type": "pdf", "chunk_ids": make_chunk_ids(rel, sha256, count)}
+
+
+# -------------------------
+# Manifest diff
+# -------------------------
+
+def test_diff_of_an_empty_manifest_adds_everything():
+    added, changed, removed = diff_manifest({}, {"docs/b.pdf": "2", "docs/a.pdf": "1"})
+    assert (added, changed, removed) == (["docs/a.pdf", "docs/b.pdf"], [], [])
+
+
+def test_diff_finds_added_changed_and_removed_files():
+    known = {
+        "docs/same.pdf": entry("s"),
+        "docs/edited.pdf": entry("old"),
+        "policy/gone.md": entry("g"),
+    }
+    hashes = {
+        "docs/same.pdf": "s",
+        "docs/edited.pdf": "new",
+        "docs/new.pdf": "n",
+    }
+
+    added, changed, removed = diff_manifest(known, hashes)
+
+    assert added == ["docs/new.pdf"]
+    assert changed == ["docs/edited.pdf"]
+    assert removed == ["policy/gone.md"]
+
+
+def test_diff_of_an_unchanged_tree_is_empty():
+    known = {"docs/a.pdf": entry("1"), "policy/p.md": entry("2")}
+    assert diff_manifest(known, {"docs/a.pdf": "1", "policy/p.md": "2"}) == ([], [], [])
+
+
+def test_renamed_file_is_one_removal_and_one_addition():
+    known = {"docs/old_name.pdf": entry("h")}
+    added, changed, removed = diff_manifest(known, {"docs/new_name.pdf": "h"})
+    assert (added, changed, removed) == (["docs/new_name.pdf"], [], ["docs/old_name.pdf"])
+
+
+# -------------------------
+# Chunk IDs / manifest file
+# -------------------------
+
+def test_chunk_ids_depend_on_path_and_content_only():
+    ids = make_chunk_ids("docs/a.pdf", "h1", 3)
+
+    assert ids == make_chunk_ids("docs/a.pdf", "h1", 3)
+    assert len(set(ids)) == 3
+    assert not set(ids) & set(make_chunk_ids("docs/a.pdf", "h2", 3))
+    assert not set(ids) & set(make_chunk_ids("docs/b.pdf", "h1", 3))
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = {"settings": build_settings(), "files": {"docs/a.pdf": entry("1")}}
+
+    assert load_manifest(tmp_path) is None
+    save_manifest(tmp_path, manifest)
+
+    assert load_manifest(tmp_path) == manifest
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_file_hash_follows_content(tmp_path):
+    a, b = tmp_path / "a.md", tmp_path / "b.md"
+    a.write_text("same text", encoding="utf-8")
+    b.write_text("same text", encoding="utf-8")
+    assert file_sha256(a) == file_sha256(b)
+
+    b.write_text("edited text", encoding="utf-8")
+    assert file_sha256(a) != file_sha256(b)
+
+
+# -------------------------
+# Parallel parsing
+# -------------------------
+
+def test_parallel_parse_matches_serial_and_keeps_task_order(tmp_path):
+    tasks = []
+    for i in range(3):
+        path = tmp_path / f"p{i}.md"
+        path.write_text(f"# Policy {i}\n\n" + "Take a break every hour. " * (20 + i), encoding="utf-8")
+        tasks.append((f"policy/p{i}.md", str(path), "md", file_sha256(path), None))
+
+    serial = list(iter_parsed(tasks, workers=1))
+    parallel = list(iter_parsed(tasks, workers=2))
+
+    assert [rel for rel, *_ in parallel] == [task[0] for task in tasks]
+    assert parallel == serial
+
+
+# -------------------------
+# Parsed-page cache
+# -------------------------
+
+@pytest.fixture
+def pdf_loads(monkeypatch):
+    """
+    Replaces PDF extraction with a fake that splits the file on form feeds
+    and records every call.
+    """
+    calls = []
+
+    def load_pdf_file(path):
+        calls.append(str(path))
+        text = path.read_text(encoding="utf-8")
+        return [Document(page_content=page, metadata={"page": i}) for i, page in enumerate(text.split("\f"))]
+
+    monkeypatch.setattr(ingest, "load_pdf_file", load_pdf_file)
+    return calls
+
+
+def pdf_task(tmp_path, text: str, cache: bool = True):
+    path = tmp_path / "doc.pdf"
+    path.write_text(text, encoding="utf-8")
+    cache_dir = str(tmp_path / "cache") if cache else None
+    return ("docs/doc.pdf", str(path), "pdf", file_sha256(path), cache_dir)
+
+
+def test_parse_cache_miss_then_hit(tmp_path, pdf_loads):
+    task = pdf_task(tmp_path, "page one\fpage two")
+
+    _, pages, chunks, hit = parse_file(task)
+    assert hit is False
+    assert len(pdf_loads) == 1
+    assert parsed_cache_size(tmp_path / "cache")[0] == 1
+
+    _, cached_pages, cached_chunks, hit = parse_file(task)
+    assert hit is True
+    assert len(pdf_loads) == 1
+    assert cached_pages == pages
+    assert cached_chunks == chunks
+
+
+def test_edited_pdf_misses_the_cache(tmp_path, pdf_loads):
+    parse_file(pdf_task(tmp_path, "page one"))
+    _, pages, _, hit = parse_file(pdf_task(tmp_path, "page one, edited"))
+
+    assert hit is False
+    assert len(pdf_loads) == 2
+    assert pages[0][0] == "page one, edited"
+    assert parsed_cache_size(tmp_path / "cache")[0] == 2
+
+
+def test_cache_format_change_invalidates_entries(tmp_path, pdf_loads, monkeypatch):
+    task = pdf_task(tmp_path, "page one")
+    parse_file(task)
+
+    monkeypatch.setattr(ingest, "PARSED_CACHE_FORMAT", ingest.PARSED_CACHE_FORMAT + 1)
+    _, _, _, hit = parse_file(task)
+
+    assert hit is False
+    assert len(pdf_loads) == 2
+
+
+def test_corrupt_cache_entry_is_extracted_again(tmp_path, pdf_loads):
+    task = pdf_task(tmp_path, "page one\fpage two")
+    entry_path = parsed_cache_path(tmp_path / "cache", task[3])
+    entry_path.parent.mkdir(parents=True)
+    entry_path.write_bytes(b"not gzip")
+    assert read_parsed_pages(entry_path) is None
+
+    _, pages, _, hit = parse_file(task)
+
+    assert hit is False
+    assert len(pages) == 2
+    assert [d.page_content for d in read_parsed_pages(entry_path)] == ["page one", "page two"]
+
+
+def test_disabled_cache_always_extracts(tmp_path, pdf_loads):
+    task = pdf_task(tmp_path, "page one", cache=False)
+    parse_file(task)
+    _, _, _, hit = parse_file(task)
+
+    assert hit is None
+    assert len(pdf_loads) == 2
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,196 @@
+import numpy as np
+import pytest
+
+from rag_pipeline.rag.numpy_index import NumpyIndex
+from rag_pipeline.rag.quantization import QUANTIZATION_KINDS, QuantizedVectors
+
+
+DOMAINS = ("posture", "vision", "cognitive", "general")
+DIM = 48
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    n = 600
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    # Interleaved domains, so sorting into slices actually reorders rows
+    metadatas = [{"domain": DOMAINS[i % len(DOMAINS)], "source": f"doc{i % 13}.pdf"} for i in range(n)]
+    texts = [f"chunk {i} – {DOMAINS[i % len(DOMAINS)]}" for i in range(n)]
+    ids = [f"id{i}" for i in range(n)]
+    queries = rng.normal(size=(20, DIM)).astype(np.float32)
+    return vectors, texts, metadatas, ids, queries
+
+
+@pytest.fixture
+def index(corpus):
+    vectors, texts, metadatas, ids, _ = corpus
+    return NumpyIndex(vectors, texts, metadatas, ids=ids)
+
+
+def brute_force_ids(corpus, query, k, domain=None):
+    vectors, _, metadatas, ids, _ = corpus
+    rows = [i for i in range(len(vectors)) if domain is None or metadatas[i]["domain"] == domain]
+    distances = ((vectors[rows] - query) ** 2).sum(axis=1)
+    return [ids[rows[i]] for i in np.argsort(distances, kind="stable")[:k]]
+
+
+def result_ids(index: NumpyIndex, rows) -> list:
+    return [index.ids[i] for i in rows]
+
+
+# -------------------------
+# Exact search
+# -------------------------
+
+def test_domain_slices_are_contiguous(index):
+    for domain, (start, end) in index.domain_slices.items():
+        assert {m["domain"] for m in index.metadatas[start:end]} == {domain}
+    assert sum(end - start for start, end in index.domain_slices.values()) == len(index)
+
+
+def test_unfiltered_search_matches_brute_force(corpus, index):
+    queries = corpus[4]
+    rows, _ = index.search(queries, 10)
+    for query, found in zip(queries, rows):
+        assert result_ids(index, found) == brute_force_ids(corpus, query, 10)
+
+
+@pytest.mark.parametrize("domain", DOMAINS)
+def test_domain_filter_matches_brute_force(corpus, index, domain):
+    for query in corpus[4]:
+        rows, _ = index.search(query, 8, {"domain": domain})
+        assert result_ids(index, rows[0]) == brute_force_ids(corpus, query, 8, domain)
+
+
+def test_search_domains_matches_brute_force(corpus, index):
+    query = corpus[4][0]
+    requests = {domain: 5 for domain in DOMAINS}
+    requests["missing"] = 3
+
+    out = index.search_domains(query, requests)
+
+    for domain in DOMAINS:
+        assert result_ids(index, out[domain]) == brute_force_ids(corpus, query, 5, domain)
+    assert len(out["missing"]) == 0
+
+
+def test_scores_give_chroma_l2_distances(corpus, index):
+    vectors, _, _, ids, queries = corpus
+    q = queries[0]
+    rows, scores = index.search(q, 3)
+
+    # |q - x|^2 = |q|^2 - 2 * score
+    for row, score in zip(rows[0], scores[0]):
+        x = vectors[ids.index(index.ids[row])]
+        assert float(q @ q) - 2 * score == pytest.approx(float(((q - x) ** 2).sum()), rel=1e-4)
+
+
+def test_metadata_filter_is_applied_within_the_domain(corpus, index):
+    query = corpus[4][0]
+    rows, _ = index.search(query, 50, {"domain": "vision", "source": "doc1.pdf"})
+
+    assert len(rows[0]) > 0
+    for row in rows[0]:
+        assert index.metadatas[row] == {"domain": "vision", "source": "doc1.pdf"}
+
+
+# -------------------------
+# Snapshot
+# -------------------------
+
+def test_mmap_snapshot_round_trip(corpus, index, tmp_path):
+    snapshot = index.save(tmp_path / "snapshot", version="v1", quantizations=QUANTIZATION_KINDS)
+    loaded = NumpyIndex.load(snapshot)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert NumpyIndex.snapshot_version(snapshot) == "v1"
+    assert loaded.version == "v1"
+    assert list(loaded.texts) == list(index.texts)
+    assert loaded.metadatas == index.metadatas
+    assert loaded.ids == index.ids
+    assert loaded.domain_slices == index.domain_slices
+    np.testing.assert_array_equal(loaded.vectors, index.vectors)
+
+    queries = corpus[4]
+    np.testing.assert_array_equal(loaded.search(queries, 10)[0], index.search(queries, 10)[0])
+    assert not (tmp_path / "snapshot.tmp").exists()
+
+
+def test_snapshot_overwrite_replaces_the_previous_one(index, tmp_path):
+    index.save(tmp_path / "snapshot", version="v1")
+    index.save(tmp_path / "snapshot", version="v2")
+    assert NumpyIndex.snapshot_version(tmp_path / "snapshot") == "v2"
+
+
+def test_float16_snapshot_keeps_the_ranking(corpus, index, tmp_path):
+    loaded = NumpyIndex.load(index.save(tmp_path / "snapshot", dtype="float16"))
+    assert loaded.vectors.dtype == np.float16
+
+    queries = corpus[4]
+    np.testing.assert_array_equal(loaded.search(queries, 5)[0], index.search(queries, 5)[0])
+
+
+# -------------------------
+# Quantization
+# -------------------------
+
+@pytest.mark.parametrize("kind", QUANTIZATION_KINDS)
+def test_rescored_quantized_search_matches_float32(corpus, index, kind):
+    queries = corpus[4]
+    exact_rows, exact_scores = index.search(queries, 8)
+
+    index.quantize(kind, rescore_factor=4)
+    rows, scores = index.search(queries, 8)
+
+    np.testing.assert_array_equal(rows, exact_rows)
+    np.testing.assert_allclose(scores, exact_scores, atol=1e-4)
+
+
+@pytest.mark.parametrize("kind", QUANTIZATION_KINDS)
+def test_rescored_domain_search_matches_float32(corpus, index, kind):
+    query = corpus[4][3]
+    requests = {domain: 6 for domain in DOMAINS}
+    exact = index.search_domains(query, requests)
+
+    index.quantize(kind, rescore_factor=4)
+    quantized = index.search_domains(query, requests)
+
+    for domain in DOMAINS:
+        np.testing.assert_array_equal(quantized[domain], exact[domain])
+
+
+@pytest.mark.parametrize("kind", QUANTIZATION_KINDS)
+def test_stored_quantization_is_used_on_load(corpus, index, kind, tmp_path):
+    snapshot = index.save(tmp_path / "snapshot", dtype="float16", quantizations=(kind,))
+    loaded = NumpyIndex.load(snapshot, quantization=kind, rescore_factor=4)
+
+    assert isinstance(loaded.quantized.codes, np.memmap)
+    # Rescoring reads candidate rows from the mmap; no in-memory copy
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.vectors.dtype == np.float16
+    assert not hasattr(loaded, "rescore_vectors")
+
+    queries = corpus[4]
+    np.testing.assert_array_equal(loaded.search(queries, 8)[0], index.search(queries, 8)[0])
+
+
+def test_quantize_none_switches_back_to_exact(index):
+    index.quantize("int8")
+    assert index.quantized is not None
+    index.quantize(None)
+    assert index.quantized is None
+
+
+def test_int8_dequantize_is_close(corpus):
+    vectors = corpus[0]
+    q = QuantizedVectors.quantize(vectors, "int8")
+
+    assert q.codes.dtype == np.int8
+    assert q.nbytes < vectors.nbytes / 3
+    np.testing.assert_allclose(q.dequantize(), vectors, atol=np.abs(vectors).max() / 127)
+
+
+def test_unknown_quantization_is_rejected(corpus):
+    with pytest.raises(ValueError):
+        QuantizedVectors.quantize(corpus[0], "int4")
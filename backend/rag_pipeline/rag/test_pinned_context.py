@@ -0,0 +1,101 @@
+import uuid
+
+from rag_pipeline.rag import pinned_context
+from rag_pipeline.rag.index_store import write_index_version
+from rag_pipeline.rag.pinned_context import PinnedContext
+from rag_pipeline.rag.rag_gen import PINNED_RETRIEVALS, build_report_prompt
+
+
+class Doc:
+    def __init__(self, page_content: str, metadata: dict):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = None
+
+
+class FakeStore:
+    """
+    Counts searches per domain; no embedding function, so every search
+    goes by query.
+    """
+
+    def __init__(self, tag: str = "a"):
+        self.searches = []
+        self.tag = tag
+
+    def similarity_search(self, query, k=4, filter=None):
+        domain = filter["domain"]
+        self.searches.append(domain)
+        return [Doc(f"{self.tag} {domain} chunk {i}", {"domain": domain, "source": f"{domain}_{i}.pdf"})
+                for i in range(k)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return [(d, float(i)) for i, d in enumerate(self.similarity_search(query, k, filter))]
+
+
+def make_context(tmp_path, version: str = "v1") -> PinnedContext:
+    write_index_version(tmp_path, version)
+    return PinnedContext(tmp_path, name=f"test_pinned_{uuid.uuid4().hex}")
+
+
+def pinned_searches(store: FakeStore) -> int:
+    pinned_domains = {domain for domain, _, _ in PINNED_RETRIEVALS}
+    return sum(1 for domain in store.searches if domain in pinned_domains)
+
+
+def test_pinned_block_is_resolved_once_per_version(tmp_path):
+    context = make_context(tmp_path)
+    store = FakeStore()
+
+    first = context.get(store)
+    for _ in range(5):
+        assert context.get(store) is first
+
+    assert pinned_searches(store) == len(PINNED_RETRIEVALS)
+    assert context._refreshes.value == 1
+    assert context.version == "v1"
+
+
+def test_new_index_version_resolves_again(tmp_path):
+    context = make_context(tmp_path)
+    store = FakeStore()
+    first = context.get(store)
+
+    write_index_version(tmp_path, "v2")
+    second = context.get(store)
+
+    assert second is not first
+    assert context.version == "v2"
+    assert context._refreshes.value == 2
+    assert context.get(store) is second
+
+
+def test_new_vectordb_instance_resolves_again(tmp_path):
+    context = make_context(tmp_path)
+    old, new = FakeStore("old"), FakeStore("new")
+    context.get(old)
+
+    block = context.get(new)
+
+    assert pinned_searches(new) == len(PINNED_RETRIEVALS)
+    assert block.all_docs[0].page_content.startswith("new ")
+
+
+def test_reports_reuse_the_pinned_block(tmp_path, monkeypatch):
+    context = make_context(tmp_path)
+    store = FakeStore()
+    resolved = []
+    real_resolve = pinned_context.resolve_pinned
+
+    def resolve_pinned(vectordb):
+        resolved.append(vectordb)
+        return real_resolve(vectordb)
+
+    monkeypatch.setattr(pinned_context, "resolve_pinned", resolve_pinned)
+    user_data = {"posture_risk_index": 80, "primary_domain": "posture"}
+
+    for _ in range(3):
+        build_report_prompt(store, user_data, pinned=context.get(store))
+
+    assert resolved == [store]
+    assert pinned_searches(store) == len(PINNED_RETRIEVALS)
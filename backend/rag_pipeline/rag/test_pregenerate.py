@@ -0,0 +1,192 @@
+import threading
+import uuid
+from itertools import product
+
+import pytest
+
+import config
+from ml_to_rag_bridge import DEFAULT_SITTING_HOURS, RISK_LABELS, build_rag_user_data, enumerate_rag_user_data
+from rag_pipeline.rag import pregenerate as pregen
+from rag_pipeline.rag.admission import AdmissionGate, llm_gate
+from rag_pipeline.rag.report_cache import profile_key, version_stamp
+
+
+class Doc:
+    def __init__(self, page_content: str, metadata: dict):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = None
+
+
+class FakeStore:
+    """
+    similarity_search_with_score() over a few docs per domain.
+    """
+
+    def __init__(self):
+        self.docs = {
+            domain: [
+                Doc(f"{domain} guidance {i}: " + " ".join(f"{domain}{i}w{j}" for j in range(20)),
+                    {"domain": domain, "source": f"{domain}_{i}.pdf"})
+                for i in range(8)
+            ]
+            for domain in ("posture", "vision", "cognitive", "general", "policy")
+        }
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return [(d, float(i)) for i, d in enumerate(self.docs[filter["domain"]][:k])]
+
+
+class CountingLLM:
+    """
+    Counts calls and records the job gate's in-flight count during each.
+    """
+
+    def __init__(self, gate=None, fail: bool = False):
+        self.gate = gate
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.gate_in_flight = []
+
+    def invoke(self, messages):
+        with self.lock:
+            self.calls += 1
+            if self.gate is not None:
+                self.gate_in_flight.append(self.gate._in_flight)
+        if self.fail:
+            raise RuntimeError("ollama down")
+        return "### Posture\n- Recommendations: raise the screen.\n"
+
+
+@pytest.fixture
+def job(monkeypatch, tmp_path):
+    """
+    A store plus mutable versions: bump versions["kb_version"] to
+    simulate an ingest.
+    """
+    monkeypatch.setattr(config, "REPORT_SECTION_MODE", "single")
+    versions = {"kb_version": "kb1", "prompt_version": "p1", "model": "m1"}
+    monkeypatch.setattr(pregen, "report_versions", lambda: dict(versions))
+    store = pregen.PregeneratedStore(tmp_path / "pregenerated.sqlite3", name=f"test_pregen_{uuid.uuid4().hex}")
+    return store, versions
+
+
+def gate() -> AdmissionGate:
+    return AdmissionGate(max_in_flight=2, max_queue=2, wait_timeout_s=None, name=f"test_gate_{uuid.uuid4().hex}")
+
+
+def run(store, llm, vectordb, profiles, **kwargs):
+    return pregen.pregenerate(store, llm, vectordb, profiles, concurrency=2, progress_every=0, gate=gate(), **kwargs)
+
+
+PROFILES = list(enumerate_rag_user_data())
+
+
+# -------------------------
+# Profiles
+# -------------------------
+
+def test_bridge_enumerates_only_reachable_profiles():
+    assert len(PROFILES) == 27
+    assert len({profile_key(p) for p in PROFILES}) == 27
+    assert {(p["posture_risk"], p["vision_risk"], p["cognitive_risk"]) for p in PROFILES} == set(
+        product(RISK_LABELS, repeat=3)
+    )
+
+    for p in PROFILES:
+        assert p["sitting_hours"] == DEFAULT_SITTING_HOURS
+        assert p["neck_discomfort"] == p["back_discomfort"] == p["eye_strain"] == "No"
+        assert p["stress_level"] == p["cognitive_risk"]
+
+
+def test_ml_output_profile_is_among_the_enumerated_ones():
+    ml_output = {"risk_indices": {"posture_risk_index": 81.5, "visual_strain_index": 12, "cognitive_load_index": 40}}
+    assert build_rag_user_data(ml_output) in PROFILES
+
+
+# -------------------------
+# Job
+# -------------------------
+
+def test_up_to_date_entries_are_skipped(job):
+    store, versions = job
+    vectordb = FakeStore()
+
+    first = run(store, CountingLLM(), vectordb, PROFILES)
+    llm = CountingLLM()
+    second = run(store, llm, vectordb, PROFILES)
+
+    assert first["generated"] == 27
+    assert second == {"current": 27, "restamped": 0, "generated": 0, "failed": 0}
+    assert llm.calls == 0
+
+
+def test_unchanged_inputs_are_restamped_without_the_llm(job):
+    store, versions = job
+    vectordb = FakeStore()
+    run(store, CountingLLM(), vectordb, PROFILES)
+    before = store.get(profile_key(PROFILES[-1]), version_stamp(**versions))
+
+    # An ingest that changed nothing the prompts use
+    versions["kb_version"] = "kb2"
+    llm = CountingLLM()
+    counts = run(store, llm, vectordb, PROFILES)
+
+    assert counts == {"current": 0, "restamped": 27, "generated": 0, "failed": 0}
+    assert llm.calls == 0
+    assert store.stats(version_stamp(**versions))["current"] == 27
+    assert store.get(profile_key(PROFILES[-1]), version_stamp(**versions)) == before
+
+
+def test_changed_inputs_are_regenerated(job):
+    store, versions = job
+    vectordb = FakeStore()
+    run(store, CountingLLM(), vectordb, PROFILES)
+
+    for doc in vectordb.docs["vision"]:
+        doc.page_content = doc.page_content.replace("guidance", "advice")
+    versions["kb_version"] = "kb2"
+    llm = CountingLLM()
+    counts = run(store, llm, vectordb, PROFILES)
+
+    # Only profiles whose prompt includes vision documents change
+    expected = sum(1 for p in PROFILES if p["vision_risk"] != "Low")
+    assert counts["generated"] == llm.calls == expected
+    assert counts["restamped"] + counts["generated"] == 27
+
+
+def test_force_regenerates_current_entries(job):
+    store, _ = job
+    vectordb = FakeStore()
+    profiles = PROFILES[:5]
+    run(store, CountingLLM(), vectordb, profiles)
+
+    counts = run(store, CountingLLM(), vectordb, profiles, force=True)
+
+    assert counts["generated"] == 5
+
+
+def test_failed_profiles_are_retried_on_the_next_run(job):
+    store, _ = job
+    vectordb = FakeStore()
+    profiles = PROFILES[-3:]
+
+    failed = run(store, CountingLLM(fail=True), vectordb, profiles)
+    retried = run(store, CountingLLM(), vectordb, profiles)
+
+    assert failed["failed"] == 3
+    assert retried["generated"] == 3
+
+
+def test_job_gate_admits_the_llm_calls_instead_of_llm_gate(job):
+    store, _ = job
+    job_gate = gate()
+    llm = CountingLLM(job_gate)
+    limits = (llm_gate.max_in_flight, llm_gate.max_queue, llm_gate.wait_timeout)
+
+    pregen.pregenerate(store, llm, FakeStore(), PROFILES[-2:], progress_every=0, gate=job_gate)
+
+    assert llm.gate_in_flight == [1, 1]
+    assert job_gate._in_flight == 0
+    assert (llm_gate.max_in_flight, llm_gate.max_queue, llm_gate.wait_timeout) == limits
@@ -0,0 +1,168 @@
+import pytest
+
+import config
+from rag_pipeline.rag.rag_gen import PinnedBlock, build_report_prompt, retrieve_by_domain
+from rag_pipeline.rag.report_renderer import prepare_report
+
+
+DOMAINS = ("posture", "vision", "cognitive", "general", "policy", "msk", "lifestyle")
+
+
+class Doc:
+    def __init__(self, page_content: str, metadata: dict):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = None
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [0.1, 0.2, 0.3]
+
+
+class FakeStore:
+    """
+    Chroma-like store over a few docs per domain that records every
+    search as (method, domain, k).
+    """
+
+    def __init__(self, embeddings=None):
+        self.embeddings = embeddings
+        self.calls = []
+        self.docs = {
+            domain: [
+                Doc(f"{domain} guidance {i}: " + " ".join(f"{domain}{i}w{j}" for j in range(20)),
+                    {"domain": domain, "source": f"{domain}_{i}.pdf"})
+                for i in range(10)
+            ]
+            for domain in DOMAINS
+        }
+
+    def _search(self, method, k, filter):
+        self.calls.append((method, filter["domain"], k))
+        return self.docs[filter["domain"]][:k]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return self._search("by_vector", k, filter)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return [(d, float(i)) for i, d in enumerate(self._search("by_vector", k, filter))]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return self._search("by_query", k, filter)
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return [(d, float(i)) for i, d in enumerate(self._search("by_query", k, filter))]
+
+
+class DomainIndex(FakeStore):
+    """
+    NumpyIndex-like store that serves every domain in one call.
+    """
+
+    def similarity_search_by_domain(self, embedding, requests, with_scores=False):
+        self.calls.append(("by_domain", dict(requests)))
+        return {
+            domain: [(d, float(i)) for i, d in enumerate(self.docs[domain][:k])] if with_scores
+            else self.docs[domain][:k]
+            for domain, k in requests.items()
+        }
+
+
+REQUESTS = [("general", 4), ("posture", 8), ("posture", 3), ("vision", 3)]
+
+
+# -------------------------
+# retrieve_by_domain
+# -------------------------
+
+def test_query_is_embedded_once_and_each_domain_searched_once():
+    embeddings = CountingEmbeddings()
+    store = FakeStore(embeddings)
+
+    by_domain = retrieve_by_domain(store, "neck pain", REQUESTS)
+
+    assert embeddings.queries == ["neck pain"]
+    assert sorted(store.calls) == [
+        ("by_vector", "general", 4),
+        ("by_vector", "posture", 8),
+        ("by_vector", "vision", 3)
+    ]
+    # The smaller posture request is a prefix of the larger one
+    assert by_domain["posture"][:3] == store.docs["posture"][:3]
+
+
+def test_scores_are_negated_distances():
+    store = FakeStore(CountingEmbeddings())
+
+    by_domain = retrieve_by_domain(store, "neck pain", [("vision", 3)], with_scores=True)
+
+    assert [score for _, score in by_domain["vision"]] == [-0.0, -1.0, -2.0]
+
+
+def test_store_without_embeddings_searches_by_query():
+    store = FakeStore()
+
+    by_domain = retrieve_by_domain(store, "neck pain", REQUESTS, with_scores=True)
+
+    assert {method for method, _, _ in store.calls} == {"by_query"}
+    assert len(store.calls) == 3
+    assert len(by_domain["posture"]) == 8
+
+
+def test_domain_index_gets_a_single_call():
+    embeddings = CountingEmbeddings()
+    store = DomainIndex(embeddings)
+
+    retrieve_by_domain(store, "neck pain", REQUESTS, with_scores=True)
+
+    assert len(embeddings.queries) == 1
+    assert store.calls == [("by_domain", {"general": 4, "posture": 8, "vision": 3})]
+
+
+# -------------------------
+# One embedding per report
+# -------------------------
+
+HIGH_RISK = {
+    "posture_risk": "High",
+    "vision_risk": "Moderate",
+    "cognitive_risk": "High",
+    "sitting_hours": 9,
+    "neck_discomfort": "Yes",
+    "back_discomfort": "Sometimes",
+    "eye_strain": "Yes",
+    "stress_level": "High",
+    "posture_risk_index": 80,
+    "visual_strain_index": 55,
+    "cognitive_load_index": 75,
+    "primary_domain": "posture"
+}
+
+
+def test_monolithic_prompt_embeds_the_query_once():
+    embeddings = CountingEmbeddings()
+    store = FakeStore(embeddings)
+    pinned = PinnedBlock({"policy": store.docs["policy"][:2]})
+
+    build_report_prompt(store, HIGH_RISK, pinned=pinned)
+
+    assert len(embeddings.queries) == 1
+    assert {method for method, _, _ in store.calls} == {"by_vector"}
+
+
+@pytest.mark.parametrize("mode", ["single", "parallel"])
+def test_sectioned_report_embeds_the_query_once(monkeypatch, mode):
+    monkeypatch.setattr(config, "REPORT_SECTION_MODE", mode)
+    embeddings = CountingEmbeddings()
+    store = FakeStore(embeddings)
+
+    _, prompts, _ = prepare_report(store, HIGH_RISK, pinned=PinnedBlock({"policy": []}))
+
+    # Every section prompt is built from the one lookup
+    assert len(prompts) == (1 if mode == "single" else 5)
+    assert len(embeddings.queries) == 1
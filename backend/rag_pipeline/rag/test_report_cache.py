@@ -0,0 +1,97 @@
+import uuid
+
+from rag_pipeline.rag.index_store import CURRENT_FILE, read_index_version
+from rag_pipeline.rag.report_cache import ReportCache, profile_key, report_key
+
+
+PROFILE = {
+    "posture_risk": "High", "vision_risk": "Low", "cognitive_risk": "Moderate",
+    "sitting_hours": 6, "neck_discomfort": "Yes", "back_discomfort": "No",
+    "eye_strain": "No", "stress_level": "Moderate"
+}
+
+
+def make_cache(tmp_path, **kwargs) -> ReportCache:
+    # Metrics are process-wide by name
+    return ReportCache(tmp_path / "reports.sqlite3", name=f"test_cache_{uuid.uuid4().hex}", **kwargs)
+
+
+def key(kb_version: str = "kb1", prompt_version: str = "p1", model: str = "m1", **profile) -> str:
+    return report_key({**PROFILE, **profile}, kb_version, prompt_version, model)
+
+
+def test_profile_key_is_canonical():
+    reordered = dict(reversed(list(PROFILE.items())))
+    assert profile_key(reordered) == profile_key(PROFILE)
+    assert profile_key({**PROFILE, "sitting_hours": 6.0}) == profile_key(PROFILE)
+    assert profile_key({**PROFILE, "sitting_hours": 7}) != profile_key(PROFILE)
+
+
+def test_miss_then_memory_hit(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get(key()) is None
+
+    cache.put(key(), "report")
+    assert cache.get(key()) == "report"
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits_memory"], stats["hits_disk"]) == (1, 1, 0)
+
+
+def test_disk_hit_survives_restart(tmp_path):
+    make_cache(tmp_path).put(key(), "report")
+
+    cache = make_cache(tmp_path)
+    assert cache.get(key()) == "report"
+    assert cache.stats()["hits_disk"] == 1
+    # Promoted to memory
+    assert cache.get(key()) == "report"
+    assert cache.stats()["hits_memory"] == 1
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=2, disk_entries=2)
+    cache.put(key(sitting_hours=1), "a")
+    cache.put(key(sitting_hours=2), "b")
+    cache.get(key(sitting_hours=1))
+    cache.put(key(sitting_hours=3), "c")
+
+    assert list(cache._memory) == [key(sitting_hours=1), key(sitting_hours=3)]
+    assert cache.stats()["disk_entries"] == 2
+
+
+def test_version_change_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(key(), "report")
+
+    assert cache.get(key(kb_version="kb2")) is None
+    assert cache.get(key(prompt_version="p2")) is None
+    assert cache.get(key(model="m2")) is None
+    assert cache.get(key()) == "report"
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=1)
+    cache.put(key(), "report")
+    cache._memory[key()] = ("report", 0.0)
+    cache._db.execute("UPDATE reports SET created_at = 0")
+
+    assert cache.get(key()) is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_index_version_follows_current(tmp_path):
+    (tmp_path / CURRENT_FILE).write_text("v1", encoding="utf-8")
+    assert read_index_version(tmp_path) == "v1"
+    (tmp_path / CURRENT_FILE).write_text("v2", encoding="utf-8")
+    assert read_index_version(tmp_path) == "v2"
+
+
+def test_legacy_fingerprint_is_computed_once(tmp_path):
+    (tmp_path / "chroma.sqlite3").write_bytes(b"x")
+    first = read_index_version(tmp_path)
+    assert first.startswith("legacy-")
+
+    (tmp_path / "chroma.sqlite3").write_bytes(b"xyz")
+    assert read_index_version(tmp_path) == first
+    assert read_index_version(tmp_path, refresh_legacy=True) != first
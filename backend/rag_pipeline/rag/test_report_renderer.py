@@ -0,0 +1,362 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import config
+from rag_pipeline.rag import report_renderer
+from rag_pipeline.rag.admission import AdmissionGate, Overloaded
+from rag_pipeline.rag.rag_gen import PinnedBlock, domain_risk_levels
+from rag_pipeline.rag.report_renderer import (
+    LOW_SECTION_TEMPLATE,
+    generate_sections_parallel,
+    merge_sections,
+    prepare_report,
+    render_header,
+    render_prepared,
+    report_levels
+)
+
+
+ALL_LOW = {
+    "posture_risk": "Low",
+    "vision_risk": "Low",
+    "cognitive_risk": "Low",
+    "sitting_hours": 4,
+    "neck_discomfort": "No",
+    "back_discomfort": "No",
+    "eye_strain": "No",
+    "stress_level": "Low"
+}
+
+
+class Doc:
+    def __init__(self, page_content: str, metadata: dict):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = None
+
+
+class FakeStore:
+    """
+    similarity_search_with_score() over a few docs per domain.
+    """
+
+    def __init__(self):
+        self.docs = {
+            domain: [
+                Doc(f"{domain} guidance {i}: " + " ".join(f"{domain}{i}w{j}" for j in range(20)),
+                    {"domain": domain, "source": f"{domain}_{i}.pdf"})
+                for i in range(8)
+            ]
+            for domain in ("posture", "vision", "cognitive", "general", "policy")
+        }
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return [(d, float(i)) for i, d in enumerate(self.docs[filter["domain"]][:k])]
+
+
+class FakeLLM:
+    """
+    Writes every requested section, each with a wrong Risk Level line.
+    """
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        user = messages[-1][1]
+        listed = user.split("SECTIONS TO WRITE:")[1].split("\n\n")[0]
+        names = [line[2:].rsplit(" (", 1)[0] for line in listed.strip().splitlines()]
+        return "".join(
+            f"### {name}\n- Risk Level: Low\n- Recommendations: advice for {name}.\n- Why This Helps: because.\n\n"
+            for name in names
+        )
+
+
+def profile(**overrides) -> dict:
+    return {**ALL_LOW, **overrides}
+
+
+def low_section(heading: str, wording: str) -> str:
+    return LOW_SECTION_TEMPLATE.format(heading=heading, wording=wording)
+
+
+def section(report: str, heading: str) -> str:
+    start = report.index(f"### {heading}\n")
+    end = report.find("\n### ", start + 1)
+    return report[start:end + 1 if end != -1 else None]
+
+
+# -------------------------
+# Levels
+# -------------------------
+
+@pytest.mark.parametrize("neck, back, level", [
+    ("No", "No", "Low"),
+    ("Sometimes", "No", "Moderate"),
+    ("No", "Yes", "High"),
+    ("Yes", "Sometimes", "High"),
+])
+def test_msk_level_follows_neck_and_back_discomfort(neck, back, level):
+    assert report_levels(profile(neck_discomfort=neck, back_discomfort=back))["msk"] == level
+
+
+@pytest.mark.parametrize("hours, level", [(4, "Low"), (6, "Moderate"), (7.5, "Moderate"), (8, "High"), (None, "Low")])
+def test_lifestyle_level_follows_sitting_hours(hours, level):
+    assert report_levels(profile(sitting_hours=hours))["lifestyle"] == level
+
+
+def test_explicit_label_or_index_wins_over_derived_level():
+    levels = domain_risk_levels(profile(neck_discomfort="Yes", msk_risk="Low", lifestyle_risk_index=80))
+    assert levels["msk"] == "Low"
+    assert levels["lifestyle"] == "High"
+
+
+def test_header_states_no_uncomputed_confidence():
+    header = render_header(ALL_LOW, report_levels(ALL_LOW))
+    assert "Confidence" not in header
+    assert "Risk Level: Low" in header
+
+
+# -------------------------
+# Section merging
+# -------------------------
+
+def merged(levels: dict, text: str, chunk: int = 7) -> str:
+    chunks = [text[i:i + chunk] for i in range(0, len(text), chunk)]
+    return "".join(merge_sections(levels, chunks))
+
+
+LEVELS = {"posture": "High", "vision": "Low", "cognitive": "Moderate", "msk": "Low", "lifestyle": "Low"}
+
+
+def test_llm_risk_level_is_replaced_by_the_computed_level():
+    text = (
+        "### Posture\n\n- Risk Level: Low\n- Recommendations: raise the screen.\n\n"
+        "### Cognitive / Stress\n- **Risk Level:** High\n- Recommendations: plan breaks.\n"
+    )
+
+    report = merged(LEVELS, text)
+
+    assert section(report, "Posture") == (
+        "### Posture\n- Risk Level: High\n- Recommendations: raise the screen.\n\n"
+    )
+    assert section(report, "Cognitive / Stress").startswith(
+        "### Cognitive / Stress\n- Risk Level: Moderate\n- Recommendations: plan breaks.\n"
+    )
+    assert report.count("Risk Level") == 5
+
+
+def test_missing_risk_level_line_is_added():
+    report = merged(LEVELS, "### Posture\n- Recommendations: raise the screen.\n")
+    assert section(report, "Posture").startswith("### Posture\n- Risk Level: High\n- Recommendations:")
+
+
+@pytest.mark.parametrize("posture, cognitive", [
+    ("## Posture", "## Cognitive / Stress"),
+    ("#### Posture Risk", "#### Stress"),
+    ("### 1. Posture (High)", "### 2. Cognitive / Stress (Moderate)"),
+    ("**Posture**", "**Cognitive / Stress:**"),
+    ("**1. Posture (High)**", "__2. Stress__"),
+    ("1. Posture", "2) Cognitive / Stress:"),
+])
+def test_heading_variants_are_recognised(posture, cognitive):
+    text = (
+        f"Here is your report.\n{posture}\n- Recommendations: raise the screen.\n\n"
+        f"{cognitive}\n- Recommendations: plan breaks.\n"
+    )
+
+    report = merged(LEVELS, text)
+
+    assert "Here is your report" not in report
+    assert "raise the screen" in section(report, "Posture")
+    assert "plan breaks" in section(report, "Cognitive / Stress")
+    assert "Follow the break schedule" not in report   # nothing fell back to the missing template
+
+
+def test_emphasised_or_numbered_recommendations_stay_in_the_section():
+    text = (
+        "### Posture\n- Recommendations:\n"
+        "1. Adjust posture breaks every hour\n"
+        "**Tip: keep your back supported**\n"
+        "2. Reduce neck pain with stretches\n"
+    )
+
+    body = section(merged(LEVELS, text), "Posture")
+
+    assert "1. Adjust posture breaks every hour" in body
+    assert "**Tip: keep your back supported**" in body
+    assert "2. Reduce neck pain with stretches" in body
+
+
+def test_low_and_repeated_sections_from_the_llm_are_dropped():
+    text = (
+        "### Vision\n- Recommendations: invented.\n\n"
+        "### Posture\n- Recommendations: first.\n\n"
+        "### Posture\n- Recommendations: repeated.\n"
+    )
+
+    report = merged(LEVELS, text)
+
+    assert "invented" not in report
+    assert "repeated" not in report
+    assert low_section("Vision", "vision") in report
+
+
+# -------------------------
+# Full render
+# -------------------------
+
+@pytest.fixture
+def single_prompt(monkeypatch):
+    monkeypatch.setattr(config, "REPORT_SECTION_MODE", "single")
+    monkeypatch.setattr(report_renderer.llm_gate, "wait_timeout", None)
+
+
+def test_discomfort_yes_profile_gets_an_llm_msk_section(single_prompt):
+    user_data = profile(neck_discomfort="Yes")
+    llm = FakeLLM()
+
+    prepared = prepare_report(FakeStore(), user_data)
+    report = render_prepared(llm, user_data, prepared)
+
+    assert "- Musculoskeletal Pain (High)" in llm.prompts[0][-1][1]
+    msk = section(report, "Musculoskeletal Pain")
+    assert msk != low_section("Musculoskeletal Pain", "musculoskeletal")
+    assert msk.startswith("### Musculoskeletal Pain\n- Risk Level: High\n")
+    assert "advice for Musculoskeletal Pain" in msk
+
+
+def test_all_low_profile_needs_no_llm(single_prompt):
+    levels, prompts, sources = prepare_report(FakeStore(), ALL_LOW)
+
+    assert prompts == {}
+    assert sources == []
+    assert set(levels.values()) == {"Low"}
+
+
+def test_sources_are_only_the_docs_in_the_prompt(single_prompt):
+    store = FakeStore()
+    pinned = PinnedBlock({"policy": store.docs["policy"][:2]})
+    user_data = profile(posture_risk="High")
+
+    _, prompts, sources = prepare_report(store, user_data, pinned=pinned)
+
+    prompt = prompts["sections"][-1][1]
+    assert sources
+    assert all(f"SOURCE: {source}\n" in prompt for source in sources)
+    assert not any(source.startswith("policy_") for source in sources)
+
+
+def test_section_prompt_puts_user_data_last(single_prompt):
+    _, prompts, _ = prepare_report(FakeStore(), profile(posture_risk="High"))
+
+    prompt = prompts["sections"][-1][1]
+    assert prompt.index("CONTEXT DOCUMENTS:") < prompt.index("SECTIONS TO WRITE:") < prompt.index("USER DATA (JSON):")
+
+
+# -------------------------
+# Parallel sections
+# -------------------------
+
+class SlowSectionLLM:
+    """
+    invoke() that records how many calls overlap and the gate's in-flight
+    count during each call.
+    """
+
+    def __init__(self, gate):
+        self.gate = gate
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.gate_in_flight = []
+
+    def invoke(self, messages):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.gate_in_flight.append(self.gate._in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        heading = messages[-1][1].split("SECTIONS TO WRITE:\n- ")[1].split(" (")[0]
+        return f"### {heading}\n- Recommendations: advice.\n"
+
+
+@pytest.fixture
+def parallel_gate(monkeypatch):
+    monkeypatch.setattr(config, "REPORT_SECTION_MODE", "parallel")
+    gate = AdmissionGate(max_in_flight=1, max_queue=0, wait_timeout_s=None, name=f"test_gate_{uuid.uuid4().hex}")
+    monkeypatch.setattr(report_renderer, "llm_gate", gate)
+    return gate
+
+
+def test_parallel_report_takes_one_gate_slot(parallel_gate):
+    user_data = profile(posture_risk="High", vision_risk="Moderate", cognitive_risk="High", neck_discomfort="Yes")
+    llm = SlowSectionLLM(parallel_gate)
+
+    prepared = prepare_report(FakeStore(), user_data)
+    assert len(prepared[1]) == 4
+
+    report = "".join(generate_sections_parallel(llm, prepared[1], concurrency=3))
+
+    # Sections overlap, yet the report only ever holds a single slot
+    # (with max_queue=0 a second acquire would have raised Overloaded)
+    assert llm.max_running == 3
+    assert llm.gate_in_flight == [1, 1, 1, 1]
+    assert parallel_gate._in_flight == 0
+    assert report.count("advice.") == 4
+
+
+def test_parallel_report_releases_its_slot_when_closed_early(parallel_gate):
+    user_data = profile(posture_risk="High", vision_risk="High", cognitive_risk="High")
+    prepared = prepare_report(FakeStore(), user_data)
+
+    sections = generate_sections_parallel(SlowSectionLLM(parallel_gate), prepared[1], concurrency=1)
+    next(sections)
+    assert parallel_gate._in_flight == 1
+
+    sections.close()
+    assert parallel_gate._in_flight == 0
+
+
+class NoNewlineSectionLLM:
+    """
+    Writes the requested section with no trailing newline, as LLMs
+    usually do.
+    """
+
+    def invoke(self, messages):
+        heading = messages[-1][1].split("SECTIONS TO WRITE:\n- ")[1].split(" (")[0]
+        return f"### {heading}\n- Recommendations: advice for {heading}."
+
+
+def test_parallel_sections_without_trailing_newline_stay_separate(parallel_gate):
+    user_data = profile(posture_risk="High", vision_risk="Moderate", cognitive_risk="High")
+
+    report = render_prepared(NoNewlineSectionLLM(), user_data, prepare_report(FakeStore(), user_data))
+
+    for heading in ("Posture", "Vision", "Cognitive / Stress"):
+        body = section(report, heading)
+        assert f"advice for {heading}.\n" in body
+        assert "Follow the break schedule" not in body
+    assert "advice for Posture.###" not in report
+
+
+def test_full_gate_rejects_a_parallel_report_as_a_whole(parallel_gate):
+    user_data = profile(posture_risk="High", vision_risk="High")
+    prepared = prepare_report(FakeStore(), user_data)
+    llm = SlowSectionLLM(parallel_gate)
+
+    parallel_gate.acquire()
+    try:
+        with pytest.raises(Overloaded):
+            "".join(generate_sections_parallel(llm, prepared[1]))
+    finally:
+        parallel_gate.release()
+
+    assert llm.gate_in_flight == []
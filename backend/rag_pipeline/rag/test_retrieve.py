@@ -1,7 +1,10 @@
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
-DB_PATH = "vectordb/chroma_ergo"
+import config
+from rag_pipeline.rag.index_store import current_index_dir
+
+DB_PATH = str(current_index_dir(config.CHROMA_DIR))
 
 def main():
     embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
@@ -0,0 +1,162 @@
+import threading
+import uuid
+
+import pytest
+
+from rag_pipeline.rag.admission import Overloaded
+from rag_pipeline.rag.single_flight import SingleFlight
+
+
+def run_followers(flight, key, fn, followers: int, leader_started: threading.Event):
+    """
+    Starts the leader, waits until it is inside fn, then starts the
+    followers. Output: (results, threads) -- results[i] is a value or an
+    exception.
+    """
+    results = [None] * (followers + 1)
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, fn, timeout=5)
+        except Exception as e:
+            results[i] = e
+
+    leader = threading.Thread(target=call, args=(0,))
+    leader.start()
+    assert leader_started.wait(5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(1, followers + 1)]
+    for t in threads:
+        t.start()
+    return results, [leader] + threads
+
+
+def wait_for_followers(flight, count: int):
+    # A follower counts itself as shared before waiting on the leader
+    for _ in range(500):
+        if flight._shared.value >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("followers did not arrive")
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "report"
+
+    results, threads = run_followers(flight, "k", fn, 3, started)
+    wait_for_followers(flight, 3)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["report"] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_followers_get_the_leader_exception():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}")
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("LLM down")
+
+    results, threads = run_followers(flight, "k", fn, 2, started)
+    wait_for_followers(flight, 2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert all(isinstance(r, RuntimeError) and str(r) == "LLM down" for r in results)
+    assert flight.in_flight() == 0
+
+
+def test_next_call_after_completion_runs_again():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}")
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}")
+    assert flight.do("a", lambda: "a") == "a"
+    assert flight.do("b", lambda: "b") == "b"
+
+
+def test_follower_timeout():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}")
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    leader = threading.Thread(target=flight.do, args=("k", fn))
+    leader.start()
+    assert started.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do("k", fn, timeout=0.01)
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_followers_beyond_the_limit_are_rejected():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}", max_followers=2, retry_after=lambda: 7)
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return "report"
+
+    results, threads = run_followers(flight, "k", fn, 2, started)
+    wait_for_followers(flight, 2)
+    try:
+        with pytest.raises(Overloaded) as rejected:
+            flight.do("k", fn, timeout=5)
+        # Other keys are not affected
+        assert flight.do("other", lambda: "other") == "other"
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+
+    assert rejected.value.retry_after == 7
+    assert results == ["report"] * 3
+    assert flight._rejected.value == 1
+
+
+def test_follower_slots_free_up_after_waiting():
+    flight = SingleFlight(name=f"test_sf_{uuid.uuid4().hex}", max_followers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return "report"
+
+    leader = threading.Thread(target=flight.do, args=("k", fn))
+    leader.start()
+    assert started.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do("k", fn, timeout=0.01)
+        # The timed-out follower no longer counts toward the limit
+        with pytest.raises(TimeoutError):
+            flight.do("k", fn, timeout=0.01)
+    finally:
+        release.set()
+        leader.join()
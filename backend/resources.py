@@ -0,0 +1,272 @@
+"""
+Process-wide registry of heavy, reusable resources (XGBoost model,
+sentence-transformer embeddings, Chroma store, pinned policy context,
+Ollama client).
+
+Every resource is loaded lazily on first use, exactly once per process,
+behind a per-resource lock. The API warms them up from its lifespan hook;
+CLI entry points simply call get() and share the same instances.
+
+Resources registered with a version_fn (the vector store) are reloaded
+when the version changes, e.g. after ingest publishes a new index build.
+Callers keep getting the old instance until the new one is ready.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import config
+
+
+logger = logging.getLogger("ergocare-resources")
+
+
+class ResourceRegistry:
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._version_fns: Dict[str, Callable[[], str]] = {}
+        self._versions: Dict[str, Optional[str]] = {}
+        self._values: Dict[str, Any] = {}
+        self._status: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        version_fn: Optional[Callable[[], str]] = None
+    ) -> None:
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+            self._status[name] = {"loaded": False, "load_seconds": None, "error": None, "version": None}
+            if version_fn is not None:
+                self._version_fns[name] = version_fn
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the shared instance, loading it on first access (and
+        reloading it if its version changed).
+        """
+        if name in self._values:
+            if name not in self._version_fns:
+                return self._values[name]
+            return self._refresh(name)
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown resource: {name}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._values:
+                return self._values[name]
+            return self._load(name)
+
+    def _load(self, name: str) -> Any:
+        # caller holds self._locks[name]
+        version_fn = self._version_fns.get(name)
+        version = version_fn() if version_fn else None
+
+        start = time.perf_counter()
+        try:
+            value = self._loaders[name]()
+        except Exception as e:
+            self._versions[name] = version
+            self._status[name] = {
+                "loaded": name in self._values,
+                "load_seconds": None,
+                "error": f"{type(e).__name__}: {e}",
+                "version": self._status[name]["version"],
+            }
+            raise
+
+        elapsed = time.perf_counter() - start
+        self._values[name] = value
+        self._versions[name] = version
+        self._status[name] = {"loaded": True, "load_seconds": elapsed, "error": None, "version": version}
+        logger.info(f"Loaded resource '{name}' in {elapsed:.2f}s" + (f" (version {version})" if version else ""))
+        return value
+
+    def _refresh(self, name: str) -> Any:
+        current = self._values[name]
+        if self._version_fns[name]() == self._versions.get(name):
+            return current
+
+        # One thread reloads; the others keep using the current instance
+        # (in-flight requests hold their own reference to it)
+        if not self._locks[name].acquire(blocking=False):
+            return current
+        try:
+            if self._version_fns[name]() == self._versions.get(name):
+                return self._values[name]
+            return self._load(name)
+        except Exception:
+            # Not retried until the version changes again
+            logger.exception(f"Reloading resource '{name}' failed; keeping the previous instance")
+            return current
+        finally:
+            self._locks[name].release()
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Loads the given resources (default: all registered).
+        Failures are logged and surfaced through readiness(), not raised,
+        so one unavailable backend does not stop the process from serving
+        the endpoints that do not need it.
+        """
+        for name in (names if names is not None else list(self._loaders)):
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception(f"Failed to load resource '{name}'")
+        return self.readiness()
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._values
+
+    def readiness(self) -> Dict[str, Dict]:
+        return {name: dict(status) for name, status in self._status.items()}
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """
+        Drops cached instances so the next get() reloads them.
+        """
+        names = [name] if name else list(self._loaders)
+        for n in names:
+            with self._locks[n]:
+                self._values.pop(n, None)
+                self._versions.pop(n, None)
+                self._status[n] = {"loaded": False, "load_seconds": None, "error": None, "version": None}
+
+
+# -------------------------
+# Loaders
+# -------------------------
+# Imports are local so that processes which only need the ML model
+# never pay for importing torch / langchain.
+
+def _load_xgb_model():
+    from ml_pipeline.models.inference import load_model
+    return load_model()
+
+
+def _load_embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL_NAME)
+
+
+def _index_version():
+    from rag_pipeline.rag.index_store import read_index_version
+    return read_index_version(config.CHROMA_DIR)
+
+
+def _load_vectordb():
+    from rag_pipeline.rag.index_store import SNAPSHOT_DIRNAME, current_index_dir, read_index_version
+
+    # The only place an unversioned store is fingerprinted again; every
+    # other reader (_index_version, report keys, pinned context) reuses it
+    read_index_version(config.CHROMA_DIR, refresh_legacy=True)
+
+    index_dir = current_index_dir(config.CHROMA_DIR)
+
+    if config.RETRIEVAL_BACKEND == "numpy":
+        from rag_pipeline.rag.numpy_index import NumpyIndex
+
+        quantization = None if config.RETRIEVAL_QUANTIZATION == "none" else config.RETRIEVAL_QUANTIZATION
+
+        # Snapshot of the current build: mmap it, no Chroma involved
+        version = read_index_version(index_dir)
+        if NumpyIndex.snapshot_version(index_dir / SNAPSHOT_DIRNAME) == version:
+            return NumpyIndex.load(
+                index_dir / SNAPSHOT_DIRNAME,
+                registry.get("embeddings"),
+                quantization=quantization,
+                rescore_factor=config.RETRIEVAL_RESCORE_FACTOR
+            )
+        logger.warning(f"No snapshot for index {version}; copying vectors from Chroma")
+
+    from langchain_community.vectorstores import Chroma
+    chroma = Chroma(
+        persist_directory=str(index_dir),
+        embedding_function=registry.get("embeddings")
+    )
+    if config.RETRIEVAL_BACKEND == "numpy":
+        return NumpyIndex.from_chroma(chroma).quantize(
+            quantization, config.RETRIEVAL_RESCORE_FACTOR
+        )
+    return chroma
+
+
+def _load_pinned_context():
+    from rag_pipeline.rag.pinned_context import PinnedContext
+    pinned = PinnedContext(config.CHROMA_DIR)
+    # Resolve now so the first report does not pay for it
+    pinned.get(registry.get("vectordb"))
+    return pinned
+
+
+def _load_llm():
+    from langchain_ollama import ChatOllama
+    return ChatOllama(
+        model=config.LLM_MODEL_NAME,
+        base_url=config.LLM_BASE_URL,
+        keep_alive=config.LLM_KEEP_ALIVE,
+        num_ctx=config.LLM_NUM_CTX or None
+    )
+
+
+def _load_report_cache():
+    from rag_pipeline.rag.report_cache import ReportCache
+    return ReportCache(
+        config.REPORT_CACHE_PATH,
+        memory_entries=config.REPORT_CACHE_MEMORY_ENTRIES,
+        disk_entries=config.REPORT_CACHE_DISK_ENTRIES,
+        ttl_seconds=config.REPORT_CACHE_TTL_S
+    )
+
+
+def _load_pregenerated():
+    from rag_pipeline.rag.pregenerate import PregeneratedStore
+    return PregeneratedStore(config.PREGEN_PATH)
+
+
+registry = ResourceRegistry()
+registry.register("xgb_model", _load_xgb_model)
+registry.register("embeddings", _load_embeddings)
+registry.register("vectordb", _load_vectordb, version_fn=_index_version)
+registry.register("pinned_context", _load_pinned_context)
+registry.register("llm", _load_llm)
+registry.register("report_cache", _load_report_cache)
+registry.register("pregenerated", _load_pregenerated)
+
+
+def get_model():
+    return registry.get("xgb_model")
+
+
+def get_embeddings():
+    return registry.get("embeddings")
+
+
+def get_vectordb():
+    return registry.get("vectordb")
+
+
+def get_pinned_context():
+    return registry.get("pinned_context")
+
+
+def get_llm():
+    return registry.get("llm")
+
+
+def get_report_cache():
+    return registry.get("report_cache")
+
+
+def get_pregenerated():
+    return registry.get("pregenerated")
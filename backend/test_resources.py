@@ -0,0 +1,206 @@
+import threading
+
+import pytest
+
+from resources import ResourceRegistry
+
+
+class Loader:
+    """
+    Counts calls; returns ("name", n) for the n-th load, or raises while
+    `fail` is set.
+    """
+
+    def __init__(self, name: str = "res", delay: threading.Event = None):
+        self.name = name
+        self.calls = 0
+        self.fail = None
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        if self.delay is not None:
+            self.delay.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        return (self.name, self.calls)
+
+
+class Version:
+    def __init__(self, value: str = "v1"):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+# -------------------------
+# Lazy loading
+# -------------------------
+
+def test_nothing_is_loaded_until_first_get():
+    registry = ResourceRegistry()
+    loader = Loader()
+    registry.register("res", loader)
+
+    assert loader.calls == 0
+    assert not registry.is_loaded("res")
+    assert registry.readiness()["res"]["loaded"] is False
+
+    assert registry.get("res") == ("res", 1)
+    assert registry.get("res") == ("res", 1)
+    assert loader.calls == 1
+    assert registry.is_loaded("res")
+
+
+def test_unknown_resource_raises_key_error():
+    with pytest.raises(KeyError):
+        ResourceRegistry().get("missing")
+
+
+def test_concurrent_first_gets_load_once():
+    registry = ResourceRegistry()
+    release = threading.Event()
+    loader = Loader(delay=release)
+    registry.register("res", loader)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(registry.get("res"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert loader.calls == 1
+    assert results == [("res", 1)] * 5
+
+
+def test_failed_load_is_retried_on_next_get():
+    registry = ResourceRegistry()
+    loader = Loader()
+    loader.fail = RuntimeError("backend down")
+    registry.register("res", loader)
+
+    with pytest.raises(RuntimeError):
+        registry.get("res")
+    assert registry.readiness()["res"]["error"] == "RuntimeError: backend down"
+
+    loader.fail = None
+    assert registry.get("res") == ("res", 2)
+    assert registry.readiness()["res"]["error"] is None
+
+
+# -------------------------
+# Warm-up / readiness
+# -------------------------
+
+def test_warm_up_reports_failures_without_raising():
+    registry = ResourceRegistry()
+    good, bad = Loader("good"), Loader("bad")
+    bad.fail = ConnectionError("no ollama")
+    registry.register("good", good)
+    registry.register("bad", bad)
+
+    status = registry.warm_up()
+
+    assert status["good"]["loaded"] is True
+    assert status["good"]["load_seconds"] is not None
+    assert status["bad"] == {
+        "loaded": False, "load_seconds": None, "error": "ConnectionError: no ollama", "version": None
+    }
+
+
+def test_warm_up_loads_only_the_named_resources():
+    registry = ResourceRegistry()
+    first, second = Loader("first"), Loader("second")
+    registry.register("first", first)
+    registry.register("second", second)
+
+    registry.warm_up(["first"])
+
+    assert (first.calls, second.calls) == (1, 0)
+
+
+def test_reset_forces_a_reload():
+    registry = ResourceRegistry()
+    loader = Loader()
+    registry.register("res", loader)
+    registry.get("res")
+
+    registry.reset("res")
+
+    assert registry.readiness()["res"]["loaded"] is False
+    assert registry.get("res") == ("res", 2)
+
+
+# -------------------------
+# Versioned reload
+# -------------------------
+
+def test_version_change_reloads_the_resource():
+    registry = ResourceRegistry()
+    loader, version = Loader(), Version("v1")
+    registry.register("res", loader, version_fn=version)
+
+    assert registry.get("res") == ("res", 1)
+    assert registry.get("res") == ("res", 1)
+    assert registry.readiness()["res"]["version"] == "v1"
+
+    version.value = "v2"
+
+    assert registry.get("res") == ("res", 2)
+    assert registry.get("res") == ("res", 2)
+    assert loader.calls == 2
+    assert registry.readiness()["res"]["version"] == "v2"
+
+
+def test_failed_reload_keeps_the_previous_instance():
+    registry = ResourceRegistry()
+    loader, version = Loader(), Version("v1")
+    registry.register("res", loader, version_fn=version)
+    registry.get("res")
+
+    version.value = "v2"
+    loader.fail = OSError("half-written index")
+
+    assert registry.get("res") == ("res", 1)
+    status = registry.readiness()["res"]
+    assert status["loaded"] is True
+    assert status["version"] == "v1"
+    assert status["error"] == "OSError: half-written index"
+
+    # Not retried until the version moves again
+    assert registry.get("res") == ("res", 1)
+    assert loader.calls == 2
+
+    loader.fail = None
+    version.value = "v3"
+    assert registry.get("res") == ("res", 3)
+
+
+def test_callers_keep_the_old_instance_while_one_thread_reloads():
+    registry = ResourceRegistry()
+    release = threading.Event()
+    loader, version = Loader(), Version("v1")
+    registry.register("res", loader, version_fn=version)
+    registry.get("res")
+
+    version.value = "v2"
+    loader.delay = release
+    reloaded = []
+    reloader = threading.Thread(target=lambda: reloaded.append(registry.get("res")))
+    reloader.start()
+    try:
+        # The reload is in progress: others are served the current instance
+        for _ in range(500):
+            if loader.calls == 2:
+                break
+            threading.Event().wait(0.01)
+        assert registry.get("res") == ("res", 1)
+    finally:
+        release.set()
+        reloader.join()
+
+    assert reloaded == [("res", 2)]
+    assert registry.get("res") == ("res", 2)